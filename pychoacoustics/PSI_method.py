@@ -19,14 +19,15 @@
 # - Prins, N. (2013). The psi-marginal adaptive method: How to give nuisance parameters the attention they deserve (no more, no less). Journal of Vision, 13, 1–17.
 # - Prins, N. (2012). The psychometric function: The lapse rate revisited. Journal of Vision, 12(6), 25–25.
 
-import copy, scipy
+import copy, scipy, threading
 import numpy as np
 from numpy import arange, exp, linspace, logspace, log, log2, log10, meshgrid, sqrt
 from scipy.stats import lognorm, norm
 from scipy import stats
-from scipy.special import erf
+from scipy.special import erf, xlogy
 from .pysdt import*
-from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD
+from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD, adaptGridBox
+from .utils_lik_cache import defaultLikCacheDir, getCachedLikTable, getLikTableKey
 
 eps = np.spacing(1)
 
@@ -36,12 +37,46 @@ def setupPSI(model="Logistic", stimScale="Linear", x0=None, xLim=(-10, 10),
              betaStep=0.1, betaSpacing="Linear", betaDist="Uniform", betaMu=1,
              betaSTD=2, gamma=0.5, lambdaLim=(0,0.2), lambdaStep=0.01,
              lambdaSpacing="Linear", lambdaDist="Uniform", lambdaMu=0,
-             lambdaSTD=0.1, marginalize = None):
+             lambdaSTD=0.1, marginalize = None, nextStimEngine="Loop",
+             maxChunkMem=4, dtype="float64", likTable="Stored",
+             storeNextNorm=True, likCache=False, likCacheDir=defaultLikCacheDir,
+             likCacheMaxSize=2048, logPosterior=False, nTrialsHint=128,
+             adaptiveGrid=False, adaptiveGridTol=1e-5, adaptiveGridStart=20):
 
     
     PSI = {}
     PSI["par"] = {}
     PSI["par"]["model"] = model
+    #"Loop" evaluates the expected entropy one stimulus level at a time,
+    #"Vectorized" evaluates it for all stimulus levels at once, working
+    #on blocks of at most about maxChunkMem MB
+    PSI["par"]["nextStimEngine"] = nextStimEngine
+    PSI["par"]["maxChunkMem"] = maxChunkMem
+    #storage options to reduce memory usage: "float32" halves the size
+    #of the posterior and of the likelihood tables; with likTable "On Demand"
+    #the likelihood of a correct response is computed from the psychometric
+    #function in blocks when needed instead of being stored; with
+    #storeNextNorm False the posteriors for the next trial computed by
+    #the "Loop" engine are not kept (they are scratch space)
+    PSI["par"]["dtype"] = dtype
+    PSI["par"]["likTable"] = likTable
+    PSI["par"]["storeNextNorm"] = storeNextNorm
+    #if likCache is True the stored likelihood tables are loaded from
+    #(or saved to) a cache on disk of at most likCacheMaxSize MB
+    PSI["par"]["likCache"] = likCache
+    PSI["par"]["likCacheDir"] = likCacheDir
+    PSI["par"]["likCacheMaxSize"] = likCacheMaxSize
+    #if logPosterior is True the posterior is accumulated in the log
+    #domain, so that the probability of unlikely parameter combinations
+    #does not underflow to zero in long blocks
+    PSI["par"]["logPosterior"] = logPosterior
+    #if adaptiveGrid is True, from trial adaptiveGridStart onwards the
+    #parameter grid is cropped to the box outside of which the posterior
+    #mass is at most adaptiveGridTol (see `stats_utils.adaptGridBox`),
+    #and restored to the full grid if the posterior moves out of the box
+    PSI["par"]["adaptiveGrid"] = adaptiveGrid
+    PSI["par"]["adaptiveGridTol"] = adaptiveGridTol
+    PSI["par"]["adaptiveGridStart"] = adaptiveGridStart
     PSI["par"]["x0"] = x0
     PSI["par"]["x"] = {}
     PSI["par"]["x"]["limits"] = xLim
@@ -90,35 +125,64 @@ def setupPSI(model="Logistic", stimScale="Linear", x0=None, xLim=(-10, 10),
     PSI = setP0(PSI)
 
     
-    PSI["x"] = np.array([])
-  
-    PSI["r"] = np.array([])
+    #the trial history is stored in buffers that grow by doubling,
+    #PSI["x"], PSI["r"], and PSI["phi"] are views of their first n rows
+    PSI["xHist"] = np.zeros(nTrialsHint)
+    PSI["rHist"] = np.zeros(nTrialsHint)
+    PSI["phiHist"] = np.zeros((nTrialsHint, 4))
+    PSI["x"] = PSI["xHist"][0:0]
+    PSI["r"] = PSI["rHist"][0:0]
     PSI["n"] = 0
     PSI["gamma"] = gamma
-    PSI["lik_corr"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2]))
-    if PSI["par"]["model"] == "Logistic":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = logisticPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
-    elif PSI["par"]["model"] == "Gaussian":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = gaussianPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
-    elif PSI["par"]["model"] == "Weibull":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = weibullPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
-    elif PSI["par"]["model"] == "Gumbel":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = gumbelPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
+    if logPosterior == True:
+        PSI["logp"] = log(PSI["p"])
+        PSI["logLik"] = np.zeros(PSI["p"].shape, dtype=dtype)
+    #start and stop indexes of the (possibly cropped) parameter grid
+    #in the full grid along each axis
+    PSI["gridBox"] = np.array([[0, n] for n in PSI["p"].shape])
+    PSI["gridFullShape"] = PSI["p"].shape
     PSI["marginalize"] = marginalize
+    PSI_set_lik_tables(PSI)
+    PSI["memory"] = PSI_memory_usage(PSI)
 
     if x0 == None:
         PSI = PSI_select_next_stim(PSI)
     else:
         PSI["xnext"] = copy.copy(x0)
+        PSI["xnextIdx"] = np.argmin(abs(PSI["stims"] - PSI["xnext"]))
 
     return PSI
 
 
 
+def PSI_set_lik_tables(PSI):
+    #build the likelihood tables for the current parameter grid
+    par = PSI["par"]
+    likShape = (len(PSI["stims"]),) + PSI["p"].shape
+    likGrids = [PSI["stims"], PSI["alpha"], PSI["beta"], PSI["lambda"], PSI["gamma"]]
+    if par["likTable"] == "Stored":
+        if par["likCache"] == True:
+            PSI["lik_corr"] = getCachedLikTable(getLikTableKey("lik_corr", par["model"], par["stimScale"], likGrids, par["dtype"]),
+                                                likShape, par["dtype"], lambda table: PSI_fill_lik_corr(PSI, table),
+                                                par["likCacheDir"], par["likCacheMaxSize"])
+        else:
+            PSI["lik_corr"] = np.zeros(likShape, dtype=par["dtype"])
+            PSI_fill_lik_corr(PSI, PSI["lik_corr"])
+    else:
+        PSI["lik_corr"] = None
+    if par["nextStimEngine"] == "Vectorized" and PSI["marginalize"] == None and par["likTable"] == "Stored":
+        if par["likCache"] == True:
+            PSI["likEntrCorr"] = getCachedLikTable(getLikTableKey("likEntrCorr", par["model"], par["stimScale"], likGrids, par["dtype"]),
+                                                   likShape, par["dtype"], lambda table: fillLikEntropyTable(PSI["lik_corr"], table, 1, par["maxChunkMem"]),
+                                                   par["likCacheDir"], par["likCacheMaxSize"])
+            PSI["likEntrIncorr"] = getCachedLikTable(getLikTableKey("likEntrIncorr", par["model"], par["stimScale"], likGrids, par["dtype"]),
+                                                     likShape, par["dtype"], lambda table: fillLikEntropyTable(PSI["lik_corr"], table, 0, par["maxChunkMem"]),
+                                                     par["likCacheDir"], par["likCacheMaxSize"])
+        else:
+            PSI["likEntrCorr"], PSI["likEntrIncorr"] = getLikEntropyTables(PSI["lik_corr"], par["maxChunkMem"])
+
+    return PSI
+
 def setP0(PSI):
     PSI["alpha"] = setParSpace(PSI["par"]["alpha"])
     PSI["beta"] = setParSpace(PSI["par"]["beta"])
@@ -132,12 +196,13 @@ def setP0(PSI):
     L = setPrior(PSI["l"], PSI["par"]["lambda"])
 
     PSI["p"] = (A*B*L)
-    PSI["p"]=PSI["p"]/PSI["p"].sum()
+    PSI["p"]=(PSI["p"]/PSI["p"].sum()).astype(PSI["par"]["dtype"])
 
     #4-D probability distributions for each stimulus level and psychometric function in case of a correct
     # and in case of an incorrect response in the next trial
-    PSI["pCorrNextNorm"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2]))
-    PSI["pIncorrNextNorm"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2]))
+    if PSI["par"]["storeNextNorm"] == True and PSI["par"]["nextStimEngine"] == "Loop":
+        PSI["pCorrNextNorm"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2]), dtype=PSI["par"]["dtype"])
+        PSI["pIncorrNextNorm"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2]), dtype=PSI["par"]["dtype"])
     #probability of a correct and of an incorrect response at each stimulus level across 
     #also serves to scale the pdf to sum to one
     PSI["pCorrNextScaler"] = np.zeros(len(PSI["stims"]))
@@ -188,25 +253,43 @@ def PSI_update(PSI, r):
 
 def PSI_update_posterior(PSI, r):
     PSI["n"] = PSI["n"] +1
-    PSI["x"] = np.append(PSI["x"], PSI["xnext"])
-    PSI["r"] = np.append(PSI["r"], r)
+    if PSI["n"] > len(PSI["xHist"]):
+        PSI_grow_history(PSI)
+    PSI["xHist"][PSI["n"]-1] = PSI["xnext"]
+    PSI["rHist"][PSI["n"]-1] = r
+    PSI["x"] = PSI["xHist"][0:PSI["n"]]
+    PSI["r"] = PSI["rHist"][0:PSI["n"]]
+
+    stimIdx = PSI_get_stim_index(PSI)
+    lik_corr = PSI_get_lik_corr(PSI, stimIdx, stimIdx+1)[0]
+    if PSI["par"]["logPosterior"] == True:
+        with np.errstate(divide="ignore"):
+            if r == 1:
+                np.log(lik_corr, out=PSI["logLik"])
+            elif r == 0:
+                np.log1p(-lik_corr, out=PSI["logLik"])
+        PSI["logp"] += PSI["logLik"]
+        PSI["logp"] -= PSI["logp"].max()
+        #values that would be subnormal are set to zero in the posterior
+        #(they are still kept in the log posterior), operations on
+        #subnormal numbers are very slow
+        PSI["p"].fill(0)
+        np.exp(PSI["logp"], out=PSI["p"], where=PSI["logp"] > log(np.finfo(PSI["p"].dtype).tiny))
+    else:
+        if r == 1:
+            PSI["p"] *= lik_corr
+        elif r == 0:
+            PSI["p"] *= (1-lik_corr)
+    PSI["p"] /= PSI["p"].sum()
 
-    if r == 1:
-        #PSI["p"] = PSI["p"] * PSI["lik_corr"][np.where(PSI["stims"] == PSI["xnext"])[0][0],:,:,:]
-        PSI["p"] = PSI["p"] * PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:]
-        
-    elif r == 0:
-        #PSI["p"] = PSI["p"] * (1-PSI["lik_corr"][np.where(PSI["stims"] == PSI["xnext"])[0][0],:,:,:])
-        PSI["p"] = PSI["p"] * (1-PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:])
-    PSI["p"]=PSI["p"]/PSI["p"].sum()
+    if PSI["par"]["adaptiveGrid"] == True and PSI["n"] >= PSI["par"]["adaptiveGridStart"]:
+        PSI_adapt_grid(PSI)
 
     alpha_est = np.sum(PSI["p"]*PSI["a"])
     beta_est = np.sum(PSI["p"]*PSI["b"])
     lambda_est = np.sum(PSI["p"]*PSI["l"])
-    if PSI["n"] == 1:
-        PSI["phi"] = np.array([alpha_est, beta_est, PSI["gamma"], lambda_est], ndmin=2)
-    else:
-        PSI["phi"] =  np.concatenate((PSI["phi"], np.array([alpha_est, beta_est, PSI["gamma"], lambda_est], ndmin=2)), axis=0)
+    PSI["phiHist"][PSI["n"]-1] = [alpha_est, beta_est, PSI["gamma"], lambda_est]
+    PSI["phi"] = PSI["phiHist"][0:PSI["n"]]
     if PSI["par"]["stimScale"] == "Logarithmic":
         PSI["est_midpoint"] = exp(alpha_est)
     else:
@@ -216,13 +299,88 @@ def PSI_update_posterior(PSI, r):
 
     return PSI
 
+def PSI_adapt_grid(PSI):
+    #crop the parameter grid to the posterior, or restore the full grid
+    #if the posterior has moved out of the cropped grid
+    expand, box = adaptGridBox(PSI["p"], PSI["par"]["adaptiveGridTol"], PSI["gridBox"], PSI["gridFullShape"])
+    if expand == True:
+        PSI_expand_grid(PSI)
+        expand, box = adaptGridBox(PSI["p"], PSI["par"]["adaptiveGridTol"], PSI["gridBox"], PSI["gridFullShape"])
+    if box != None:
+        PSI_crop_grid(PSI, box)
+
+    return PSI
+
+def PSI_crop_grid(PSI, box):
+    #crop the parameter grid, and all the tables defined on it, to a box
+    #(a tuple of slices) of the current grid
+    for key in ["p", "logp", "logLik", "a", "b", "l"]:
+        if key in PSI:
+            PSI[key] = PSI[key][box].copy()
+    PSI["p"] /= PSI["p"].sum()
+    PSI["alpha"] = PSI["alpha"][box[0]]
+    PSI["beta"] = PSI["beta"][box[1]]
+    PSI["lambda"] = PSI["lambda"][box[2]]
+    for key in ["lik_corr", "likEntrCorr", "likEntrIncorr", "pCorrNextNorm", "pIncorrNextNorm"]:
+        if key in PSI and PSI[key] is not None:
+            PSI[key] = np.ascontiguousarray(PSI[key][(slice(None),)+box])
+    PSI["gridBox"] = np.array([[PSI["gridBox"][ax][0]+box[ax].start, PSI["gridBox"][ax][0]+box[ax].stop] for ax in range(len(box))])
+    PSI["memory"] = PSI_memory_usage(PSI)
+
+    return PSI
+
+def PSI_expand_grid(PSI):
+    #restore the full parameter grid and its tables, and recompute the
+    #posterior on it from the trial history
+    PSI = setP0(PSI)
+    PSI = PSI_set_lik_tables(PSI)
+    with np.errstate(divide="ignore"):
+        logp = log(PSI["p"].astype(np.float64))
+        for i in range(PSI["n"]):
+            stimIdx = np.argmin(abs(PSI["stims"] - PSI["x"][i]))
+            lik_corr = PSI_get_lik_corr(PSI, stimIdx, stimIdx+1)[0]
+            if PSI["r"][i] == 1:
+                logp += log(lik_corr)
+            elif PSI["r"][i] == 0:
+                logp += np.log1p(-lik_corr)
+    logp -= logp.max()
+    PSI["p"].fill(0)
+    np.exp(logp, out=PSI["p"], where=logp > log(np.finfo(PSI["p"].dtype).tiny), casting="same_kind")
+    PSI["p"] /= PSI["p"].sum()
+    if PSI["par"]["logPosterior"] == True:
+        PSI["logp"] = logp.astype(PSI["par"]["dtype"])
+        PSI["logLik"] = np.zeros(PSI["p"].shape, dtype=PSI["par"]["dtype"])
+    PSI["gridBox"] = np.array([[0, n] for n in PSI["p"].shape])
+    PSI["memory"] = PSI_memory_usage(PSI)
+
+    return PSI
+
+def PSI_get_stim_index(PSI):
+    #index of the stimulus level of the current trial, stored when the
+    #stimulus was selected; if xnext has been changed since then
+    #look for the nearest stimulus level
+    if "xnextIdx" in PSI and PSI["stims"][PSI["xnextIdx"]] == PSI["xnext"]:
+        return PSI["xnextIdx"]
+    else:
+        return np.argmin(abs(PSI["stims"] - PSI["xnext"]))
+
+def PSI_grow_history(PSI):
+    #double the size of the trial history buffers
+    n = len(PSI["xHist"])
+    PSI["xHist"] = np.concatenate((PSI["xHist"], np.zeros(max(n, 1))))
+    PSI["rHist"] = np.concatenate((PSI["rHist"], np.zeros(max(n, 1))))
+    PSI["phiHist"] = np.concatenate((PSI["phiHist"], np.zeros((max(n, 1), 4))), axis=0)
+
 #@profile
 def PSI_select_next_stim(PSI):
+    if PSI["par"]["nextStimEngine"] == "Vectorized":
+        return PSI_select_next_stim_vectorized(PSI)
     
     #4-D probability distributions for each stimulus level and psychometric function in case of a correct
     # and in case of an incorrect response in the next trial
-    pCorrNextNorm = PSI["pCorrNextNorm"] 
-    pIncorrNextNorm = PSI["pIncorrNextNorm"]
+    if "pCorrNextNorm" in PSI:
+        pCorrNextNorm = PSI["pCorrNextNorm"]
+        pIncorrNextNorm = PSI["pIncorrNextNorm"]
     #probability of a correct and of an incorrect response at each stimulus level across 
     #also serves to scale the pdf to sum to one
     pCorrNextScaler = PSI["pCorrNextScaler"]
@@ -232,33 +390,567 @@ def PSI_select_next_stim(PSI):
     entrIncorr = PSI["entrIncorr"]
     
     for i in range(len(PSI["stims"])):
-        pCorrNextRaw = (PSI["p"] * PSI["lik_corr"][i,:,:,:])
-        pIncorrNextRaw = (PSI["p"] * (1-PSI["lik_corr"][i,:,:,:]))
+        lik_corr = PSI_get_lik_corr(PSI, i, i+1)[0]
+        pCorrNextRaw = (PSI["p"] * lik_corr)
+        pIncorrNextRaw = (PSI["p"] * (1-lik_corr))
         pCorrNextScaler[i] = pCorrNextRaw.sum()
         pIncorrNextScaler[i] = pIncorrNextRaw.sum()
-        pCorrNextNorm[i,:,:,:] = pCorrNextRaw / pCorrNextScaler[i]
-        pIncorrNextNorm[i,:,:,:] = pIncorrNextRaw / pIncorrNextScaler[i]
+        if "pCorrNextNorm" in PSI:
+            pCorrNextNorm[i,:,:,:] = pCorrNextRaw / pCorrNextScaler[i]
+            pIncorrNextNorm[i,:,:,:] = pIncorrNextRaw / pIncorrNextScaler[i]
+            pCorrNextNormI = pCorrNextNorm[i]
+            pIncorrNextNormI = pIncorrNextNorm[i]
+        else:
+            pCorrNextNormI = pCorrNextRaw / pCorrNextScaler[i]
+            pIncorrNextNormI = pIncorrNextRaw / pIncorrNextScaler[i]
         if PSI["marginalize"] != None:
-            pCorrNextNormMarg = np.sum(pCorrNextNorm[i,:,:,:], axis=PSI["marginalize"])
-            pIncorrNextNormMarg = np.sum(pIncorrNextNorm[i,:,:,:], axis=PSI["marginalize"])
+            pCorrNextNormMarg = np.sum(pCorrNextNormI, axis=PSI["marginalize"])
+            pIncorrNextNormMarg = np.sum(pIncorrNextNormI, axis=PSI["marginalize"])
             entrCorr[i] =  -((pCorrNextNormMarg*log2(pCorrNextNormMarg+eps)).sum())
             entrIncorr[i] = -((pIncorrNextNormMarg*log2(pIncorrNextNormMarg+eps)).sum())
         else:
-            entrCorr[i] =  -((pCorrNextNorm[i]*log2(pCorrNextNorm[i]+eps)).sum())
-            entrIncorr[i] = -((pIncorrNextNorm[i]*log2(pIncorrNextNorm[i]+eps)).sum())
+            entrCorr[i] =  -((pCorrNextNormI*log2(pCorrNextNormI+eps)).sum())
+            entrIncorr[i] = -((pIncorrNextNormI*log2(pIncorrNextNormI+eps)).sum())
     #PSI["pCorrNextNorm"] =  pCorrNextNorm
     #Estimate the expected entropy for each test intensity x.
     PSI["entrTot"] = entrCorr*pCorrNextScaler + entrIncorr*pIncorrNextScaler
+    PSI = PSI_set_next_stim(PSI)
+  
+    return PSI
+
+def PSI_select_next_stim_vectorized(PSI):
+    #Same computations as in PSI_select_next_stim, but for all stimulus
+    #levels at once. Without marginalization the entropies are obtained
+    #from matrix-vector products with the tables computed by
+    #getLikEntropyTables, otherwise the posteriors are built for blocks
+    #of stimulus levels that fit in the working memory budget
+    if PSI["par"]["likTable"] == "Stored":
+        if PSI["marginalize"] != None:
+            (PSI["pCorrNextScaler"], PSI["pIncorrNextScaler"], PSI["entrCorr"], PSI["entrIncorr"]) = \
+                expectedEntropyChunked(PSI["p"], PSI["lik_corr"], PSI["marginalize"], PSI["par"]["maxChunkMem"])
+        else:
+            (PSI["pCorrNextScaler"], PSI["pIncorrNextScaler"], PSI["entrCorr"], PSI["entrIncorr"]) = \
+                expectedEntropyMatrix(PSI["p"], PSI["lik_corr"], PSI["likEntrCorr"], PSI["likEntrIncorr"])
+    else:
+        #compute the likelihood tables for one block of stimulus levels at a time
+        nStims = len(PSI["stims"])
+        nChunk = getChunkSize(nStims, PSI["p"].size, 8, PSI["par"]["maxChunkMem"], nTemp=4)
+        for i in range(0, nStims, nChunk):
+            sl = slice(i, min(i+nChunk, nStims))
+            lik_corr = PSI_lik_corr_block(PSI, sl.start, sl.stop)
+            if PSI["marginalize"] != None:
+                (PSI["pCorrNextScaler"][sl], PSI["pIncorrNextScaler"][sl], PSI["entrCorr"][sl], PSI["entrIncorr"][sl]) = \
+                    expectedEntropyChunked(PSI["p"], lik_corr, PSI["marginalize"], PSI["par"]["maxChunkMem"])
+            else:
+                likEntrCorr, likEntrIncorr = getLikEntropyTables(lik_corr, PSI["par"]["maxChunkMem"])
+                (PSI["pCorrNextScaler"][sl], PSI["pIncorrNextScaler"][sl], PSI["entrCorr"][sl], PSI["entrIncorr"][sl]) = \
+                    expectedEntropyMatrix(PSI["p"], lik_corr, likEntrCorr, likEntrIncorr)
+    #Estimate the expected entropy for each test intensity x.
+    PSI["entrTot"] = PSI["entrCorr"]*PSI["pCorrNextScaler"] + PSI["entrIncorr"]*PSI["pIncorrNextScaler"]
+    PSI = PSI_set_next_stim(PSI)
+
+    return PSI
+
+def PSI_set_next_stim(PSI):
     #Find the test intensity that has the minimum expected entropy
     stimIdx = np.argmin(PSI["entrTot"])#np.where(PSI["entrTot"] == np.min(PSI["entrTot"]))
-   
+
+    PSI["xnextIdx"] = stimIdx
     PSI["xnext"] = PSI["stims"][stimIdx]
     if PSI["par"]["stimScale"] == "Logarithmic":
         PSI["xnextLinear"] = exp(PSI["xnext"])
     else:
         PSI["xnextLinear"] = PSI["xnext"]
-  
+
     return PSI
 
+def PSI_lik_corr_block(PSI, i0, i1):
+    #probability of a correct response for stimulus levels i0 to i1-1
+    #at each point of the parameter space
+    x = PSI["stims"][i0:i1].reshape((-1,) + (1,)*PSI["p"].ndim)
+    if PSI["par"]["model"] == "Logistic":
+        lik_corr = logisticPsy(x, PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
+    elif PSI["par"]["model"] == "Gaussian":
+        lik_corr = gaussianPsy(x, PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
+    elif PSI["par"]["model"] == "Weibull":
+        lik_corr = weibullPsy(x, PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
+    elif PSI["par"]["model"] == "Gumbel":
+        lik_corr = gumbelPsy(x, PSI["a"], PSI["b"], PSI["gamma"], PSI["l"])
 
+    return lik_corr.astype(PSI["par"]["dtype"], copy=False)
 
+def PSI_fill_lik_corr(PSI, lik_corr):
+    #fill the lik_corr table in blocks of stimulus levels
+    nStims = len(PSI["stims"])
+    nChunk = getChunkSize(nStims, PSI["p"].size, 8, PSI["par"]["maxChunkMem"], nTemp=2)
+    for i in range(0, nStims, nChunk):
+        lik_corr[i:i+nChunk] = PSI_lik_corr_block(PSI, i, i+nChunk)
+
+def PSI_get_lik_corr(PSI, i0, i1):
+    if PSI["par"]["likTable"] == "Stored":
+        return PSI["lik_corr"][i0:i1]
+    else:
+        return PSI_lik_corr_block(PSI, i0, i1)
+
+def PSI_memory_usage(PSI):
+    """
+    Estimate the memory used by a PSI procedure.
+
+    Parameters
+    ----------
+    PSI : dict
+        The PSI dictionary returned by `setupPSI`.
+
+    Returns
+    -------
+    mem : dict
+        With keys "stored" (bytes held by the arrays of the PSI dictionary),
+        "working" (estimated peak size in bytes of the temporary arrays
+        created when selecting the next stimulus), "peak" (their sum),
+        and "standard" (estimated peak in bytes with float64 storage, stored
+        likelihood and next-trial posterior tables, and the "Loop" engine).
+
+    """
+    nStims = len(PSI["stims"])
+    pSize = PSI["p"].size
+    itemSize = np.dtype(PSI["par"]["dtype"]).itemsize
+    stored = 0
+    for key in PSI:
+        if isinstance(PSI[key], np.ndarray):
+            stored = stored + PSI[key].nbytes
+    #the "Loop" engine and the update of the posterior create
+    #about five temporary arrays the size of the parameter space
+    working = 5*pSize*8
+    if PSI["par"]["nextStimEngine"] == "Vectorized":
+        if PSI["par"]["likTable"] == "Stored" and PSI["marginalize"] == None:
+            working = 3*pSize*itemSize
+        else:
+            working = max(working, PSI["par"]["maxChunkMem"]*2**20)
+    #meshgrids, prior, and posterior, plus the likelihood and
+    #next-trial posterior tables
+    standard = (4*pSize*8) + (3*nStims*pSize*8) + 5*pSize*8
+    mem = {"stored": stored, "working": working, "peak": stored+working, "standard": standard}
+
+    return mem
+
+def setupPSIStack(nTracks, x0=None, **kwargs):
+    """
+    Set up several interleaved PSI tracks sharing the same psychometric
+    function model and parameter space.
+
+    The posteriors of all tracks are stored in a single array, with the
+    track along the first axis, and the likelihood tables are shared.
+    Each track is a PSI dictionary, as returned by `setupPSI`, whose
+    posterior is a view of the stacked array, so that it can be passed to
+    any of the PSI functions.
+
+    Parameters
+    ----------
+    nTracks : int
+        Number of tracks.
+    x0 : float, list of floats, or None
+        Starting stimulus level, either common to all tracks or one for
+        each track. If None, it is chosen by the PSI procedure.
+    **kwargs :
+        Any other argument accepted by `setupPSI`. `adaptiveGrid` can
+        be used only with a single track.
+
+    Returns
+    -------
+    stack : dict
+        With keys "p" (the stacked posteriors), "nTracks", "par" (the
+        parameters common to all tracks), and "tracks" (the list of
+        PSI dictionaries of the tracks).
+
+    Examples
+    --------
+    >>> stack = setupPSIStack(3, model="Logistic", xLim=(-20, 20),
+    ...     alphaLim=(-10, 10), betaLim=(0.1, 5), betaStep=0.2,
+    ...     nextStimEngine="Vectorized")
+    >>> stack = PSIStack_update(stack, 1, 1)
+    >>> x = stack["tracks"][1]["xnext"]
+
+    """
+    if kwargs.get("adaptiveGrid", False) == True and nTracks > 1:
+        raise ValueError("the adaptive grid cannot be used with more than one stacked PSI track")
+    if x0 == None or np.isscalar(x0):
+        x0 = [x0 for i in range(nTracks)]
+    PSI0 = setupPSI(x0=x0[0], **kwargs)
+
+    stack = {}
+    stack["nTracks"] = nTracks
+    stack["par"] = PSI0["par"]
+    stack["p"] = np.empty((nTracks,) + PSI0["p"].shape, dtype=PSI0["p"].dtype)
+    stack["tracks"] = []
+    for i in range(nTracks):
+        #the likelihood tables, the parameter grids, and the scratch space
+        #of the "Loop" engine are shared, the state of each track is not
+        PSI = copy.copy(PSI0)
+        stack["p"][i] = PSI0["p"]
+        PSI["p"] = stack["p"][i]
+        for key in ["xHist", "rHist", "phiHist", "logp", "logLik", "entrTot", "pCorrNextScaler",
+                    "pIncorrNextScaler", "entrCorr", "entrIncorr"]:
+            if key in PSI0:
+                PSI[key] = PSI0[key].copy()
+        PSI["x"] = PSI["xHist"][0:0]
+        PSI["r"] = PSI["rHist"][0:0]
+        if x0[i] != None:
+            PSI["xnext"] = copy.copy(x0[i])
+            PSI["xnextIdx"] = np.argmin(abs(PSI["stims"] - PSI["xnext"]))
+            if PSI["par"]["stimScale"] == "Logarithmic":
+                PSI["xnextLinear"] = exp(PSI["xnext"])
+            else:
+                PSI["xnextLinear"] = PSI["xnext"]
+        elif x0[0] != None:
+            PSI = PSI_select_next_stim(PSI)
+        stack["tracks"].append(PSI)
+
+    return stack
+
+def PSIStack_update(stack, track, r):
+    """
+    Update the posterior of one track of a PSI stack after a response,
+    and select the next stimulus level for that track.
+
+    Parameters
+    ----------
+    stack : dict
+        The PSI stack returned by `setupPSIStack`.
+    track : int
+        Index of the track that was presented in the trial.
+    r : int
+        The response, 1 if correct, 0 if incorrect.
+
+    Returns
+    -------
+    stack : dict
+
+    """
+    PSI = stack["tracks"][track]
+    PSI = PSI_update_posterior(PSI, r)
+    if not np.shares_memory(stack["p"], PSI["p"]):
+        #the grid of a single track has been cropped or restored, which
+        #allocates a new posterior (possibly with the same shape)
+        stack["p"] = PSI["p"][np.newaxis]
+    stack = PSIStack_select_next_stim(stack, [track])
+
+    return stack
+
+def PSIStack_select_next_stim(stack, tracks=None):
+    """
+    Select the next stimulus level for several tracks of a PSI stack.
+
+    With the "Vectorized" engine, stored likelihood tables, and no
+    marginalization, the expected entropies of all the tracks are
+    computed together with matrix-matrix products; otherwise the tracks
+    are processed one at a time.
+
+    Parameters
+    ----------
+    stack : dict
+        The PSI stack returned by `setupPSIStack`.
+    tracks : list of ints or None
+        Indexes of the tracks, if None all the tracks.
+
+    Returns
+    -------
+    stack : dict
+
+    """
+    if tracks == None:
+        tracks = list(range(stack["nTracks"]))
+    PSI0 = stack["tracks"][tracks[0]]
+    if len(tracks) > 1 and stack["par"]["nextStimEngine"] == "Vectorized" and stack["par"]["likTable"] == "Stored" and PSI0["marginalize"] == None:
+        (pCorrNextScaler, pIncorrNextScaler, entrCorr, entrIncorr) = \
+            expectedEntropyMatrix(stack["p"][tracks], PSI0["lik_corr"], PSI0["likEntrCorr"], PSI0["likEntrIncorr"])
+        for j in range(len(tracks)):
+            PSI = stack["tracks"][tracks[j]]
+            PSI["pCorrNextScaler"] = pCorrNextScaler[:,j]
+            PSI["pIncorrNextScaler"] = pIncorrNextScaler[:,j]
+            PSI["entrCorr"] = entrCorr[:,j]
+            PSI["entrIncorr"] = entrIncorr[:,j]
+            PSI["entrTot"] = PSI["entrCorr"]*PSI["pCorrNextScaler"] + PSI["entrIncorr"]*PSI["pIncorrNextScaler"]
+            PSI = PSI_set_next_stim(PSI)
+    else:
+        for track in tracks:
+            stack["tracks"][track] = PSI_select_next_stim(stack["tracks"][track])
+
+    return stack
+
+def PSIStack_set_track(stack, track, PSI):
+    """
+    Replace the state of one track of a PSI stack, e.g. with the
+    result of a `speculativePSIUpdater`.
+
+    Parameters
+    ----------
+    stack : dict
+        The PSI stack returned by `setupPSIStack`.
+    track : int
+        Index of the track.
+    PSI : dict
+        The new PSI dictionary of the track.
+
+    Returns
+    -------
+    stack : dict
+
+    """
+    if stack["nTracks"] == 1:
+        stack["p"] = PSI["p"][np.newaxis]
+    else:
+        stack["p"][track] = PSI["p"]
+    PSI["p"] = stack["p"][track]
+    stack["tracks"][track] = PSI
+
+    return stack
+
+class speculativePSIUpdater(object):
+    """
+    Compute in a background thread the result of `PSI_update` for both
+    possible responses to the current trial, so that the next stimulus
+    is ready as soon as the response is given.
+
+    The updates are computed on copies of the PSI state, the PSI
+    dictionary passed is not modified. The response deemed more likely
+    by the current posterior is processed first.
+
+    Parameters
+    ----------
+    PSI : dict
+        The PSI dictionary, with "xnext" set to the stimulus level of
+        the current trial.
+
+    Examples
+    --------
+    >>> spec = speculativePSIUpdater(PSI)
+    >>> #... present the trial and collect the response r
+    >>> PSI = spec.getUpdate(r)
+
+    """
+    def __init__(self, PSI):
+        self.PSI = PSI
+        self.results = {}
+        self.error = None
+        self.cancelled = False
+        self.current = None
+        #the copies are made here, before the caller can go on
+        #modifying the PSI dictionary
+        stimIdx = PSI_get_stim_index(PSI)
+        pCorr = np.sum(PSI["p"]*PSI_get_lik_corr(PSI, stimIdx, stimIdx+1)[0])
+        if pCorr >= 0.5:
+            self.order = [1, 0]
+        else:
+            self.order = [0, 1]
+        self.copies = [PSI_speculative_copy(PSI) for r in self.order]
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for i in range(len(self.order)):
+            if self.cancelled == True:
+                break
+            self.current = self.order[i]
+            try:
+                self.results[self.order[i]] = PSI_update(self.copies[i], self.order[i])
+            except Exception as e:
+                self.error = e
+                break
+        self.current = None
+
+    def cancel(self, wait=True):
+        """
+        Stop the computations after the one currently running.
+        If wait is True, wait for it to finish.
+        """
+        self.cancelled = True
+        if wait == True:
+            self.thread.join()
+
+    def getUpdate(self, r):
+        """
+        Return the PSI dictionary updated after response r. If the update
+        for r is not ready, and it is not being computed, the background
+        computations are cancelled and the update is computed here.
+        """
+        if r not in self.results and self.current == r:
+            self.thread.join()
+        self.cancel(wait=False)
+        if r in self.results:
+            return self.results[r]
+        #the background thread works on copies, the original
+        #can be updated while it finishes
+        return PSI_update(self.PSI, r)
+
+def PSI_speculative_copy(PSI):
+    #copy of the PSI dictionary that can be updated without modifying
+    #the original; the likelihood tables and the parameter grids are
+    #shared (they are only read), the "Loop" engine scratch space is not
+    #kept so that concurrent updates do not write to the same arrays
+    spec = copy.copy(PSI)
+    for key in ["p", "logp", "logLik", "xHist", "rHist", "phiHist", "pCorrNextScaler",
+                "pIncorrNextScaler", "entrCorr", "entrIncorr"]:
+        if key in PSI:
+            spec[key] = PSI[key].copy()
+    for key in ["pCorrNextNorm", "pIncorrNextNorm"]:
+        if key in spec:
+            del spec[key]
+
+    return spec
+
+def getChunkSize(nStims, pSize, itemSize, maxChunkMem, nTemp=3):
+    #number of stimulus levels that can be processed at once keeping
+    #the nTemp temporary arrays of each block within maxChunkMem MB
+    nChunk = int((maxChunkMem*2**20) // (nTemp*pSize*itemSize))
+    return max(1, min(nStims, nChunk))
+
+def getLikEntropyTables(likCorr, maxChunkMem=4):
+    """
+    Compute the tables of L*log2(L) and (1-L)*log2(1-L), where L is
+    the probability of a correct response, used by `expectedEntropyMatrix`.
+
+    Parameters
+    ----------
+    likCorr : array of floats
+        The probability of a correct response for each stimulus level
+        (first axis) and each point of the parameter space (remaining axes).
+    maxChunkMem : float
+        Approximate maximum amount of working memory (in MB) to use.
+
+    Returns
+    -------
+    likEntrCorr : array of floats
+    likEntrIncorr : array of floats
+
+    """
+    likEntrCorr = np.empty(likCorr.shape, dtype=likCorr.dtype)
+    likEntrIncorr = np.empty(likCorr.shape, dtype=likCorr.dtype)
+    fillLikEntropyTable(likCorr, likEntrCorr, 1, maxChunkMem)
+    fillLikEntropyTable(likCorr, likEntrIncorr, 0, maxChunkMem)
+
+    return likEntrCorr, likEntrIncorr
+
+def fillLikEntropyTable(likCorr, out, r, maxChunkMem=4):
+    #fill out with L*log2(L) if r is 1, or (1-L)*log2(1-L) if r is 0
+    nStims = likCorr.shape[0]
+    nChunk = getChunkSize(nStims, likCorr[0].size, likCorr.itemsize, maxChunkMem, nTemp=1)
+    for i in range(0, nStims, nChunk):
+        sl = slice(i, min(i+nChunk, nStims))
+        if r == 1:
+            lik = likCorr[sl]
+        else:
+            lik = 1-likCorr[sl]
+        xlogy(lik, lik, out=out[sl])
+        out[sl] /= log(2)
+
+def expectedEntropyMatrix(p, likCorr, likEntrCorr, likEntrIncorr):
+    """
+    Compute the probability of a correct and of an incorrect response,
+    and the entropy of the posterior following a correct and an
+    incorrect response for each stimulus level.
+
+    The entropy of the posterior following a response is obtained by
+    expanding log2(p*L/s) = log2(p) + log2(L) - log2(s), so that the
+    sums over the parameter space reduce to matrix-vector products with
+    the tables returned by `getLikEntropyTables`.
+
+    Parameters
+    ----------
+    p : array of floats
+        The current posterior over the parameter space. It can have an
+        additional leading axis for the posteriors of several tracks, in
+        which case the outputs have one column for each track.
+    likCorr : array of floats
+        The probability of a correct response for each stimulus level
+        (first axis) and each point of the parameter space (remaining axes).
+    likEntrCorr : array of floats
+        Table of likCorr*log2(likCorr).
+    likEntrIncorr : array of floats
+        Table of (1-likCorr)*log2(1-likCorr).
+
+    Returns
+    -------
+    pCorrNextScaler : array of floats
+    pIncorrNextScaler : array of floats
+    entrCorr : array of floats
+    entrIncorr : array of floats
+
+    """
+    nStims = likCorr.shape[0]
+    L = likCorr.reshape((nStims, -1))
+    if p.ndim == likCorr.ndim:
+        #one column for each track
+        pFlat = p.reshape((p.shape[0], -1)).T.astype(L.dtype, copy=False)
+    else:
+        pFlat = p.reshape(-1).astype(L.dtype, copy=False)
+    pLogp = xlogy(pFlat, pFlat) / log(2)
+
+    pCorrNextScaler = L @ pFlat
+    pIncorrNextScaler = pFlat.sum(axis=0) - pCorrNextScaler
+    LpLogp = L @ pLogp
+    entrCorr = log2(pCorrNextScaler) - (LpLogp + likEntrCorr.reshape((nStims, -1)) @ pFlat) / pCorrNextScaler
+    entrIncorr = log2(pIncorrNextScaler) - (pLogp.sum(axis=0) - LpLogp + likEntrIncorr.reshape((nStims, -1)) @ pFlat) / pIncorrNextScaler
+
+    return pCorrNextScaler, pIncorrNextScaler, entrCorr, entrIncorr
+
+def expectedEntropyChunked(p, likCorr, marginalize=None, maxChunkMem=4):
+    """
+    Compute the probability of a correct and of an incorrect response,
+    and the entropy of the (optionally marginalized) posterior following
+    a correct and an incorrect response for each stimulus level.
+
+    The posteriors are built for blocks of stimulus levels at a time,
+    performing the same operations as the loop in `PSI_select_next_stim`.
+
+    Parameters
+    ----------
+    p : array of floats
+        The current posterior over the parameter space.
+    likCorr : array of floats
+        The probability of a correct response for each stimulus level
+        (first axis) and each point of the parameter space (remaining axes).
+    marginalize : tuple of ints or None
+        Axes of the parameter space to marginalize over before computing
+        the entropy.
+    maxChunkMem : float
+        Approximate maximum amount of working memory (in MB) to use.
+        Blocks fitting in the processor cache are the fastest.
+
+    Returns
+    -------
+    pCorrNextScaler : array of floats
+    pIncorrNextScaler : array of floats
+    entrCorr : array of floats
+    entrIncorr : array of floats
+
+    """
+    nStims = likCorr.shape[0]
+    parAxes = tuple(range(1, p.ndim+1))
+    if marginalize != None:
+        margAxes = tuple([int(ax)+1 for ax in marginalize])
+    pCorrNextScaler = np.zeros(nStims)
+    pIncorrNextScaler = np.zeros(nStims)
+    entrCorr = np.zeros(nStims)
+    entrIncorr = np.zeros(nStims)
+
+    nChunk = getChunkSize(nStims, p.size, p.itemsize, maxChunkMem)
+    for i in range(0, nStims, nChunk):
+        sl = slice(i, min(i+nChunk, nStims))
+        lik = likCorr[sl]
+        for r in (1, 0):
+            if r == 1:
+                raw = p * lik
+                scaler = pCorrNextScaler; entr = entrCorr
+            else:
+                raw = p * (1-lik)
+                scaler = pIncorrNextScaler; entr = entrIncorr
+            scaler[sl] = raw.sum(axis=parAxes)
+            raw /= scaler[sl].reshape((-1,) + (1,)*p.ndim)
+            if marginalize != None:
+                raw = np.sum(raw, axis=margAxes)
+            tmp = raw + eps
+            np.log2(tmp, out=tmp)
+            tmp *= raw
+            entr[sl] = -tmp.sum(axis=tuple(range(1, raw.ndim)))
+
+    return pCorrNextScaler, pIncorrNextScaler, entrCorr, entrIncorr
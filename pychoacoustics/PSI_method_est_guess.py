@@ -19,14 +19,17 @@
 # - Prins, N. (2013). The psi-marginal adaptive method: How to give nuisance parameters the attention they deserve (no more, no less). Journal of Vision, 13, 1–17.
 # - Prins, N. (2012). The psychometric function: The lapse rate revisited. Journal of Vision, 12(6), 25–25.
 
-import copy, scipy
+import copy, multiprocessing, scipy, weakref
 import numpy as np
+from multiprocessing import shared_memory
 from numpy import arange, exp, linspace, logspace, log, log2, log10, meshgrid, sqrt
 from scipy.stats import lognorm, norm
 from scipy import stats
 from scipy.special import erf
 from .pysdt import*
 from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD
+from .utils_lik_cache import defaultLikCacheDir, getCachedLikTable, getLikTableKey
+from .PSI_method import expectedEntropyChunked
 eps = np.spacing(1) #add eps to avoid taking log of zero
 
 def setupPSIEstGuessRate(model="Logistic", stimScale="Linear", x0=None, xLim=(-10, 10),
@@ -37,7 +40,9 @@ def setupPSIEstGuessRate(model="Logistic", stimScale="Linear", x0=None, xLim=(-1
                          gammaSpacing="Linear", gammaDist="Uniform", gammaMu=0.1,
                          gammaSTD=0.1, lambdaLim=(0,0.2), lambdaStep=0.01,
                          lambdaSpacing="Linear", lambdaDist="Uniform", lambdaMu=0,
-                         lambdaSTD=0.1, marginalize = None):
+                         lambdaSTD=0.1, marginalize = None, likCache=False,
+                         likCacheDir=defaultLikCacheDir, likCacheMaxSize=2048,
+                         nProcesses=1, maxChunkMem=4):
 
     
     PSI = {}
@@ -102,19 +107,32 @@ def setupPSIEstGuessRate(model="Logistic", stimScale="Linear", x0=None, xLim=(-1
     PSI["r"] = np.array([])
     PSI["n"] = 0
     #PSI["gamma"] = gamma
-    PSI["lik_corr"] = np.zeros((len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2], PSI["p"].shape[3]))
-    if PSI["par"]["model"] == "Logistic":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = logisticPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
-    elif PSI["par"]["model"] == "Gaussian":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = gaussianPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
-    elif PSI["par"]["model"] == "Weibull":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = weibullPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
-    elif PSI["par"]["model"] == "Gumbel":
-        for i in range(len(PSI["stims"])):
-            PSI["lik_corr"][i,:,:,:] = gumbelPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
+    likShape = (len(PSI["stims"]), PSI["p"].shape[0], PSI["p"].shape[1], PSI["p"].shape[2], PSI["p"].shape[3])
+    PSI["par"]["nProcesses"] = nProcesses
+    PSI["par"]["maxChunkMem"] = maxChunkMem
+    if nProcesses > 1:
+        #the posterior and the likelihood table live in shared memory,
+        #the worker processes compute the expected entropy for
+        #a subset of the stimulus levels each
+        PSI["workers"] = PSIWorkerPool(PSI["p"], likShape, nProcesses, marginalize, maxChunkMem)
+        PSI["p"] = PSI["workers"].p
+        #the normalized posteriors for each stimulus level are not needed
+        del PSI["pCorrNextNorm"], PSI["pIncorrNextNorm"]
+    if likCache == True:
+        PSI["lik_corr"] = getCachedLikTable(getLikTableKey("lik_corr_est_guess", model, stimScale,
+                                                           [PSI["stims"], PSI["alpha"], PSI["beta"], PSI["gamma"], PSI["lambda"]],
+                                                           "float64"),
+                                            likShape, "float64", lambda table: PSI_fill_lik_corr(PSI, table),
+                                            likCacheDir, likCacheMaxSize)
+        if nProcesses > 1:
+            PSI["workers"].setLikCorr(PSI["lik_corr"])
+    elif nProcesses > 1:
+        PSI["lik_corr"] = PSI["workers"].lik_corr
+        PSI_fill_lik_corr(PSI, PSI["lik_corr"])
+        PSI["workers"].setLikCorr(PSI["lik_corr"])
+    else:
+        PSI["lik_corr"] = np.zeros(likShape)
+        PSI_fill_lik_corr(PSI, PSI["lik_corr"])
     PSI["marginalize"] = marginalize
 
     if x0 == None:
@@ -126,6 +144,20 @@ def setupPSIEstGuessRate(model="Logistic", stimScale="Linear", x0=None, xLim=(-1
 
 
 
+def PSI_fill_lik_corr(PSI, lik_corr):
+    if PSI["par"]["model"] == "Logistic":
+        for i in range(len(PSI["stims"])):
+            lik_corr[i,:,:,:] = logisticPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
+    elif PSI["par"]["model"] == "Gaussian":
+        for i in range(len(PSI["stims"])):
+            lik_corr[i,:,:,:] = gaussianPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
+    elif PSI["par"]["model"] == "Weibull":
+        for i in range(len(PSI["stims"])):
+            lik_corr[i,:,:,:] = weibullPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
+    elif PSI["par"]["model"] == "Gumbel":
+        for i in range(len(PSI["stims"])):
+            lik_corr[i,:,:,:] = gumbelPsy(PSI["stims"][i], PSI["a"], PSI["b"], PSI["g"], PSI["l"])
+
 def setP0(PSI):
     PSI["alpha"] = setParSpace(PSI["par"]["alpha"])
     PSI["beta"] = setParSpace(PSI["par"]["beta"])
@@ -200,14 +232,16 @@ def PSI_update_posterior(PSI, r):
     PSI["x"] = np.append(PSI["x"], PSI["xnext"])
     PSI["r"] = np.append(PSI["r"], r)
 
+    #the posterior is updated in place, so that it stays in shared
+    #memory when the next stimulus is selected by worker processes
     if r == 1:
         #PSI["p"] = PSI["p"] * PSI["lik_corr"][np.where(PSI["stims"] == PSI["xnext"])[0][0],:,:,:]
-        PSI["p"] = PSI["p"] * PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:,:]
+        PSI["p"] *= PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:,:]
         
     elif r == 0:
         #PSI["p"] = PSI["p"] * (1-PSI["lik_corr"][np.where(PSI["stims"] == PSI["xnext"])[0][0],:,:,:])
-        PSI["p"] = PSI["p"] * (1-PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:,:])
-    PSI["p"]=PSI["p"]/PSI["p"].sum()
+        PSI["p"] *= (1-PSI["lik_corr"][np.where(abs(PSI["stims"] - PSI["xnext"]) == min(abs(PSI["stims"] - PSI["xnext"])))[0][0],:,:,:,:])
+    PSI["p"] /= PSI["p"].sum()
 
     alpha_est = np.sum(PSI["p"]*PSI["a"])
     beta_est = np.sum(PSI["p"]*PSI["b"])
@@ -229,6 +263,8 @@ def PSI_update_posterior(PSI, r):
 
 def PSI_select_next_stim(PSI):
 
+    if "workers" in PSI:
+        return PSI_select_next_stim_parallel(PSI)
     #5-D probability distributions for each stimulus level and psychometric function in case of a correct
     # and in case of an incorrect response in the next trial
     pCorrNextNorm = PSI["pCorrNextNorm"]
@@ -261,11 +297,7 @@ def PSI_select_next_stim(PSI):
     #Find the test intensity that has the minimum expected entropy
     stimIdx = np.argmin(PSI["entrTot"])#np.where(PSI["entrTot"] == np.min(PSI["entrTot"]))
    
-    PSI["xnext"] = PSI["stims"][stimIdx]
-    if PSI["par"]["stimScale"] == "Logarithmic":
-        PSI["xnextLinear"] = exp(PSI["xnext"])
-    else:
-        PSI["xnextLinear"] = PSI["xnext"]
+    PSI = PSI_set_next_stim(PSI, stimIdx)
 
     print('Est Midpoint: ', PSI["est_midpoint"])
     print('Est Guess: ', PSI["est_guess"])
@@ -275,5 +307,151 @@ def PSI_select_next_stim(PSI):
   
     return PSI
 
+def PSI_select_next_stim_parallel(PSI):
+    """
+    Select the next stimulus level splitting the computation of the
+    expected entropy across the worker processes of `PSI["workers"]`.
+    """
+    (PSI["pCorrNextScaler"], PSI["pIncorrNextScaler"],
+     PSI["entrCorr"], PSI["entrIncorr"]) = PSI["workers"].expectedEntropy()
+    PSI["entrTot"] = PSI["entrCorr"]*PSI["pCorrNextScaler"] + PSI["entrIncorr"]*PSI["pIncorrNextScaler"]
+    stimIdx = np.argmin(PSI["entrTot"])
+    PSI = PSI_set_next_stim(PSI, stimIdx)
 
+    return PSI
 
+def PSI_set_next_stim(PSI, stimIdx):
+    PSI["xnext"] = PSI["stims"][stimIdx]
+    if PSI["par"]["stimScale"] == "Logarithmic":
+        PSI["xnextLinear"] = exp(PSI["xnext"])
+    else:
+        PSI["xnextLinear"] = PSI["xnext"]
+
+    return PSI
+
+def PSIEstGuessRate_close(PSI):
+    """
+    Stop the worker processes and release the shared memory used
+    by a PSI object set up with `nProcesses` > 1. It has no effect
+    otherwise.
+    """
+    if "workers" in PSI:
+        PSI["p"] = PSI["p"].copy()
+        if isinstance(PSI["lik_corr"], np.memmap) == False:
+            PSI["lik_corr"] = PSI["lik_corr"].copy()
+        PSI["workers"].close()
+        del PSI["workers"]
+
+class PSIWorkerPool(object):
+    """
+    Pool of worker processes computing the expected entropy of the
+    posterior for blocks of stimulus levels.
+
+    The posterior and the likelihood table are kept in shared memory
+    (or, for cached likelihood tables, in the memory mapped cache file)
+    so that they are not copied to the workers at each trial. The
+    posterior must be updated in place through the `p` attribute.
+
+    Parameters
+    ----------
+    p : array of floats
+        The initial posterior over the parameter space.
+    likShape : tuple of ints
+        Shape of the likelihood table (stimulus levels by parameter space).
+    nProcesses : int
+        Number of worker processes.
+    marginalize : tuple of ints or None
+        Axes of the parameter space to marginalize over.
+    maxChunkMem : float
+        Approximate maximum amount of working memory (in MB) used by
+        each worker.
+
+    """
+    def __init__(self, p, likShape, nProcesses, marginalize=None, maxChunkMem=4):
+        self.nProcesses = nProcesses
+        self.marginalize = marginalize
+        self.maxChunkMem = maxChunkMem
+        self.likShape = tuple(likShape)
+        self.pShm = shared_memory.SharedMemory(create=True, size=p.nbytes)
+        self.p = np.ndarray(p.shape, dtype=np.float64, buffer=self.pShm.buf)
+        self.p[...] = p
+        self.likShm = shared_memory.SharedMemory(create=True, size=int(np.prod(likShape))*8)
+        self.lik_corr = np.ndarray(self.likShape, dtype=np.float64, buffer=self.likShm.buf)
+        self.pool = None
+        #contiguous blocks of stimulus levels, two per process
+        #to even out the load
+        nStims = likShape[0]
+        edges = np.linspace(0, nStims, min(nStims, 2*nProcesses)+1).astype(int)
+        self.blocks = [(int(edges[i]), int(edges[i+1])) for i in range(len(edges)-1)]
+        self._finalizer = weakref.finalize(self, PSIWorkerPool._release, self.pShm, self.likShm, [None])
+
+    def setLikCorr(self, lik_corr):
+        """
+        Start the worker processes once the likelihood table is filled.
+        If `lik_corr` is a memory mapped file the workers map the file
+        and the shared memory block for the table is released.
+        """
+        if isinstance(lik_corr, np.memmap):
+            likSource = lik_corr.filename
+            self.lik_corr = None
+            self.likShm.close()
+            self.likShm.unlink()
+            self.likShm = None
+        else:
+            if lik_corr is not self.lik_corr:
+                self.lik_corr[...] = lik_corr
+            likSource = self.likShm.name
+        #spawn the workers rather than forking the (possibly multi-threaded) GUI process
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = ctx.Pool(self.nProcesses, initializer=PSIWorker_init,
+                             initargs=(self.pShm.name, likSource, self.p.shape, self.likShape,
+                                       self.marginalize, self.maxChunkMem))
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, PSIWorkerPool._release, self.pShm, self.likShm, [self.pool])
+
+    def expectedEntropy(self):
+        """
+        Compute the probability of a correct and of an incorrect response
+        and the expected entropy following each response for all stimulus
+        levels. See `expectedEntropyChunked` in `PSI_method`.
+        """
+        res = self.pool.starmap(PSIWorker_entropy, self.blocks)
+        return tuple([np.concatenate([r[k] for r in res]) for k in range(4)])
+
+    def close(self):
+        self.p = None
+        self.lik_corr = None
+        self._finalizer()
+
+    @staticmethod
+    def _release(pShm, likShm, pool):
+        if pool[0] is not None:
+            pool[0].terminate()
+            pool[0].join()
+        for shm in (pShm, likShm):
+            if shm is not None:
+                shm.close()
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+
+#arrays attached by each worker process
+_workerState = {}
+
+def PSIWorker_init(pName, likSource, pShape, likShape, marginalize, maxChunkMem):
+    pShm = shared_memory.SharedMemory(name=pName)
+    _workerState["shm"] = [pShm]
+    _workerState["p"] = np.ndarray(pShape, dtype=np.float64, buffer=pShm.buf)
+    if likSource.endswith(".npy"):
+        _workerState["lik_corr"] = np.load(likSource, mmap_mode='r')
+    else:
+        likShm = shared_memory.SharedMemory(name=likSource)
+        _workerState["shm"].append(likShm)
+        _workerState["lik_corr"] = np.ndarray(likShape, dtype=np.float64, buffer=likShm.buf)
+    _workerState["marginalize"] = marginalize
+    _workerState["maxChunkMem"] = maxChunkMem
+
+def PSIWorker_entropy(i0, i1):
+    return expectedEntropyChunked(_workerState["p"], _workerState["lik_corr"][i0:i1],
+                                  _workerState["marginalize"], _workerState["maxChunkMem"])
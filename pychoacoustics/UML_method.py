@@ -19,14 +19,14 @@
 # - Shen, Y., & Richards, V. (2012). A maximum-likelihood procedure for estimating psychometric functions: Thresholds, slopes, and lapses of attention. The Journal of the Acoustical Society of America, 132, 957–967.
 # - Shen, Y., Dai, W., & Richards, V. M. (2014). A MATLAB toolbox for the efficient estimation of the psychometric function using the updated maximum-likelihood adaptive procedure. Behavior Research Methods, 13–26.
 
-import copy, random, scipy
+import copy, random, scipy, time
 import numpy as np
 from numpy import arange, exp, inf, linspace, logspace, log, log10, meshgrid, pi, ravel
 from scipy.stats import lognorm, norm #gamma conflicts with gamma variable
 from scipy import stats
 from scipy.special import erf
 from .pysdt import*
-from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD, betaABFromMeanSTD, generalizedBetaABFromMeanSTD
+from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD, betaABFromMeanSTD, generalizedBetaABFromMeanSTD, adaptGridBox
 
 
 def setupUML(model="Logistic", swptRule="Up-Down", nDown=2, centTend="Mean", stimScale="Linear", x0=None, xLim=(-10, 10), 
@@ -34,7 +34,8 @@ def setupUML(model="Logistic", swptRule="Up-Down", nDown=2, centTend="Mean", sti
              betaLim=(0.1,10), betaStep=0.1, betaSpacing="Linear", betaDist="Uniform", betaMu=1, betaSTD=2,
              gamma=0.5,
              lambdaLim=(0,0.2), lambdaStep=0.01, lambdaSpacing="Linear", lambdaDist="Uniform", lambdaMu=0, lambdaSTD=0.1,
-             suggestedLambdaSwpt=10, lambdaSwptPC=0.99):
+             suggestedLambdaSwpt=10, lambdaSwptPC=0.99, swptEngine="fmin",
+             adaptiveGrid=False, adaptiveGridTol=1e-5, adaptiveGridStart=20):
 
     
     UML = {}
@@ -81,6 +82,18 @@ def setupUML(model="Logistic", swptRule="Up-Down", nDown=2, centTend="Mean", sti
 
     UML["par"]["suggestedLambdaSwpt"] = suggestedLambdaSwpt
     UML["par"]["lambdaSwptPC"] = lambdaSwptPC
+    #"fmin" finds the sweet points with Nelder-Mead searches at each trial,
+    #"Fast" uses fast_sweetpoints, with the standard sweet points stored
+    #in UML["swptCache"]
+    UML["par"]["swptEngine"] = swptEngine
+    UML["swptCache"] = {}
+    #if adaptiveGrid is True, from trial adaptiveGridStart onwards the
+    #parameter grid is cropped to the box outside of which the posterior
+    #mass is at most adaptiveGridTol (see `stats_utils.adaptGridBox`),
+    #and restored to the full grid if the posterior moves out of the box
+    UML["par"]["adaptiveGrid"] = adaptiveGrid
+    UML["par"]["adaptiveGridTol"] = adaptiveGridTol
+    UML["par"]["adaptiveGridStart"] = adaptiveGridStart
     
     if stimScale == "Logarithmic":
         UML["par"]["x0"] = log(x0)
@@ -93,6 +106,10 @@ def setupUML(model="Logistic", swptRule="Up-Down", nDown=2, centTend="Mean", sti
         UML["par"]["suggestedLambdaSwpt"] = log(UML["par"]["suggestedLambdaSwpt"])
 
     UML = setP0(UML)
+    #start and stop indexes of the (possibly cropped) parameter grid
+    #in the full grid along each axis
+    UML["gridBox"] = np.array([[0, n] for n in UML["p"].shape])
+    UML["gridFullShape"] = UML["p"].shape
     UML["x"] = np.array([])
     UML["xnext"] = copy.copy(UML["par"]["x0"])
     UML["r"] = np.array([])
@@ -196,6 +213,24 @@ def setPrior(phi, s):
     return p0
 
 
+def UML_log_lik(UML, x, r):
+    #log likelihood of response r to stimulus level x at each point
+    #of the parameter grid
+    if UML["par"]["model"] == "Logistic":
+        logLik = \
+                   log(prepare_prob(logisticPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
+                   log(prepare_prob(1-logisticPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
+    elif UML["par"]["model"] == "Gaussian":
+        logLik = \
+                   log(prepare_prob(gaussianPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
+                   log(prepare_prob(1-gaussianPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
+    elif UML["par"]["model"] == "Weibull":
+        logLik = \
+                   log(prepare_prob(weibullPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
+                   log(prepare_prob(1-weibullPsy(x, UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
+
+    return logLik
+
 def prepare_prob(p):
     p = p*(1-1e-10)
     p = p/p.sum()
@@ -208,21 +243,12 @@ def UML_update(UML, r):
     UML["x"] = np.append(UML["x"], UML["xnext"])
     UML["r"] = np.append(UML["r"], r)
 
-    if UML["par"]["model"] == "Logistic":
-        UML["p"] = UML["p"] + \
-                   log(prepare_prob(logisticPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
-                   log(prepare_prob(1-logisticPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
-    elif UML["par"]["model"] == "Gaussian":
-        UML["p"] = UML["p"] + \
-                   log(prepare_prob(gaussianPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
-                   log(prepare_prob(1-gaussianPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
-    elif UML["par"]["model"] == "Weibull":
-        UML["p"] = UML["p"] + \
-                   log(prepare_prob(weibullPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**r) + \
-                   log(prepare_prob(1-weibullPsy(UML["xnext"], UML["a"], UML["b"], UML["gamma"], UML["l"]))**(1-r))
+    UML["p"] += UML_log_lik(UML, UML["xnext"], r)
 
 
-    UML["p"] = UML["p"]-np.max(np.max(np.max(UML["p"])))
+    UML["p"] -= np.max(UML["p"])
+    if UML["par"]["adaptiveGrid"] == True and UML["n"] >= UML["par"]["adaptiveGridStart"]:
+        UML = UML_adapt_grid(UML)
   
     if UML["par"]["method"] == "Mode":
         # idx = np.where(UML["p"] == np.max(UML["p"]))
@@ -255,12 +281,16 @@ def UML_update(UML, r):
     UML["est_slope"] = UML["phi"][UML["phi"].shape[0]-1, 1]
     UML["est_lapse"] = UML["phi"][UML["phi"].shape[0]-1, 3]
 
-    if UML["par"]["model"] == "Logistic":
+    t0 = time.perf_counter()
+    if UML["par"]["swptEngine"] == "Fast":
+        swpt = fast_sweetpoints(UML["phi"][-1,:], UML["par"]["model"], UML["swptCache"])
+    elif UML["par"]["model"] == "Logistic":
         swpt = logit_sweetpoints(UML["phi"][-1,:])
     elif UML["par"]["model"] == "Gaussian":
         swpt = gaussian_sweetpoints(UML["phi"][-1,:])
     elif UML["par"]["model"] == "Weibull":
         swpt = weibull_sweetpoints(UML["phi"][-1,:])
+    UML["swptTime"] = time.perf_counter() - t0
 
     est_alpha = UML["phi"][UML["phi"].shape[0]-1, 0] #if scale is Logarithmic this needs to stay in log coordinates
     if UML["par"]["model"] == "Logistic":
@@ -326,6 +356,173 @@ def UML_update(UML, r):
         
     return UML
 
+def setupUMLStack(nTracks, x0=None, **kwargs):
+    """
+    Set up several interleaved UML tracks sharing the same psychometric
+    function model and parameter space.
+
+    The log posteriors of all tracks are stored in a single array, with
+    the track along the first axis. Each track is a UML dictionary, as
+    returned by `setupUML`, whose posterior is a view of the stacked array,
+    so that it can be passed to any of the UML functions.
+
+    Parameters
+    ----------
+    nTracks : int
+        Number of tracks.
+    x0 : float or list of floats
+        Starting stimulus level, either common to all tracks or one for
+        each track.
+    **kwargs :
+        Any other argument accepted by `setupUML`. `adaptiveGrid` can
+        be used only with a single track.
+
+    Returns
+    -------
+    stack : dict
+        With keys "p" (the stacked log posteriors), "nTracks", and
+        "tracks" (the list of UML dictionaries of the tracks).
+
+    """
+    if kwargs.get("adaptiveGrid", False) == True and nTracks > 1:
+        raise ValueError("the adaptive grid cannot be used with more than one stacked UML track")
+    if np.isscalar(x0) or x0 == None:
+        x0 = [x0 for i in range(nTracks)]
+
+    stack = {}
+    stack["nTracks"] = nTracks
+    stack["tracks"] = []
+    for i in range(nTracks):
+        UML = setupUML(x0=x0[i], **kwargs)
+        if i == 0:
+            stack["p"] = np.empty((nTracks,) + UML["p"].shape)
+            swptCache = UML["swptCache"]
+        stack["p"][i] = UML["p"]
+        UML["p"] = stack["p"][i]
+        UML["swptCache"] = swptCache #the sweet points of the standard function can be shared
+        stack["tracks"].append(UML)
+
+    return stack
+
+def UMLStack_update(stack, track, r):
+    """
+    Update the posterior of one track of a UML stack after a response,
+    and select the next stimulus level for that track.
+
+    Parameters
+    ----------
+    stack : dict
+        The UML stack returned by `setupUMLStack`.
+    track : int
+        Index of the track that was presented in the trial.
+    r : int
+        The response, 1 if correct, 0 if incorrect.
+
+    Returns
+    -------
+    stack : dict
+
+    """
+    stack["tracks"][track] = UML_update(stack["tracks"][track], r)
+    if not np.shares_memory(stack["p"], stack["tracks"][track]["p"]):
+        #the grid of a single track has been cropped or restored, which
+        #allocates a new posterior (possibly with the same shape)
+        stack["p"] = stack["tracks"][track]["p"][np.newaxis]
+
+    return stack
+
+def UMLStack_set_track(stack, track, UML):
+    """
+    Replace the state of one track of a UML stack, e.g. with the
+    state restored from a checkpoint.
+
+    Parameters
+    ----------
+    stack : dict
+        The UML stack returned by `setupUMLStack`.
+    track : int
+        Index of the track.
+    UML : dict
+        The new UML dictionary of the track.
+
+    Returns
+    -------
+    stack : dict
+
+    """
+    if stack["nTracks"] == 1:
+        stack["p"] = UML["p"][np.newaxis]
+    else:
+        stack["p"][track] = UML["p"]
+    UML["p"] = stack["p"][track]
+    stack["tracks"][track] = UML
+
+    return stack
+
+def UMLStack_estimates(stack):
+    """
+    Compute the posterior mean of the parameters of all the tracks
+    of a UML stack at once.
+
+    Parameters
+    ----------
+    stack : dict
+        The UML stack returned by `setupUMLStack`.
+
+    Returns
+    -------
+    phi : array of floats
+        One row for each track with the midpoint, slope, guess rate
+        and lapse rate estimates.
+
+    """
+    UML = stack["tracks"][0]
+    nTracks = stack["nTracks"]
+    pdf = exp(stack["p"] - stack["p"].reshape((nTracks, -1)).max(axis=1).reshape((-1,) + (1,)*UML["a"].ndim))
+    pdf = pdf.reshape((nTracks, -1))
+    pdf /= pdf.sum(axis=1)[:,None]
+    phi = np.zeros((nTracks, 4))
+    phi[:,0] = pdf @ UML["a"].reshape(-1)
+    phi[:,1] = pdf @ UML["b"].reshape(-1)
+    phi[:,2] = UML["gamma"]
+    phi[:,3] = pdf @ UML["l"].reshape(-1)
+
+    return phi
+
+def UML_adapt_grid(UML):
+    #crop the parameter grid to the posterior, or restore the full grid
+    #if the posterior has moved out of the cropped grid
+    expand, box = adaptGridBox(exp(UML["p"]), UML["par"]["adaptiveGridTol"], UML["gridBox"], UML["gridFullShape"])
+    if expand == True:
+        UML = UML_expand_grid(UML)
+        expand, box = adaptGridBox(exp(UML["p"]), UML["par"]["adaptiveGridTol"], UML["gridBox"], UML["gridFullShape"])
+    if box != None:
+        UML = UML_crop_grid(UML, box)
+
+    return UML
+
+def UML_crop_grid(UML, box):
+    #crop the parameter grid to a box (a tuple of slices) of the current grid
+    for key in ["p", "a", "b", "l"]:
+        UML[key] = UML[key][box].copy()
+    UML["alpha"] = UML["alpha"][box[0]]
+    UML["beta"] = UML["beta"][box[1]]
+    UML["lambda"] = UML["lambda"][box[2]]
+    UML["gridBox"] = np.array([[UML["gridBox"][ax][0]+box[ax].start, UML["gridBox"][ax][0]+box[ax].stop] for ax in range(len(box))])
+
+    return UML
+
+def UML_expand_grid(UML):
+    #restore the full parameter grid, and recompute the posterior
+    #on it from the trial history
+    UML = setP0(UML)
+    for i in range(UML["n"]):
+        UML["p"] += UML_log_lik(UML, UML["x"][i], UML["r"][i])
+    UML["p"] -= np.max(UML["p"])
+    UML["gridBox"] = np.array([[0, n] for n in UML["p"].shape])
+
+    return UML
+
 def logit_sweetpoints(phi):
 
     def alphavar_est(x):
@@ -372,9 +569,9 @@ def logit_sweetpoints(phi):
 
     swpts = np.zeros(3)
 
-    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=alpha-10, disp=False)
-    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=alpha+10, disp=False)
-    swpts[1] = scipy.optimize.fmin(alphavar_est, x0=alpha, disp=False)
+    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=alpha-10, disp=False)[0]
+    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=alpha+10, disp=False)[0]
+    swpts[1] = scipy.optimize.fmin(alphavar_est, x0=alpha, disp=False)[0]
     swpts.sort()
 
     return swpts
@@ -423,9 +620,9 @@ def weibull_sweetpoints(phi):
     # swpts[1] = fminsearch(@(x) kvar_est(x,k,beta,gamma,lambdax),k,opt)
     
     swpts = np.zeros(3)
-    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=k/2, disp=False)
-    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=k*2, disp=False)
-    swpts[1] = scipy.optimize.fmin(kvar_est, x0=k, disp=False)
+    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=k/2, disp=False)[0]
+    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=k*2, disp=False)[0]
+    swpts[1] = scipy.optimize.fmin(kvar_est, x0=k, disp=False)[0]
     swpts = np.maximum(np.sort(swpts), 0)
 
     return swpts
@@ -477,3 +674,172 @@ def gaussian_sweetpoints(phi):
     swpts = np.array([swpt_sigma_L, swpt_mu, swpt_sigma_H])
 
     return swpts
+
+#resolution to which gamma and lambda are rounded before computing the
+#standard sweet points, and maximum number of them kept in a cache
+swptParRes = 1e-3
+swptCacheMaxSize = 256
+
+def fast_sweetpoints(phi, model, cache=None):
+    """
+    Compute the sweet points of the psychometric function without
+    a Nelder-Mead search for each parameter estimate.
+
+    The sweet points depend on the midpoint and slope only through a change
+    of scale: for the logistic and gaussian functions they are
+    alpha + u/beta and mu + z*sigma respectively, and for the Weibull
+    function they are k*w**(1/beta), where u, z, and w are the sweet
+    points of the function with standard midpoint and slope, which depend
+    only on gamma and lambda. These are computed once for each
+    (gamma, lambda) pair, with gamma and lambda rounded to `swptParRes`
+    (their posterior estimates change slightly at every trial), and
+    the `swptCacheMaxSize` most recently used are stored in `cache`. The alpha sweet point
+    of the logistic function is obtained in closed form as the root of a
+    cubic polynomial; the other ones with a bounded scalar minimization.
+
+    Parameters
+    ----------
+    phi : array of floats
+        The parameters (midpoint, slope, guess, lapse) of the
+        psychometric function.
+    model : string
+        "Logistic", "Gaussian", or "Weibull".
+    cache : dict
+        Dictionary in which the standard sweet points are stored.
+        If None, they are recomputed each time.
+
+    Returns
+    -------
+    swpts : array of floats
+        The three sweet points, in ascending order.
+
+    """
+    if cache == None:
+        cache = {}
+    gamma = round(float(phi[2])/swptParRes)*swptParRes
+    lambdax = round(float(phi[3])/swptParRes)*swptParRes
+    key = (model, gamma, lambdax)
+    if key in cache:
+        #move it to the end of the dictionary, as most recently used
+        std_swpts = cache.pop(key)
+    else:
+        std_swpts = standard_sweetpoints(model, gamma, lambdax)
+        if len(cache) >= swptCacheMaxSize:
+            del cache[next(iter(cache))]
+    cache[key] = std_swpts
+
+    if model == "Logistic":
+        swpts = phi[0] + std_swpts/phi[1]
+    elif model == "Gaussian":
+        swpts = phi[0] + std_swpts*phi[1]
+    elif model == "Weibull":
+        swpts = np.maximum(phi[0]*std_swpts**(1/phi[1]), 0)
+    swpts.sort()
+
+    return swpts
+
+def standard_sweetpoints(model, gamma, lambdax):
+    #sweet points (low slope, midpoint, high slope) for the psychometric
+    #function with midpoint 0 (1 for the Weibull) and slope 1.
+    #The variance functions are the ones of logit_sweetpoints,
+    #gaussian_sweetpoints, and weibull_sweetpoints with these parameters
+    c = 1-gamma-lambdax
+
+    if model == "Logistic":
+        def betavar_est(u):
+            e = exp(u)
+            return -exp(-2*u)*(1+e)**2*(-gamma+(lambdax-1)*e)*(1-gamma+lambdax*e)/(u**2*c**2)
+        #the alpha variance P(1-P)/P'^2 is minimum where
+        #c*s*(1-s)*(1-2P) + 2*P*(1-P)*(2s-1) = 0, with s the logistic
+        #function and P = gamma + c*s, a cubic in s
+        s = np.polynomial.Polynomial([0, 1])
+        P = gamma + c*s
+        roots = (c*s*(1-s)*(1-2*P) + 2*P*(1-P)*(2*s-1)).roots()
+        roots = np.real(roots[(abs(np.imag(roots)) < 1e-9) & (np.real(roots) > 0) & (np.real(roots) < 1)])
+        u_roots = log(roots/(1-roots))
+        e = exp(u_roots)
+        alphavar = -exp(-2*u_roots)*(1+e)**2*(-gamma+(lambdax-1)*e)*(1-gamma+lambdax*e)/c**2
+        swpt_mid = u_roots[np.argmin(alphavar)]
+        swpt_lo = bounded_min(betavar_est, (-40, 0))
+        swpt_hi = bounded_min(betavar_est, (0, 40))
+    elif model == "Gaussian":
+        def psycfunc(z):
+            return gamma+(c/2)*(1+erf(z/sqrt(2)))
+        def sigma2_mu(z):
+            return psycfunc(z)*(1-psycfunc(z))/(c/sqrt(2*pi)*exp(-z**2/2))**2
+        def sigma2_sigma(z):
+            return psycfunc(z)*(1-psycfunc(z))/(c*z/sqrt(2*pi)*exp(-z**2/2))**2
+        swpt_mid = bounded_min(sigma2_mu, (-10, 10))
+        swpt_lo = bounded_min(sigma2_sigma, (-10, 0))
+        swpt_hi = bounded_min(sigma2_sigma, (0, 10))
+    elif model == "Weibull":
+        #minimize over t = log(w) to keep w positive
+        def kvar_est(t):
+            w = exp(t)
+            return -w**(-2)*(-1+gamma-exp(w)*(-1+lambdax)+lambdax)*(-1+gamma+lambdax-exp(w)*lambdax)/c**2
+        def betavar_est(t):
+            return kvar_est(t)/t**2
+        swpt_mid = exp(bounded_min(kvar_est, (-20, 5)))
+        swpt_lo = exp(bounded_min(betavar_est, (-20, 0)))
+        swpt_hi = exp(bounded_min(betavar_est, (0, 5)))
+
+    return np.array([swpt_lo, swpt_mid, swpt_hi])
+
+def bounded_min(fun, bounds):
+    #the variance functions are infinite at the bounds that are sweet
+    #points of another parameter, move slightly away from them
+    eps = 1e-9
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        res = scipy.optimize.minimize_scalar(fun, bounds=(bounds[0]+eps, bounds[1]-eps),
+                                             method="bounded", options={"xatol": 1e-10})
+    return res.x
+
+def sweetpoints_timing(phi, model, nRep=20):
+    """
+    Compare the time taken to compute the sweet points with
+    the Nelder-Mead searches of `logit_sweetpoints`,
+    `gaussian_sweetpoints`, or `weibull_sweetpoints`, and
+    with `fast_sweetpoints`.
+
+    Parameters
+    ----------
+    phi : array of floats
+        The parameters (midpoint, slope, guess, lapse) of the
+        psychometric function.
+    model : string
+        "Logistic", "Gaussian", or "Weibull".
+    nRep : int
+        Number of repetitions over which the times are averaged.
+
+    Returns
+    -------
+    timing : dict
+        With keys "fmin" (mean time in seconds with the Nelder-Mead
+        searches), "fast" (mean time with `fast_sweetpoints` without
+        memoization), "fastCached" (mean time with memoization), and
+        "maxDiff" (maximum absolute difference between the sweet points).
+
+    """
+    if model == "Logistic":
+        fmin_sweetpoints = logit_sweetpoints
+    elif model == "Gaussian":
+        fmin_sweetpoints = gaussian_sweetpoints
+    elif model == "Weibull":
+        fmin_sweetpoints = weibull_sweetpoints
+
+    t0 = time.perf_counter()
+    for i in range(nRep):
+        swpts_fmin = np.ravel(fmin_sweetpoints(phi))
+    t1 = time.perf_counter()
+    for i in range(nRep):
+        swpts_fast = fast_sweetpoints(phi, model)
+    t2 = time.perf_counter()
+    cache = {}
+    for i in range(nRep):
+        fast_sweetpoints(phi, model, cache)
+    t3 = time.perf_counter()
+
+    timing = {"fmin": (t1-t0)/nRep, "fast": (t2-t1)/nRep, "fastCached": (t3-t2)/nRep,
+              "maxDiff": np.max(abs(swpts_fmin-swpts_fast))}
+
+    return timing
@@ -19,7 +19,7 @@
 # - Shen, Y., & Richards, V. (2012). A maximum-likelihood procedure for estimating psychometric functions: Thresholds, slopes, and lapses of attention. The Journal of the Acoustical Society of America, 132, 957–967.
 # - Shen, Y., Dai, W., & Richards, V. M. (2014). A MATLAB toolbox for the efficient estimation of the psychometric function using the updated maximum-likelihood adaptive procedure. Behavior Research Methods, 13–26.
 
-import copy, random, scipy
+import copy, random, scipy, time
 import numpy as np
 from numpy import arange, exp, linspace, logspace, log, log10, meshgrid, pi, ravel
 from scipy.stats import lognorm, norm #gamma conflicts with gamma variable
@@ -27,6 +27,7 @@ from scipy import stats
 from scipy.special import erf
 from .pysdt import*
 from .stats_utils import gammaShRaFromMeanSD, gammaShRaFromModeSD
+from .UML_method import fast_sweetpoints
 
 
 def setupUMLEstGuessRate(model="Logistic", swptRule="Up-Down", nDown=2, centTend="Mean", stimScale="Linear", x0=None, xLim=(-10, 10), 
@@ -34,7 +35,7 @@ def setupUMLEstGuessRate(model="Logistic", swptRule="Up-Down", nDown=2, centTend
                          betaLim=(0.1,10), betaStep=0.1, betaSpacing="Linear", betaDist="Uniform", betaMu=1, betaSTD=2,
                          gammaLim=(0,0.2), gammaStep=0.01, gammaSpacing="Linear", gammaDist="Uniform", gammaMu=0, gammaSTD=0.1,
                          lambdaLim=(0,0.2), lambdaStep=0.01, lambdaSpacing="Linear", lambdaDist="Uniform", lambdaMu=0, lambdaSTD=0.1,
-                         suggestedLambdaSwpt=10, lambdaSwptPC=0.99):
+                         suggestedLambdaSwpt=10, lambdaSwptPC=0.99, swptEngine="fmin"):
 
     
     UML = {}
@@ -89,6 +90,11 @@ def setupUMLEstGuessRate(model="Logistic", swptRule="Up-Down", nDown=2, centTend
 
     UML["par"]["suggestedLambdaSwpt"] = suggestedLambdaSwpt
     UML["par"]["lambdaSwptPC"] = lambdaSwptPC
+    #"fmin" finds the sweet points with Nelder-Mead searches at each trial,
+    #"Fast" uses fast_sweetpoints, with the standard sweet points stored
+    #in UML["swptCache"]
+    UML["par"]["swptEngine"] = swptEngine
+    UML["swptCache"] = {}
     
     if stimScale == "Logarithmic":
         UML["par"]["x0"] = log(x0)
@@ -244,12 +250,16 @@ def UMLEstGuessRate_update(UML, r):
     UML["est_guess"] = UML["phi"][UML["phi"].shape[0]-1, 2]
     UML["est_lapse"] = UML["phi"][UML["phi"].shape[0]-1, 3]
 
-    if UML["par"]["model"] == "Logistic":
+    t0 = time.perf_counter()
+    if UML["par"]["swptEngine"] == "Fast":
+        swpt = fast_sweetpoints(UML["phi"][-1,:], UML["par"]["model"], UML["swptCache"])
+    elif UML["par"]["model"] == "Logistic":
         swpt = logit_sweetpoints(UML["phi"][-1,:])
     elif UML["par"]["model"] == "Gaussian":
         swpt = gaussian_sweetpoints(UML["phi"][-1,:])
     elif UML["par"]["model"] == "Weibull":
         swpt = weibull_sweetpoints(UML["phi"][-1,:])
+    UML["swptTime"] = time.perf_counter() - t0
 
     est_alpha = UML["phi"][UML["phi"].shape[0]-1, 0] #if scale is Logarithmic this needs to stay in log coordinates
     if UML["par"]["model"] == "Logistic":
@@ -363,9 +373,9 @@ def logit_sweetpoints(phi):
 
     swpts = np.zeros(3)
 
-    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=alpha-10)
-    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=alpha+10)
-    swpts[1] = scipy.optimize.fmin(alphavar_est, x0=alpha)
+    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=alpha-10)[0]
+    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=alpha+10)[0]
+    swpts[1] = scipy.optimize.fmin(alphavar_est, x0=alpha)[0]
     swpts.sort()
 
     return swpts
@@ -414,9 +424,9 @@ def weibull_sweetpoints(phi):
     # swpts[1] = fminsearch(@(x) kvar_est(x,k,beta,gamma,lambdax),k,opt)
     
     swpts = np.zeros(3)
-    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=k/2)
-    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=k*2)
-    swpts[1] = scipy.optimize.fmin(kvar_est, x0=k)
+    swpts[0] = scipy.optimize.fmin(betavar_est1, x0=k/2)[0]
+    swpts[2] = scipy.optimize.fmin(betavar_est2, x0=k*2)[0]
+    swpts[1] = scipy.optimize.fmin(kvar_est, x0=k)[0]
     swpts = np.maximum(np.sort(swpts), 0)
 
     return swpts
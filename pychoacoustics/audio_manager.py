@@ -17,12 +17,18 @@
 #    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
 
 from tempfile import mkstemp
-import platform, os, subprocess 
+import itertools, platform, os, subprocess 
 from numpy import ceil, concatenate, floor, float32, int16, int32, mean, sqrt, transpose, zeros
 import numpy as np
 #from .multirate import resample
 from .nnresample.nnresample import resample
 from .pyqtver import*
+from .sound_stream import defaultBlockSize
+from .utils_pcm import PCMEncoder, encodeSegments, floatToPCM
+from .output_stream import closeOutputStream, getOutputStream
+from .pipe_player import getPipePlayer
+from .trigger_code import multiplexSegmentsPCM, multiplexTrigger, nTriggerBits, triggerPulsePCM
+from . import sndlib
 
 if pyqtversion == 5:
     from PyQt5.QtCore import QThread
@@ -70,114 +76,59 @@ class audioManager():
     def initializeAudio(self):
         print("Initializing audio")
         self.playCmd = self.prm['pref']['sound']['playCommand']
-        
-        try: #if alsaaudio device was open close it
-            self.device.close()
-        except:
-            print(sys.exc_info())
-
-        try: #if paManager was open close it
-            self.paManager.terminate() #actually closing the stream introduces offset clicks!
-        except:
-            pass
+        sndlib.setSndPrecision(self.prm['pref']['sound']['precision'])
 
+        #the output stream is kept open for the session, and is
+        #replaced only if the backend or the device change
         if self.playCmd == "alsaaudio":
-            try:
-                self.device = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL, device=self.prm["pref"]["sound"]["alsaaudioDevice"])
-                print("Opening preferred alsaaudio device")
-            except:
-                self.device = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL, device=self.listAlsaaudioPlaybackCards()[0])
-                print("Opening first alsaaudio device")
+            self.outputStream = getOutputStream("alsaaudio", self.prm["pref"]["sound"]["alsaaudioDevice"])
         elif self.playCmd == "pyaudio":
-            self.paManager = pyaudio.PyAudio()
-
+            self.outputStream = getOutputStream("pyaudio", self.prm["pref"]["sound"]["pyaudioDevice"])
+        else:
+            closeOutputStream()
+            self.outputStream = None
+
+    def usePipePlayer(self):
+        """
+        Return True if the sounds are sent to the play command through
+        its standard input (see `pipe_player`), rather than through
+        temporary WAV files.
+        """
+        return self.prm["pref"]["sound"]["pipePlayback"] == True and getPipePlayer().supports(str(self.playCmd))
             
     def playSound(self, snd, fs, nbits, writewav, fname):
         #wavmanager = self.prm["pref"]["sound"]["wavmanager"]
         playCmd = str(self.playCmd)
         enc = "pcm"+ str(nbits)
+        pipe = self.usePipePlayer()
         if writewav == True:
             fname = fname
-        else:
+        elif playCmd not in ['alsaaudio', 'pyaudio'] and pipe == False:
             (hnl, fname) = mkstemp("tmp_snd.wav")
 
-        if playCmd in ['alsaaudio', 'pyaudio']:#write wav before appending zeros in this case
+        if playCmd in ['alsaaudio', 'pyaudio'] or pipe == True:#write wav before appending zeros in this case
             if writewav == True:
                 self.wavwrite(snd, fs, nbits, fname)
 
         if self.prm["pref"]["sound"]["appendSilence"] > 0:
             duration = self.prm["pref"]["sound"]["appendSilence"]/1000 #convert from ms to sec
             nSamples = int(round(duration * fs))
-            silenceToAppend = zeros((nSamples, 2))
+            silenceToAppend = zeros((nSamples, snd.shape[1]), dtype=snd.dtype)
             snd = concatenate((snd, silenceToAppend), axis=0)
             
-        #prep params for alsaaudio or pyaudio
         if playCmd in ['alsaaudio', 'pyaudio']:
-            nSamples = snd.shape[0]
             nChannels = snd.shape[1]
             bufferSize = self.prm["pref"]["sound"]["bufferSize"]
-            if bufferSize < 1:
-                bufferSize = nSamples
-                nSeg = 1
-            else:
-                nSeg = int(ceil(nSamples/bufferSize))
-                padSize = (nSeg*bufferSize) - nSamples
-                pad = zeros((padSize, nChannels))
-                snd = concatenate((snd, pad), axis=0)
-            if nbits == 16:
-                data = snd*(2**15)
-                data[np.where(data>=2**15)] = 2**15-1
-                data = data.astype(int16)
-            elif nbits == 24:
-                d24_32 = snd*(2**23)
-                d24_32[np.where(d24_32>=2**23)] = 2**23-1
-                d24_32 = d24_32.astype(int32)
-                #Shift first 0 bits, then 8, then 16, to get 24 bit little-endian.
-                d8_triplets = (d24_32.reshape(d24_32.shape + (1,)) >> np.array([0, 8, 16])) & 255  
-                data = d8_triplets.astype(np.uint8)
-            elif nbits == 32:
-                data = snd*(2**31)
-                data[np.where(data>=2**31)] = 2**31-1
-                data = data.astype(int32)
-        
-        if playCmd == "alsaaudio":
-            device = self.device
-            device.setchannels(nChannels)
-            device.setrate(fs)
-            device.setperiodsize(bufferSize)
-            if nbits == 16:
-                device.setformat(alsaaudio.PCM_FORMAT_S16_LE)
-            elif nbits == 24:
-                device.setformat(alsaaudio.PCM_FORMAT_S24_3LE)
-            elif nbits == 32:
-                device.setformat(alsaaudio.PCM_FORMAT_S32_LE)
-            for i in range(nSeg):
-                thisData = data[i*bufferSize:((i*bufferSize)+bufferSize)][:]
-                device.write(thisData)
-        elif playCmd == "pyaudio":
-            if nbits == 16:
-                sampleFormat = pyaudio.paInt16
-            elif nbits == 24:
-                sampleFormat = pyaudio.paInt24
-            elif nbits == 32:
-                sampleFormat = pyaudio.paInt32
-            try:
-                self.paStream.start_stream()
-            except:
-                self.paStream = self.paManager.open(format=sampleFormat,
-                                             channels = nChannels,
-                                             rate = fs,
-                                             output = True,
-                                             input_device_index = None,
-                                             output_device_index=self.prm["pref"]["sound"]["pyaudioDevice"],
-                                             frames_per_buffer=bufferSize)
-                self.paStream.start_stream()
-            for i in range(nSeg):
-                thisData = data[i*bufferSize:((i*bufferSize)+bufferSize)][:]
-                self.paStream.write(thisData, num_frames=bufferSize)
-            #self.paStream.stop_stream()
-            #stream.close()
-          
+            if bufferSize < 1: #the output stream needs a fixed period size
+                bufferSize = defaultBlockSize
+            self.openPlaybackDevice(fs, nChannels, nbits, bufferSize)
+            #the sound is converted one period at a time, the output
+            #stream pads the last period with zeros
+            for data in encodeSegments(snd, nbits, bufferSize):
+                self.writePlaybackData(data, bufferSize)
+            self.outputStream.drain()
+        elif pipe == True:
+            getPipePlayer().play(floatToPCM(snd, nbits), playCmd, fs, nbits)
         else:
             self.wavwrite(snd, fs, nbits, fname)
          
@@ -196,54 +147,196 @@ class audioManager():
                     os.remove(fname)
         return
 
-    def playSoundWithTrigger(self, snd, fs, nbits, writewav, fname, triggerNumber):
+    def openPlaybackDevice(self, fs, nChannels, nbits, bufferSize):
+        #set up the output stream, the device is reconfigured only
+        #if the parameters have changed
+        self.outputStream.configure(fs, nChannels, nbits, bufferSize)
+
+    def writePlaybackData(self, data, bufferSize):
+        self.outputStream.write(data)
+
+    def getOutputStats(self):
+        """
+        Return the output statistics of the alsaaudio or pyaudio
+        output stream (see `OutputStream.getStats`), or None for the
+        other play commands.
+        """
+        if self.outputStream == None:
+            return None
+        return self.outputStream.getStats()
+
+    def playSoundStream(self, blocks, fs, nbits):
+        """
+        Play a sound generated block by block, e.g. by the generators
+        of the `sound_stream` module.
+
+        With alsaaudio and pyaudio each block is written to the device
+        as soon as it is generated, so that only a few blocks are held
+        in memory. The other play commands need the whole sound, so the
+        blocks are joined and played with `playSound`.
+
+        Parameters
+        ----------
+        blocks : iterable of 2-dimensional arrays of floats
+            The consecutive blocks of the sound, with dimensions
+            (nSamples, 2).
+        fs : int
+            The sampling frequency of the sound.
+        nbits : int
+            The bit depth of the sound (16, 24 or 32).
+
+        """
+        playCmd = str(self.playCmd)
+        if playCmd not in ['alsaaudio', 'pyaudio']:
+            self.playSound(concatenate(list(blocks), axis=0), fs, nbits, False, "")
+            return
+
+        bufferSize = self.prm["pref"]["sound"]["bufferSize"]
+        if bufferSize < 1:
+            bufferSize = defaultBlockSize
+        nChannels = 2
+        self.openPlaybackDevice(fs, nChannels, nbits, bufferSize)
+        #the blocks are regrouped in segments of bufferSize samples,
+        #the last segment is padded with zeros
+        segment = zeros((bufferSize, nChannels), dtype=sndlib.getSndPrecision())
+        encoder = PCMEncoder(nbits, bufferSize, nChannels, segment.dtype)
+        nFilled = 0
+        if self.prm["pref"]["sound"]["appendSilence"] > 0:
+            nSilence = int(round(self.prm["pref"]["sound"]["appendSilence"]/1000 * fs))
+            blocks = itertools.chain(blocks, [zeros((nSilence, nChannels))])
+        for block in blocks:
+            pos = 0
+            while pos < block.shape[0]:
+                n = min(bufferSize-nFilled, block.shape[0]-pos)
+                segment[nFilled:nFilled+n] = block[pos:pos+n]
+                nFilled = nFilled + n
+                pos = pos + n
+                if nFilled == bufferSize:
+                    self.writePlaybackData(encoder.encode(segment), bufferSize)
+                    nFilled = 0
+        if nFilled > 0:
+            self.writePlaybackData(encoder.encode(segment[0:nFilled]), bufferSize)
+        self.outputStream.drain()
+
+    def playTrial(self, trial, nbits, writewav, fname, lightCallback):
+        """
+        Play a whole trial rendered by a `trial_buffer.TrialBuffer`
+        with a single call to the audio backend.
+
+        The light events of the trial are dispatched to `lightCallback`
+        by sample position. With alsaaudio and pyaudio an event is
+        dispatched when all the samples before it have been written to
+        the device by the output stream. With the other play commands
+        the events are dispatched at their time from the start of the
+        player.
+
+        Parameters
+        ----------
+        trial : TrialBuffer
+            The trial to play.
+        nbits : int
+            The bit depth of the sound (16, 24 or 32).
+        writewav : logical
+            If True, write the whole trial to `fname`.
+        fname : string
+            The name of the wav file.
+        lightCallback : function
+            Called as lightCallback(light, status) for each event,
+            where status is 'on' or 'off'.
+
+        """
+        playCmd = str(self.playCmd)
+        fs = trial.fs
+        snd = trial.render()
+        events = trial.getEvents()
+        pipe = self.usePipePlayer()
+        tmpFile = writewav == False and playCmd not in ['alsaaudio', 'pyaudio'] and pipe == False
         if writewav == True:
-            fname = fname
-        else:
+            self.wavwrite(snd, fs, nbits, fname)
+        elif tmpFile == True:
             (hnl, fname) = mkstemp("tmp_snd.wav")
 
-        (hnl1, snd_fname) = mkstemp("snd.wav")
-        (hnl2, trigon_fname) = mkstemp("trig-on.wav")
-        (hnl3, trigoff_fname) = mkstemp("trig-off.wav")
-            
-        self.wavwrite(snd, fs, nbits, snd_fname)
-        playCmd = self.playCmd
-        if playCmd == "winsound": #does not really play with trigger for the moment
-            winsound.PlaySound(snd_fname, winsound.SND_FILENAME)
+        if self.prm["pref"]["sound"]["appendSilence"] > 0:
+            nSilence = int(round(self.prm["pref"]["sound"]["appendSilence"]/1000 * fs))
+            snd = concatenate((snd, zeros((nSilence, 2), dtype=snd.dtype)), axis=0)
+
+        if playCmd in ['alsaaudio', 'pyaudio']:
+            nChannels = snd.shape[1]
+            bufferSize = self.prm["pref"]["sound"]["bufferSize"]
+            if bufferSize < 1: #the output stream needs a fixed period size
+                bufferSize = defaultBlockSize
+            self.openPlaybackDevice(fs, nChannels, nbits, bufferSize)
+            nextEvent = 0
+            for data in encodeSegments(snd, nbits, bufferSize):
+                self.writePlaybackData(data, bufferSize)
+                while nextEvent < len(events) and events[nextEvent][0] <= self.outputStream.framesWritten:
+                    lightCallback(events[nextEvent][1], events[nextEvent][2])
+                    nextEvent = nextEvent + 1
+            for pos, light, status in events[nextEvent:]:
+                self.outputStream.waitFrames(pos)
+                lightCallback(light, status)
+            self.outputStream.drain()
         else:
-            nSamp = snd.shape[0]
-            triggerDur = self.prm["pref"]["general"]["triggerDur"] 
-            nSamplesTrigger = ceil(triggerDur * fs) 
-            chOff = zeros((nSamp, 1))
-            chOn  = zeros((nSamp, 1)) 
-            chOn[0:nSamplesTrigger,:] = 0.5
-            self.wavwrite(chOff, fs, nbits, trigoff_fname)
-            self.wavwrite(chOn, fs, nbits, trigon_fname)
-            # self.scipy_wavwrite(trigoff_fname, fs, nbits, chOff)
-            # self.scipy_wavwrite(trigon_fname, fs, nbits, chOn)
-            triggerCode = decimalToBinary(triggerNumber, 8)
-            triggerCode = triggerCode[::-1] #reverse it
-            soxCmd = "sox -M " + snd_fname
-            for i in range(6):
-                if triggerCode[i] == '1':
-                    wavToCat = " " + trigoff_fname 
+            proc = None
+            if pipe == True:
+                #t0 is the time at which the player is expected
+                #to start the trial
+                player = getPipePlayer()
+                t0 = player.play(floatToPCM(snd, nbits), playCmd, fs, nbits, wait=False)
+            else:
+                if writewav == False or self.prm["pref"]["sound"]["appendSilence"] > 0:
+                    self.wavwrite(snd, fs, nbits, fname)
+                if playCmd == "winsound":
+                    winsound.PlaySound(fname, winsound.SND_FILENAME | winsound.SND_ASYNC)
                 else:
-                    wavToCat = " " + trigon_fname 
-                soxCmd = soxCmd + wavToCat
-      
-            
-            soxCmd = soxCmd + " " + fname
-            subprocess.call(soxCmd, shell=True)
-            os.close(hnl1)
-            os.close(hnl2)
-            os.close(hnl3)
-            os.remove(trigoff_fname)
-            os.remove(trigon_fname)
-            os.remove(snd_fname)
-            subprocess.call(playCmd + " " + fname, stdout=self.prm['cmdOutFileHandle'], stderr=self.prm['cmdOutFileHandle'], shell=True)
-            if writewav == False:
-                os.close(hnl)
-                os.remove(fname)
+                    proc = subprocess.Popen(playCmd + " " + fname, shell=True)
+                t0 = time.perf_counter()
+            #the event times are taken from a single reference, so that
+            #they do not drift during the trial
+            for pos, light, status in events:
+                wait = t0 + pos/fs - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                lightCallback(light, status)
+            if proc != None:
+                proc.wait()
+            else:
+                wait = t0 + snd.shape[0]/fs - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+        if tmpFile == True:
+            os.close(hnl)
+            os.remove(fname)
+
+    def playSoundWithTrigger(self, snd, fs, nbits, writewav, fname, triggerNumber):
+        playCmd = str(self.playCmd)
+        if playCmd == "winsound": #does not really play with trigger for the moment
+            self.playSound(snd, fs, nbits, writewav, fname)
+            return
+        #the trigger code is sent on the channels after the two sound
+        #channels (see the trigger_code module)
+        triggerDur = self.prm["pref"]["general"]["triggerDur"]
+        if playCmd not in ['alsaaudio', 'pyaudio']:
+            self.playSound(multiplexTrigger(snd, triggerNumber, fs, triggerDur), fs, nbits, writewav, fname)
+            return
+
+        #the trigger pulses are cached as PCM data and are added to
+        #the sound segment by segment as it is written to the device
+        nSamp = snd.shape[0]
+        if writewav == True:
+            self.wavwrite(multiplexTrigger(snd, triggerNumber, fs, triggerDur), fs, nbits, fname)
+        if self.prm["pref"]["sound"]["appendSilence"] > 0:
+            nSilence = int(round(self.prm["pref"]["sound"]["appendSilence"]/1000 * fs))
+            snd = concatenate((snd, zeros((nSilence, 2), dtype=snd.dtype)), axis=0)
+        bufferSize = self.prm["pref"]["sound"]["bufferSize"]
+        if bufferSize < 1: #the output stream needs a fixed period size
+            bufferSize = defaultBlockSize
+        #the pulses do not extend into the appended silence
+        trigData = triggerPulsePCM(triggerNumber, fs, triggerDur, nbits)[0:nSamp]
+        self.openPlaybackDevice(fs, 2+nTriggerBits, nbits, bufferSize)
+        for seg in multiplexSegmentsPCM(snd, trigData, nbits, bufferSize):
+            self.writePlaybackData(seg, bufferSize)
+        self.outputStream.drain()
 
 
     def loadWavFile(self, fName, desiredLevel, maxLevel, channel, desiredSampleRate=None):
@@ -318,83 +411,37 @@ class threadedAudioPlayer(QThread):
         if self.prm["pref"]["sound"]["appendSilence"] > 0:
             duration = self.prm["pref"]["sound"]["appendSilence"]/1000 #convert from ms to sec
             nSamples = int(round(duration * sampRate))
-            silenceToAppend = zeros((nSamples, 2))
+            silenceToAppend = zeros((nSamples, 2), dtype=snd.dtype)
             self.snd = concatenate((self.snd, silenceToAppend), axis=0)
 
         if self.playCmd in ['alsaaudio', 'pyaudio']:
             nSamples = self.snd.shape[0]
             nChannels = self.snd.shape[1]
             self.bufferSize = self.prm["pref"]["sound"]["bufferSize"]
-            if self.bufferSize < 1:
-                self.bufferSize = nSamples
-                self.nSeg = 1
-            else:
-                self.nSeg = int(ceil(nSamples/self.bufferSize))
-                padSize = (self.nSeg*self.bufferSize) - nSamples
-                pad = zeros((padSize, nChannels))
-                self.snd = concatenate((self.snd, pad), axis=0)
-            if self.nbits == 16:
-                self.data = self.snd*(2**15)
-                self.data[np.where(self.data>=2**15)] = 2**15-1
-                self.data = self.data.astype(int16)
-            elif nbits == 24:
-                d24_32 = (self.snd*(2**23))
-                d24_32[np.where(d24_32>=2**23)] = 2**23-1
-                d24_32 = d24_32.astype(int32)
-                #Shift first 0 bits, then 8, then 16, to get 24 bit little-endian.
-                d8_triplets = (d24_32.reshape(d24_32.shape + (1,)) >> np.array([0, 8, 16])) & 255  
-                self.data = d8_triplets.astype(np.uint8)
-            elif self.nbits == 32:
-                self.data = self.snd*(2**31)
-                self.data[np.where(self.data>=2**31)] = 2**31-1
-                self.data = self.data.astype(int32)
-
-        if playCmd == "alsaaudio":
-            self.device = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL, device=self.prm["pref"]["sound"]["alsaaudioDevice"])
-            self.device.setchannels(nChannels)
-            self.device.setrate(sampRate)
-            self.device.setperiodsize(self.bufferSize)
-            if self.nbits == 16:
-                self.device.setformat(alsaaudio.PCM_FORMAT_S16_LE)
-            elif nbits == 24:
-                self.device.setformat(alsaaudio.PCM_FORMAT_S24_3LE)
-            elif self.nbits == 32:
-                self.device.setformat(alsaaudio.PCM_FORMAT_S32_LE)
-
-        elif playCmd == "pyaudio":
-            paManager = pyaudio.PyAudio()
-            if self.nbits == 16:
-                sampleFormat = pyaudio.paInt16
-            elif nbits == 24:
-                sampleFormat = pyaudio.paInt24
-            elif nbits == 32:
-                sampleFormat = pyaudio.paInt32
-            
-            self.stream = paManager.open(format=sampleFormat,
-                channels = nChannels,
-                rate = sampRate,
-                output = True,
-                input_device_index=None,
-                output_device_index=self.prm["pref"]["sound"]["pyaudioDevice"],
-                frames_per_buffer=self.bufferSize)
-                
+            if self.bufferSize < 1: #the output stream needs a fixed period size
+                self.bufferSize = defaultBlockSize
+            self.nSeg = int(ceil(nSamples/self.bufferSize))
+            #the sound is played through the output stream of the session
+            #rather than by opening a new device
+            self.audioManager.openPlaybackDevice(sampRate, nChannels, self.nbits, self.bufferSize)
+
         #QThread.start(self)
         self.start()
         
     def run(self):
-        i = 0
+        #the sound is converted one period at a time, so that
+        #stopping the player also stops the conversion
+        segments = encodeSegments(self.snd, self.nbits, self.bufferSize)
         while self.exiting == False and self.nSeg > 0:
-            if self.playCmd == "alsaaudio":
-                thisData = self.data[i*self.bufferSize:((i*self.bufferSize)+self.bufferSize)][:]
-                self.device.write(thisData)
-            elif self.playCmd == "pyaudio":
-                thisData = self.data[i*self.bufferSize:((i*self.bufferSize)+self.bufferSize)][:]
-                self.stream.write(thisData, num_frames=self.bufferSize)
-            i = i+1
+            self.audioManager.writePlaybackData(next(segments), self.bufferSize)
             self.nSeg = self.nSeg -1
+        self.audioManager.outputStream.drain()
 
-            #stream.close()
-            #paManager.terminate() #actually closing the stream introduces offset clicks!
+    def stop(self):
+        #stop writing the sound, and discard the queued data
+        self.exiting = True
+        self.audioManager.outputStream.flush()
+        self.wait()
 
     def __del__(self):
         #the thread will finish before being terminated
@@ -421,6 +468,9 @@ class threadedExternalAudioPlayer(QThread):
         self.start()
     def run(self):
         self.audioManager.playSound(self.sound, self.sampRate, self.bits, self.writewav, self.fName)
+
+    def stop(self):
+        self.terminate()
      
     def __del__(self):
         #the thread will finish before being terminated
@@ -133,6 +133,7 @@ elif pyqtversion == 6:
 
 from .._version_info import*
 from pychoacoustics.sndlib import*
+from pychoacoustics.stimulus_cache import cachedSound
 from numpy import ceil, floor
 
                                                                                          
@@ -702,7 +703,7 @@ def doTrial_F0DL(parent):
     
     for i in range(nIncorrectTones):
         if harmType == parent.tr("Sinusoid"):
-            thisSnd = complexTone(F0, harmPhase, lowHarm, highHarm, stretch,
+            thisSnd = cachedSound(complexTone, F0, harmPhase, lowHarm, highHarm, stretch,
                                   harmonicLevel, duration, ramp, channel,
                                   parent.prm['sampRate'], parent.prm['maxLevel'])
         elif harmType == parent.tr("Narrowband Noise"):
@@ -28,6 +28,7 @@ The available choosers are:
 """
 
 from ..sndlib import*
+from ..stimulus_cache import cachedSound
 from ..pyqtver import*
 from .._version_info import*
 
@@ -121,7 +122,7 @@ def doTrial_freq(parent):
             
     stimulusIncorrect = []
     for i in range((parent.prm['nIntervals']-1)):
-        thisSnd = pureTone(frequency, phase, level, duration, ramps, channel,
-                           parent.prm['sampRate'], parent.prm['maxLevel'])
+        thisSnd = cachedSound(pureTone, frequency, phase, level, duration, ramps, channel,
+                              parent.prm['sampRate'], parent.prm['maxLevel'])
         stimulusIncorrect.append(thisSnd)
     parent.playRandomisedIntervals(stimulusCorrect, stimulusIncorrect)
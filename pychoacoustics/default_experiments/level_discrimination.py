@@ -15,6 +15,7 @@ elif pyqtversion == 6:
     from PyQt6.QtWidgets import QApplication
     
 from pychoacoustics.sndlib import*
+from pychoacoustics.stimulus_cache import cachedSound
 from .._version_info import*
 from numpy import log10
 
@@ -281,7 +282,7 @@ def doTrial_level_discrimination(parent):
             thisSnd = thisSnd[int(round(0.01*parent.prm['sampRate'])):int(round(0.01*parent.prm['sampRate']))+nTot,]
             thisSnd = gate(ramps, thisSnd, parent.prm['sampRate'])
         elif sndType == parent.tr("Sinusoid"):
-            thisSnd = pureTone(frequency, phase, incorrectLevel, duration, ramps, channel, parent.prm['sampRate'], parent.prm['maxLevel'])
+            thisSnd = cachedSound(pureTone, frequency, phase, incorrectLevel, duration, ramps, channel, parent.prm['sampRate'], parent.prm['maxLevel'])
 
         if noiseType != parent.tr("None"):
             noise = broadbandNoise(noise1SpectrumLevel, duration + ramps*2+20, 0, channel, parent.prm['sampRate'], parent.prm['maxLevel'])
@@ -237,21 +237,21 @@ class wavListDialog(QDialog):
                 self.isPlaying = False
     def onClickStopWavButton(self):
         if self.isPlaying == True:
-            self.playThread.terminate()
+            self.playThread.stop()
           
         
     def closeEvent(self, event):
         if self.isPlaying == True:
-            self.playThread.terminate()
+            self.playThread.stop()
         event.accept()
         
     def accept(self): #reimplement accept (i.e. ok button)
         if self.isPlaying == True:
-            self.playThread.terminate()
+            self.playThread.stop()
         QDialog.accept(self)
     def reject(self): #reimplement reject
         if self.isPlaying == True:
-            self.playThread.terminate()
+            self.playThread.stop()
         QDialog.reject(self)
         
      
@@ -325,24 +325,24 @@ class phonesDialog(QDialog):
 
     def onClickStopCalibButton(self):
         if self.isPlaying == True:
-            self.playThread.terminate()
+            self.playThread.stop()
             #self.playThread.__del__()
 
     def closeEvent(self, event):
         if self.isPlaying == True:
             #self.playThread.__del__()
-            self.playThread.terminate()
+            self.playThread.stop()
         event.accept()
         
     def accept(self): #reimplement accept (i.e. ok button)
         if self.isPlaying == True:
             #self.playThread.__del__()
-            self.playThread.terminate()
+            self.playThread.stop()
         QDialog.accept(self)
     def reject(self): #reimplement reject
         if self.isPlaying == True:
             #self.playThread.__del__()
-            self.playThread.terminate()
+            self.playThread.stop()
         QDialog.reject(self)
 
    
@@ -146,6 +146,69 @@ class preferencesDialog(QDialog):
         appPrefGrid.addWidget(self.startupCommandWidget, n, 1)
         n = n+1
 
+        self.PSINextStimEngineLabel = QLabel(self.tr('PSI next stimulus computation:'))
+        appPrefGrid.addWidget(self.PSINextStimEngineLabel, n, 0)
+        self.PSINextStimEngineChooser = QComboBox()
+        self.PSINextStimEngineChooser.addItems(self.parent().prm['PSINextStimEngineChoices'])
+        self.PSINextStimEngineChooser.setCurrentIndex(self.PSINextStimEngineChooser.findText(self.tmpPref['pref']['general']['PSINextStimEngine']))
+        self.PSINextStimEngineChooser.setWhatsThis(self.tr("Loop: compute the expected entropy one stimulus level at a time. Vectorized: compute it for all stimulus levels at once (faster, but uses more memory)."))
+        appPrefGrid.addWidget(self.PSINextStimEngineChooser, n, 1)
+        n = n+1
+        self.PSIMemoryModeLabel = QLabel(self.tr('PSI memory usage:'))
+        appPrefGrid.addWidget(self.PSIMemoryModeLabel, n, 0)
+        self.PSIMemoryModeChooser = QComboBox()
+        self.PSIMemoryModeChooser.addItems(self.parent().prm['PSIMemoryModeChoices'])
+        self.PSIMemoryModeChooser.setCurrentIndex(self.PSIMemoryModeChooser.findText(self.tmpPref['pref']['general']['PSIMemoryMode']))
+        self.PSIMemoryModeChooser.setWhatsThis(self.tr("Standard: store the likelihood tables in double precision. Low: store them in single precision. Minimal: compute the likelihoods in blocks when needed instead of storing them (slowest)."))
+        appPrefGrid.addWidget(self.PSIMemoryModeChooser, n, 1)
+        n = n+1
+        self.PSILikCacheCheckBox = QCheckBox(self.tr('Cache PSI likelihood tables on disk'))
+        self.PSILikCacheCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSILikCache"])
+        self.PSILikCacheCheckBox.setWhatsThis(self.tr("If checked, the likelihood tables of the PSI procedure are saved on disk and reloaded in later blocks with the same parameter space, instead of being recomputed."))
+        appPrefGrid.addWidget(self.PSILikCacheCheckBox, n, 0)
+        n = n+1
+        self.PSILikCacheMaxSizeLabel = QLabel(self.tr('PSI likelihood cache max size (MB):'))
+        appPrefGrid.addWidget(self.PSILikCacheMaxSizeLabel, n, 0)
+        self.PSILikCacheMaxSizeWidget = QLineEdit(self.currLocale.toString(self.tmpPref["pref"]["general"]["PSILikCacheMaxSize"]))
+        self.PSILikCacheMaxSizeWidget.setValidator(QIntValidator(self))
+        appPrefGrid.addWidget(self.PSILikCacheMaxSizeWidget, n, 1)
+        n = n+1
+        self.PSILogPosteriorCheckBox = QCheckBox(self.tr('Accumulate PSI posterior in the log domain'))
+        self.PSILogPosteriorCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSILogPosterior"])
+        self.PSILogPosteriorCheckBox.setWhatsThis(self.tr("If checked, the posterior of the PSI procedure is accumulated as a sum of log-likelihoods, which avoids the underflow of very small probabilities in long blocks."))
+        appPrefGrid.addWidget(self.PSILogPosteriorCheckBox, n, 0)
+        n = n+1
+        self.UMLSweetpointEngineLabel = QLabel(self.tr('UML sweet points computation:'))
+        appPrefGrid.addWidget(self.UMLSweetpointEngineLabel, n, 0)
+        self.UMLSweetpointEngineChooser = QComboBox()
+        self.UMLSweetpointEngineChooser.addItems(self.parent().prm['UMLSweetpointEngineChoices'])
+        self.UMLSweetpointEngineChooser.setCurrentIndex(self.UMLSweetpointEngineChooser.findText(self.tmpPref['pref']['general']['UMLSweetpointEngine']))
+        self.UMLSweetpointEngineChooser.setWhatsThis(self.tr("fmin: find the sweet points with a Nelder-Mead search at each trial. Fast: rescale sweet points computed once for each guess and lapse rate (much faster)."))
+        appPrefGrid.addWidget(self.UMLSweetpointEngineChooser, n, 1)
+        n = n+1
+        self.adaptiveParGridCheckBox = QCheckBox(self.tr('Adaptive parameter grid (PSI and UML)'))
+        self.adaptiveParGridCheckBox.setChecked(self.tmpPref["pref"]["general"]["adaptiveParGrid"])
+        self.adaptiveParGridCheckBox.setWhatsThis(self.tr("If checked, after 20 trials the parameter space of the PSI and UML procedures is progressively cropped to the region containing nearly all of the posterior probability, making each trial faster."))
+        appPrefGrid.addWidget(self.adaptiveParGridCheckBox, n, 0)
+        n = n+1
+        self.PSISpeculativeUpdateCheckBox = QCheckBox(self.tr('Compute next PSI stimulus during trial'))
+        self.PSISpeculativeUpdateCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSISpeculativeUpdate"])
+        self.PSISpeculativeUpdateCheckBox.setWhatsThis(self.tr("If checked, while a PSI trial is running the next stimulus is computed in the background for both a correct and an incorrect response, so that the next trial can start without delay."))
+        appPrefGrid.addWidget(self.PSISpeculativeUpdateCheckBox, n, 0)
+        n = n+1
+        self.PSIProcessesLabel = QLabel(self.tr('PSI Est. Guess Rate worker processes:'))
+        appPrefGrid.addWidget(self.PSIProcessesLabel, n, 0)
+        self.PSIProcessesWidget = QLineEdit(self.currLocale.toString(self.tmpPref["pref"]["general"]["PSIProcesses"]))
+        self.PSIProcessesWidget.setValidator(QIntValidator(1, 256, self))
+        self.PSIProcessesWidget.setWhatsThis(self.tr("Number of processes used to select the next stimulus in the PSI - Est. Guess Rate procedure. Values greater than one split the computation across processor cores."))
+        appPrefGrid.addWidget(self.PSIProcessesWidget, n, 1)
+        n = n+1
+        self.bayesCheckpointCheckBox = QCheckBox(self.tr('Save PSI and UML block checkpoints'))
+        self.bayesCheckpointCheckBox.setChecked(self.tmpPref["pref"]["general"]["bayesCheckpoint"])
+        self.bayesCheckpointCheckBox.setWhatsThis(self.tr("If checked, the state of PSI and UML blocks is saved after each trial next to the results file, and a block that was interrupted is resumed from the last trial when it is run again."))
+        appPrefGrid.addWidget(self.bayesCheckpointCheckBox, n, 0)
+        n = n+1
+
         # self.styleChooserLabel = QLabel(self.tr('Style:'))
         # appPrefGrid.addWidget(self.styleChooserLabel, n, 0)
         # self.styleChooser = QComboBox()
@@ -264,6 +327,25 @@ class preferencesDialog(QDialog):
         self.appendSilenceWidget = QLineEdit(self.currLocale.toString(self.tmpPref["pref"]["sound"]["appendSilence"]))
         soundPrefGrid.addWidget(self.appendSilenceWidget, n, 1)
         n = n+1
+
+        self.precisionLabel = QLabel(self.tr('Synthesis precision:'))
+        self.precisionChooser = QComboBox()
+        self.precisionChooser.addItems(["float64", "float32"])
+        self.precisionChooser.setCurrentIndex(self.precisionChooser.findText(self.tmpPref['pref']['sound']['precision']))
+        self.precisionChooser.setWhatsThis(self.tr("Floating point type of the generated sounds. float32 halves the memory used by the sounds and the time needed to convert them for playback, with rounding errors well below the resolution of a 24-bit sound card."))
+        soundPrefGrid.addWidget(self.precisionLabel, n, 0)
+        soundPrefGrid.addWidget(self.precisionChooser, n, 1)
+        n = n+1
+        self.gaplessTrials = QCheckBox(self.tr('Play each trial as a single sound'))
+        self.gaplessTrials.setChecked(self.tmpPref["pref"]["sound"]["gaplessTrials"])
+        self.gaplessTrials.setWhatsThis(self.tr("Render the warning interval, the intervals, and the silences between them into a single sound that is played in one go, so that the silences between the intervals are accurate to the sample. The interval lights are switched following the playback position."))
+        soundPrefGrid.addWidget(self.gaplessTrials, n, 0)
+        n = n+1
+        self.pipePlayback = QCheckBox(self.tr('Stream sounds to the play command'))
+        self.pipePlayback.setChecked(self.tmpPref["pref"]["sound"]["pipePlayback"])
+        self.pipePlayback.setWhatsThis(self.tr("If the play command is aplay, play (sox), or ffplay, keep the command running and send the sounds to it through its standard input, instead of writing each sound to a temporary WAV file and starting the command for each sound."))
+        soundPrefGrid.addWidget(self.pipePlayback, n, 0)
+        n = n+1
         
         self.soundPrefWidget.setLayout(soundPrefGrid)
         self.soundPrefWidget.layout().setSizeConstraint(QLayout.SizeConstraint.SetFixedSize)
@@ -713,6 +795,11 @@ class preferencesDialog(QDialog):
         self.tmpPref['pref']['general']['triggerDur'] = self.currLocale.toDouble(self.triggerDurWidget.text())[0]
         self.tmpPref['pref']['general']['maxRecursionDepth'] = self.currLocale.toInt(self.recursionLimitWidget.text())[0]
         self.tmpPref['pref']['general']['startupCommand'] = self.startupCommandWidget.text()
+        self.tmpPref['pref']['general']['PSINextStimEngine'] = self.PSINextStimEngineChooser.currentText()
+        self.tmpPref['pref']['general']['PSIMemoryMode'] = self.PSIMemoryModeChooser.currentText()
+        self.tmpPref['pref']['general']['PSILikCacheMaxSize'] = self.currLocale.toInt(self.PSILikCacheMaxSizeWidget.text())[0]
+        self.tmpPref['pref']['general']['PSIProcesses'] = max(1, self.currLocale.toInt(self.PSIProcessesWidget.text())[0])
+        self.tmpPref['pref']['general']['UMLSweetpointEngine'] = self.UMLSweetpointEngineChooser.currentText()
         #self.tmpPref['pref']['appearance']['style'] = self.tr(self.styleChooser.currentText())
         
         self.tmpPref['pref']['sound']['playCommand'] = self.tr(self.playCommandWidget.text())
@@ -727,6 +814,15 @@ class preferencesDialog(QDialog):
         self.tmpPref['pref']['sound']['defaultSampleRate'] = self.samplerateWidget.text()
         self.tmpPref['pref']['sound']['defaultNBits'] = self.nbitsChooser.currentText()
         self.tmpPref['pref']['sound']['appendSilence'] = self.currLocale.toInt(self.appendSilenceWidget.text())[0]
+        self.tmpPref['pref']['sound']['precision'] = str(self.precisionChooser.currentText())
+        if self.gaplessTrials.isChecked():
+            self.tmpPref['pref']['sound']['gaplessTrials'] = True
+        else:
+            self.tmpPref['pref']['sound']['gaplessTrials'] = False
+        if self.pipePlayback.isChecked():
+            self.tmpPref['pref']['sound']['pipePlayback'] = True
+        else:
+            self.tmpPref['pref']['sound']['pipePlayback'] = False
         
         self.tmpPref["pref"]["email"]["nBlocksNotify"] = self.currLocale.toInt(self.nBlocksWidget.text())[0]
         self.tmpPref["pref"]["general"]["nBlocksCustomCommand"] = self.nBlocksCustomCommandWidget.text()
@@ -768,6 +864,30 @@ class preferencesDialog(QDialog):
         else:
             self.tmpPref['pref']['general']['sessionLabelWarn'] = False
 
+        if self.PSILikCacheCheckBox.isChecked():
+            self.tmpPref['pref']['general']['PSILikCache'] = True
+        else:
+            self.tmpPref['pref']['general']['PSILikCache'] = False
+
+        if self.PSILogPosteriorCheckBox.isChecked():
+            self.tmpPref['pref']['general']['PSILogPosterior'] = True
+        else:
+            self.tmpPref['pref']['general']['PSILogPosterior'] = False
+
+        if self.adaptiveParGridCheckBox.isChecked():
+            self.tmpPref['pref']['general']['adaptiveParGrid'] = True
+        else:
+            self.tmpPref['pref']['general']['adaptiveParGrid'] = False
+
+        if self.PSISpeculativeUpdateCheckBox.isChecked():
+            self.tmpPref['pref']['general']['PSISpeculativeUpdate'] = True
+        else:
+            self.tmpPref['pref']['general']['PSISpeculativeUpdate'] = False
+        if self.bayesCheckpointCheckBox.isChecked():
+            self.tmpPref['pref']['general']['bayesCheckpoint'] = True
+        else:
+            self.tmpPref['pref']['general']['bayesCheckpoint'] = False
+
         if self.emailNotify.isChecked():
             self.tmpPref['pref']['email']['notifyEnd'] = True
         else:
@@ -852,6 +972,16 @@ class preferencesDialog(QDialog):
         self.triggerDurWidget.setText(self.currLocale.toString(self.tmpPref['pref']['general']['triggerDur']))
         self.recursionLimitWidget.setText(self.currLocale.toString(self.tmpPref['pref']['general']['maxRecursionDepth']))
         self.startupCommandWidget.setText(self.tmpPref['pref']['general']['startupCommand'])
+        self.PSINextStimEngineChooser.setCurrentIndex(self.PSINextStimEngineChooser.findText(self.tmpPref['pref']['general']['PSINextStimEngine']))
+        self.PSIMemoryModeChooser.setCurrentIndex(self.PSIMemoryModeChooser.findText(self.tmpPref['pref']['general']['PSIMemoryMode']))
+        self.PSILikCacheCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSILikCache"])
+        self.PSILogPosteriorCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSILogPosterior"])
+        self.adaptiveParGridCheckBox.setChecked(self.tmpPref["pref"]["general"]["adaptiveParGrid"])
+        self.PSISpeculativeUpdateCheckBox.setChecked(self.tmpPref["pref"]["general"]["PSISpeculativeUpdate"])
+        self.bayesCheckpointCheckBox.setChecked(self.tmpPref["pref"]["general"]["bayesCheckpoint"])
+        self.PSILikCacheMaxSizeWidget.setText(self.currLocale.toString(self.tmpPref['pref']['general']['PSILikCacheMaxSize']))
+        self.PSIProcessesWidget.setText(self.currLocale.toString(self.tmpPref['pref']['general']['PSIProcesses']))
+        self.UMLSweetpointEngineChooser.setCurrentIndex(self.UMLSweetpointEngineChooser.findText(self.tmpPref['pref']['general']['UMLSweetpointEngine']))
         
         self.playChooser.setCurrentIndex(self.playChooser.findText(self.tmpPref['pref']['sound']['playCommandType']))
         if self.parent().prm["appData"]["alsaaudioAvailable"] == True:
@@ -865,6 +995,9 @@ class preferencesDialog(QDialog):
         self.samplerateWidget.setText(self.tmpPref['pref']['sound']['defaultSampleRate'])
         self.nbitsChooser.setCurrentIndex(self.nbitsChooser.findText(self.tmpPref['pref']['sound']['defaultNBits']))
         self.appendSilenceWidget.setText(self.currLocale.toString(self.tmpPref['pref']['sound']['appendSilence']))
+        self.precisionChooser.setCurrentIndex(self.precisionChooser.findText(self.tmpPref['pref']['sound']['precision']))
+        self.gaplessTrials.setChecked(self.tmpPref["pref"]["sound"]["gaplessTrials"])
+        self.pipePlayback.setChecked(self.tmpPref["pref"]["sound"]["pipePlayback"])
        
 
         self.nBlocksWidget.setText(self.currLocale.toString(self.tmpPref['pref']['email']['nBlocksNotify']))
@@ -134,6 +134,9 @@ def set_global_parameters(prm):
     prm["nBitsChoices"] = ["16", "24", "32"]
     prm["shuffleChoices"] = [QApplication.translate("","No",""), QApplication.translate("","Ask",""), QApplication.translate("","Auto","")]
     prm["responseModeChoices"] = [QApplication.translate("","Real Listener",""), QApplication.translate("","Automatic",""), QApplication.translate("","Simulated Listener",""), QApplication.translate("","Psychometric","")]
+    prm["PSINextStimEngineChoices"] = ["Loop", "Vectorized"]
+    prm["PSIMemoryModeChoices"] = ["Standard", "Low", "Minimal"]
+    prm["UMLSweetpointEngineChoices"] = ["fmin", "Fast"]
     prm["psyListFunChoices"] = [QApplication.translate("","Logistic",""), QApplication.translate("","Gaussian",""), QApplication.translate("","Gumbel",""), QApplication.translate("","Weibull","")]
     prm['trialRunning'] = False
     prm['currentBlock'] = 1
@@ -278,6 +281,16 @@ def def_pref(prm):
     prm["pref"]["general"]["dprimeCorrection"] = True
 
     prm["pref"]["general"]["precision"] = 12
+    prm["pref"]["general"]["PSINextStimEngine"] = "Loop"
+    prm["pref"]["general"]["PSIMemoryMode"] = "Standard"
+    prm["pref"]["general"]["PSILikCache"] = False
+    prm["pref"]["general"]["PSILikCacheMaxSize"] = 2048
+    prm["pref"]["general"]["PSILogPosterior"] = False
+    prm["pref"]["general"]["UMLSweetpointEngine"] = "fmin"
+    prm["pref"]["general"]["adaptiveParGrid"] = False
+    prm["pref"]["general"]["PSISpeculativeUpdate"] = False
+    prm["pref"]["general"]["PSIProcesses"] = 1
+    prm["pref"]["general"]["bayesCheckpoint"] = False
     # 'variable'
     prm["pref"]["email"]["notifyEnd"] = False
     prm["pref"]["email"]["nBlocksNotify"] = 1
@@ -313,6 +326,9 @@ def def_pref(prm):
     prm["pref"]["sound"]["wavmanager"] = "scipy"
     prm["pref"]["sound"]["bufferSize"] = 1024
     prm["pref"]["sound"]["appendSilence"] = 0
+    prm["pref"]["sound"]["precision"] = "float64"
+    prm["pref"]["sound"]["gaplessTrials"] = False
+    prm["pref"]["sound"]["pipePlayback"] = False
     
     if platform.system() == 'Windows':
         prm["pref"]["sound"]["playCommand"] = "winsound"
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A persistent output stream for the alsaaudio and pyaudio backends.
+
+The playback device is opened once for the session, and is
+reconfigured only when the sampling rate, bit depth, number of
+channels, or buffer size of the sounds change. The PCM data is queued
+in a ring buffer of a few periods, and is written to the device by a
+dedicated writer thread, so that the device is fed without gaps while
+the next period is being prepared.
+
+The stream measures the output latency of each sound (from the time
+its first period is queued to the time it is accepted by the device,
+plus the latency reported by the backend) and counts the underruns
+(xruns) of the device.
+"""
+
+import atexit, sys, threading, time
+import numpy as np
+from collections import deque
+
+try:
+    import alsaaudio
+except ImportError:
+    pass
+try:
+    import pyaudio
+except ImportError:
+    pass
+
+class OutputStream(object):
+    """
+    Output stream writing PCM data to an alsaaudio or pyaudio device
+    from a ring buffer.
+
+    Parameters
+    ----------
+    backend : string ('alsaaudio' or 'pyaudio')
+        The audio backend.
+    device : string or int
+        The alsaaudio device name, or the pyaudio device index.
+    nPeriods : int
+        Number of periods of the ring buffer.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> from pychoacoustics.utils_pcm import floatToPCM
+    >>> stream = OutputStream("alsaaudio", "default")
+    >>> stream.configure(48000, 2, 16, 4096)
+    >>> data = floatToPCM(pureTone(440, 0, 60, 980, 10, "Both", 48000, 100)[0:4096], 16)
+    >>> stream.write(data)
+    >>> stream.drain()
+    >>> stream.close()
+
+    """
+    def __init__(self, backend, device=None, nPeriods=4):
+        self.backend = backend
+        self.device = device
+        self.nPeriods = nPeriods
+        self.params = None
+        self.pcm = None
+        self.paManager = None
+        self.paStream = None
+        self.cond = threading.Condition()
+        self.ring = None
+        self.queueTimes = [0]*nPeriods
+        self.head = 0 #slot of the next period to be written to the device
+        self.count = 0 #number of periods in the ring buffer
+        self.writing = False
+        self.inFlight = None #slot being written to the device
+        self.generation = 0 #incremented by flush
+        self.newSound = True
+        self.framesWritten = 0 #frames of the current sound written to the device
+        self.closing = False
+        self.nXruns = 0
+        self.latencies = deque(maxlen=100)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def configure(self, fs, nChannels, nbits, periodSize):
+        """
+        Set up the device for PCM data with the given parameters. The
+        device is reconfigured only if the parameters have changed,
+        after the queued data has been played.
+        """
+        params = (fs, nChannels, nbits, periodSize)
+        if params == self.params:
+            return
+        self.drain()
+        self.openDevice(fs, nChannels, nbits, periodSize)
+        self.params = params
+        self.ring = np.zeros((self.nPeriods, periodSize*nChannels*(nbits//8)), dtype=np.uint8)
+
+    def openDevice(self, fs, nChannels, nbits, periodSize):
+        if self.backend == "alsaaudio":
+            if self.pcm == None:
+                try:
+                    self.pcm = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL, device=self.device)
+                    print("Opening preferred alsaaudio device")
+                except:
+                    self.pcm = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL, device=alsaaudio.pcms(alsaaudio.PCM_PLAYBACK)[0])
+                    print("Opening first alsaaudio device")
+            self.pcm.setchannels(nChannels)
+            self.pcm.setrate(fs)
+            self.pcm.setperiodsize(periodSize)
+            if nbits == 16:
+                self.pcm.setformat(alsaaudio.PCM_FORMAT_S16_LE)
+            elif nbits == 24:
+                self.pcm.setformat(alsaaudio.PCM_FORMAT_S24_3LE)
+            elif nbits == 32:
+                self.pcm.setformat(alsaaudio.PCM_FORMAT_S32_LE)
+        elif self.backend == "pyaudio":
+            if self.paManager == None:
+                self.paManager = pyaudio.PyAudio()
+            if self.paStream != None:
+                self.paStream.close()
+            if nbits == 16:
+                sampleFormat = pyaudio.paInt16
+            elif nbits == 24:
+                sampleFormat = pyaudio.paInt24
+            elif nbits == 32:
+                sampleFormat = pyaudio.paInt32
+            self.paStream = self.paManager.open(format=sampleFormat,
+                                                channels=nChannels,
+                                                rate=fs,
+                                                output=True,
+                                                input_device_index=None,
+                                                output_device_index=self.device,
+                                                frames_per_buffer=periodSize)
+            self.paStream.start_stream()
+
+    def writeDevice(self, data):
+        #write a period to the device, return True if the device
+        #reported an underrun
+        if self.backend == "alsaaudio":
+            self.pcm.write(data)
+        elif self.backend == "pyaudio":
+            try:
+                self.paStream.write(data, num_frames=self.params[3], exception_on_underflow=True)
+            except IOError:
+                return True
+        return False
+
+    def deviceLatency(self):
+        #output latency reported by the backend, in seconds
+        if self.backend == "pyaudio":
+            return self.paStream.get_output_latency()
+        return 0
+
+    def write(self, data):
+        """
+        Queue a period of PCM data (as returned by `utils_pcm.floatToPCM`)
+        with the number of frames and format set with `configure`.
+        Block while the ring buffer is full.
+        """
+        data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        with self.cond:
+            #the slot being written to the device cannot be reused
+            #until the write is done, even if it was flushed
+            while (self.count == self.nPeriods or (self.head + self.count) % self.nPeriods == self.inFlight) and self.closing == False:
+                self.cond.wait()
+            slot = (self.head + self.count) % self.nPeriods
+            self.ring[slot, 0:len(data)] = data
+            self.ring[slot, len(data):] = 0
+            self.queueTimes[slot] = time.perf_counter()
+            self.count = self.count + 1
+            self.cond.notify_all()
+
+    def drain(self):
+        """
+        Wait until all the queued data has been written to the device.
+        The next period written starts a new sound.
+        """
+        with self.cond:
+            while (self.count > 0 or self.writing == True) and self.closing == False:
+                self.cond.wait()
+            self.newSound = True
+            self.framesWritten = 0
+
+    def waitFrames(self, nFrames):
+        """
+        Wait until `nFrames` frames of the current sound have been
+        written to the device, or until the queued data runs out.
+        """
+        with self.cond:
+            while self.framesWritten < nFrames and (self.count > 0 or self.writing == True) and self.closing == False:
+                self.cond.wait()
+
+    def flush(self):
+        """
+        Discard the queued data that has not been written to the device yet.
+        """
+        with self.cond:
+            if self.inFlight == self.head:
+                #the period being written is dropped from the queue,
+                #the writer thread leaves head and count alone when
+                #it is done with it
+                self.head = (self.head + 1) % self.nPeriods
+            self.count = 0
+            self.generation = self.generation + 1
+            self.newSound = True
+            self.framesWritten = 0
+            self.cond.notify_all()
+
+    def run(self):
+        #writer thread
+        while True:
+            with self.cond:
+                while self.count == 0 and self.closing == False:
+                    self.cond.wait()
+                if self.closing == True:
+                    return
+                slot = self.head
+                self.writing = True
+                self.inFlight = slot
+                generation = self.generation
+                newSound = self.newSound
+                self.newSound = False
+                fs, nChannels, nbits, periodSize = self.params
+            now = time.perf_counter()
+            if newSound == True:
+                self.latencies.append(now - self.queueTimes[slot] + self.deviceLatency())
+                tStart = now
+                nFrames = 0
+                late = False
+            else:
+                #the device has played all the previous frames
+                #before this period was ready
+                late = now > tStart + nFrames/fs
+            try:
+                underflow = self.writeDevice(self.ring[slot].tobytes())
+            except:
+                print(sys.exc_info())
+                underflow = False
+            if late == True or underflow == True:
+                self.nXruns = self.nXruns + 1
+                print("Audio output underrun (" + str(self.nXruns) + " so far)")
+                #resynchronize to the device
+                tStart = time.perf_counter() - nFrames/fs
+            nFrames = nFrames + periodSize
+            with self.cond:
+                #if the queue was flushed during the write, the period
+                #has already been removed from it
+                if generation == self.generation:
+                    self.head = (self.head + 1) % self.nPeriods
+                    self.count = self.count - 1
+                    self.framesWritten = self.framesWritten + periodSize
+                self.writing = False
+                self.inFlight = None
+                self.cond.notify_all()
+
+    def getStats(self):
+        """
+        Return the output statistics of the stream.
+
+        Returns
+        -------
+        stats : dict
+            'latency' is the mean output latency (in ms) of the last
+            100 sounds, and 'xruns' the number of underruns so far.
+
+        """
+        if len(self.latencies) > 0:
+            latency = 1000*sum(self.latencies)/len(self.latencies)
+        else:
+            latency = None
+        return {"latency": latency, "xruns": self.nXruns}
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
+        if self.pcm != None:
+            self.pcm.close()
+            self.pcm = None
+        if self.paStream != None:
+            self.paStream.close()
+            self.paStream = None
+        if self.paManager != None:
+            self.paManager.terminate()
+            self.paManager = None
+
+#the stream shared by the whole session
+_sessionStream = [None]
+
+def getOutputStream(backend, device=None):
+    """
+    Get the output stream of the session, opening it on first use.
+    If the running stream uses a different backend or device it is
+    replaced.
+
+    Returns
+    -------
+    stream : OutputStream
+
+    """
+    stream = _sessionStream[0]
+    if stream != None and (stream.backend != backend or stream.device != device):
+        closeOutputStream()
+        stream = None
+    if stream == None:
+        stream = OutputStream(backend, device)
+        _sessionStream[0] = stream
+
+    return stream
+
+def closeOutputStream():
+    """
+    Close the output stream of the session, if it is open.
+    """
+    if _sessionStream[0] != None:
+        stats = _sessionStream[0].getStats()
+        print("Closing audio output stream. Mean latency (ms): " + str(stats["latency"]) + ", underruns: " + str(stats["xruns"]))
+        _sessionStream[0].close()
+        _sessionStream[0] = None
+
+atexit.register(closeOutputStream)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Playback through an external command (aplay, sox `play`, or ffplay)
+reading raw PCM data from its standard input.
+
+The player process is started once and is kept running between
+sounds, it is restarted only when the command, sampling rate, bit depth,
+or number of channels change. This avoids writing a temporary WAV file
+and starting a new process for each sound.
+"""
+
+import atexit, os, shlex, subprocess, time
+
+#external commands that can read raw PCM data from stdin
+pipeCommands = ["aplay", "play", "ffplay"]
+#the players read their input in blocks, each sound is followed by
+#this much silence (in seconds) so that its end is not held back
+#until the next sound arrives
+flushDuration = 0.1
+
+def pipeCommandArgs(playCmd, fs, nbits, nChannels):
+    """
+    Build the arguments to run `playCmd` reading raw little-endian
+    signed PCM data from stdin.
+
+    Parameters
+    ----------
+    playCmd : string
+        The play command, possibly with its own options
+        (e.g. 'aplay -D hw:0').
+    fs : int
+        The sampling frequency.
+    nbits : int
+        The bit depth (16, 24, or 32).
+    nChannels : int
+        The number of channels.
+
+    Returns
+    -------
+    args : list of strings, or None
+        The arguments of the command, or None if the command cannot
+        read PCM data from stdin.
+
+    Examples
+    --------
+    >>> pipeCommandArgs('aplay', 48000, 24, 2)
+    ['aplay', '-q', '-B', '100000', '-t', 'raw', '-f', 'S24_3LE', '-c', '2', '-r', '48000', '-']
+
+    """
+    args = shlex.split(playCmd)
+    if len(args) == 0 or nbits not in [16, 24, 32]:
+        return None
+    cmdName = os.path.basename(args[0])
+    if cmdName == "aplay":
+        fmt = {16: "S16_LE", 24: "S24_3LE", 32: "S32_LE"}[nbits]
+        args = args + ["-q", "-B", str(int(flushDuration*1e6)), "-t", "raw", "-f", fmt, "-c", str(nChannels), "-r", str(fs), "-"]
+    elif cmdName == "play":
+        args = args + ["-q", "--buffer", "4096", "-t", "raw", "-r", str(fs), "-e", "signed-integer", "-b", str(nbits), "-c", str(nChannels), "-"]
+    elif cmdName == "ffplay":
+        fmt = {16: "s16le", 24: "s24le", 32: "s32le"}[nbits]
+        args = args + ["-nodisp", "-autoexit", "-loglevel", "quiet", "-fflags", "nobuffer", "-probesize", "32", "-f", fmt, "-ar", str(fs), "-ac", str(nChannels), "-"]
+    else:
+        return None
+
+    return args
+
+class PipePlayer(object):
+    """
+    External player fed with raw PCM data through its stdin.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> from pychoacoustics.utils_pcm import floatToPCM
+    >>> player = PipePlayer()
+    >>> snd = pureTone(440, 0, 60, 980, 10, "Both", 48000, 100)
+    >>> player.play(floatToPCM(snd, 16), 'aplay', 48000, 16)
+    >>> player.close()
+
+    """
+    def __init__(self):
+        self.proc = None
+        self.args = None
+        self.playEnd = 0
+
+    def supports(self, playCmd):
+        """
+        Return True if `playCmd` can be fed through stdin.
+        """
+        return pipeCommandArgs(playCmd, 48000, 16, 2) != None
+
+    def play(self, data, playCmd, fs, nbits, wait=True):
+        """
+        Play PCM data (as returned by `utils_pcm.floatToPCM`), with
+        dimensions (nSamples, nChannels).
+
+        Parameters
+        ----------
+        data : array of integers
+            The PCM data.
+        playCmd : string
+            The play command.
+        fs : int
+            The sampling frequency.
+        nbits : int
+            The bit depth (16, 24, or 32).
+        wait : logical
+            If True, return when the sound is expected to have been
+            played, otherwise return as soon as the data has been
+            written to the player.
+
+        Returns
+        -------
+        tStart : float
+            The expected start time of the sound, on the
+            `time.perf_counter` clock.
+
+        """
+        nChannels = data.shape[1]
+        args = pipeCommandArgs(playCmd, fs, nbits, nChannels)
+        if args != self.args or self.proc == None or self.proc.poll() != None:
+            self.close()
+            self.proc = subprocess.Popen(args, stdin=subprocess.PIPE)
+            self.args = args
+            self.playEnd = 0
+        #the player plays the sounds back to back, this one starts
+        #when the previous one ends
+        nFlush = int(round(flushDuration*fs))
+        tStart = max(time.perf_counter(), self.playEnd)
+        self.playEnd = tStart + (data.shape[0]+nFlush)/fs
+        try:
+            self.proc.stdin.write(data.tobytes())
+            self.proc.stdin.write(bytes(nFlush*data[0].nbytes))
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            self.close()
+            raise
+        if wait == True:
+            self.wait()
+
+        return tStart
+
+    def wait(self):
+        """
+        Wait until the sounds written to the player are expected to
+        have been played.
+        """
+        remaining = self.playEnd - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def close(self, timeout=None):
+        """
+        Close the stdin of the player and wait for it to exit, for at
+        most `timeout` seconds (by default, the time needed to play
+        the queued sounds plus one second). The player is terminated
+        if it does not exit in time.
+        """
+        if self.proc != None:
+            if timeout == None:
+                timeout = max(0, self.playEnd - time.perf_counter()) + 1
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            try:
+                self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.terminate()
+                try:
+                    self.proc.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+                    self.proc.wait()
+            self.proc = None
+            self.args = None
+
+#the player shared by the whole session
+_sessionPlayer = [None]
+
+def getPipePlayer():
+    """
+    Get the pipe player of the session, creating it on first use.
+
+    Returns
+    -------
+    player : PipePlayer
+
+    """
+    if _sessionPlayer[0] == None:
+        _sessionPlayer[0] = PipePlayer()
+
+    return _sessionPlayer[0]
+
+def closePipePlayer():
+    """
+    Stop the player process of the session, if it is running.
+    """
+    if _sessionPlayer[0] != None:
+        _sessionPlayer[0].close()
+
+atexit.register(closePipePlayer)
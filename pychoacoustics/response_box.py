@@ -68,12 +68,14 @@ from .audio_manager import*
 from .dialog_show_instructions import*
 from .stats_utils import*
 from .sndlib import*
+from .trial_buffer import TrialBuffer
 from .utils_general import*
 from .utils_process_results import*
 from .PSI_method import*
-from .PSI_method_est_guess import setupPSIEstGuessRate, PSIEstGuessRate_update
+from .PSI_method_est_guess import setupPSIEstGuessRate, PSIEstGuessRate_update, PSIEstGuessRate_close
 from .UML_method import*
 from .UML_method_est_guess import setupUMLEstGuessRate, UMLEstGuessRate_update
+from .utils_posterior_checkpoint import removeCheckpoint, resumeCheckpoint, writeCheckpoint
 
 
 try:
@@ -648,6 +650,29 @@ class responseBox(QMainWindow):
                 foo = stimulusIncorrect.pop()
                 soundList.append(foo)
 
+        if self.prm['pref']['sound']['gaplessTrials'] == True:
+            trial = TrialBuffer(self.prm['allBlocks']['sampRate'])
+            nLight = self.addWarningToTrial(trial)
+            if self.prm["preTrialInterval"] == True:
+                trial.addSound(preTrialStim, light=nLight)
+                nLight = nLight+1
+                trial.addSilence(self.prm[currBlock]['preTrialIntervalISI'])
+            for i in range(nIntervals):
+                if self.prm["precursorInterval"] == True:
+                    trial.addSound(precursorStim, light=nLight)
+                    nLight = nLight+1
+                    trial.addSilence(self.prm[currBlock]['precursorIntervalISI'])
+                trial.addSound(soundList[i], light=nLight)
+                nLight = nLight+1
+                if self.prm["postcursorInterval"] == True:
+                    trial.addSound(postCursorStim, light=nLight)
+                    nLight = nLight+1
+                    trial.addSilence(self.prm[currBlock]['postcursorIntervalISI'])
+                if i < nIntervals-1:
+                    trial.addSilence(self.prm['isi'])
+            self.playTrialBuffer(trial)
+            return
+
         nLight = 0
         if self.prm["warningInterval"] == True:
             self.intervalLight[nLight].setStatus('on')
@@ -676,7 +701,7 @@ class responseBox(QMainWindow):
             nLight = nLight+1
             if self.prm["postcursorInterval"] == True:
                 self.intervalLight[nLight].setStatus('on')
-                self.audioManager.playSound(postcursorStim, self.prm['allBlocks']['sampRate'], self.prm['allBlocks']['nBits'], self.prm['pref']['sound']['writewav'], 'postcursor_interval'+str(i+1) +'.wav')
+                self.audioManager.playSound(postCursorStim, self.prm['allBlocks']['sampRate'], self.prm['allBlocks']['nBits'], self.prm['pref']['sound']['writewav'], 'postcursor_interval'+str(i+1) +'.wav')
                 self.intervalLight[nLight].setStatus('off')
                 nLight = nLight+1
                 time.sleep(self.prm[currBlock]['postcursorIntervalISI']/1000)
@@ -690,6 +715,16 @@ class responseBox(QMainWindow):
             if self.prm['pref']['sound']['writeSndSeqSegments'] == True:
                 #self.audioManager.scipy_wavwrite("sndSeq%i.wav"%(i+1), self.prm['allBlocks']['sampRate'], self.prm['allBlocks']['nBits'], sndList[i])
                 self.audioManager.wavwrite(sndList[i], self.prm['allBlocks']['sampRate'], self.prm['allBlocks']['nBits'], "sndSeq%i.wav"%(i+1))
+        if self.prm['pref']['sound']['gaplessTrials'] == True and trigNum == None:
+            trial = TrialBuffer(self.prm['allBlocks']['sampRate'])
+            nLight = self.addWarningToTrial(trial)
+            for i in range(len(sndList)):
+                trial.addSound(sndList[i], light=nLight)
+                nLight = nLight+1
+                if i < (len(sndList) - 1):
+                    trial.addSilence(ISIList[i])
+            self.playTrialBuffer(trial, 'soundSequence.wav')
+            return
         nLight = 0
         if self.prm["warningInterval"] == True:
             self.intervalLight[nLight].setStatus('on')
@@ -711,6 +746,26 @@ class responseBox(QMainWindow):
 
         return
 
+    def addWarningToTrial(self, trial):
+        #add the warning interval, if any, to a TrialBuffer,
+        #and return the index of the next interval light
+        currBlock = 'b'+ str(self.prm['currentBlock'])
+        nLight = 0
+        if self.prm["warningInterval"] == True:
+            trial.addSilence(self.prm[currBlock]['warningIntervalDur'], light=nLight)
+            nLight = nLight+1
+            trial.addSilence(self.prm[currBlock]['warningIntervalISI'])
+
+        return nLight
+
+    def playTrialBuffer(self, trial, fname='trial.wav'):
+        #play a whole trial with a single call to the audio backend,
+        #switching the interval lights by sample position
+        self.audioManager.playTrial(trial, self.prm['allBlocks']['nBits'], self.prm['pref']['sound']['writewav'], fname, self.setIntervalLightStatus)
+
+    def setIntervalLightStatus(self, light, status):
+        self.intervalLight[light].setStatus(status)
+
     def playSequentialIntervalsNoLights(self, sndList, ISIList=[], trigNum=None):
         currBlock = 'b'+ str(self.prm['currentBlock'])
         #self.dialerResponseField.setReadOnly(True)
@@ -3864,82 +3919,116 @@ class responseBox(QMainWindow):
             self.doTrial()
 
 
+    def setupPSIBlock(self):
+        currBlock = 'b' + str(self.prm['currentBlock'])
+        self.fullFileLines = []
+        self.fullFileSummLines = []
+        if self.prm['margThresh'] == "Yes" or self.prm['margSlope'] == "Yes" or self.prm['margLapse'] == "Yes":
+            ax = np.array([])
+            if self.prm['margThresh'] == "Yes":
+                ax = numpy.append(ax, 0)
+            if self.prm['margSlope'] == "Yes":
+                ax = numpy.append(ax, 1)
+            if self.prm['margLapse'] == "Yes":
+                ax = numpy.append(ax, 2)
+            ax = tuple(np.sort(ax))
+        else:
+            ax = None
+                
+
+        gammax = 1/self.prm[currBlock]['nAlternatives']
+        if self.prm['pref']['general']['PSIMemoryMode'] == "Minimal":
+            PSIdtype = "float32"; PSILikTable = "On Demand"; PSIStoreNextNorm = False
+        elif self.prm['pref']['general']['PSIMemoryMode'] == "Low":
+            PSIdtype = "float32"; PSILikTable = "Stored"; PSIStoreNextNorm = False
+        else:
+            PSIdtype = "float64"; PSILikTable = "Stored"; PSIStoreNextNorm = True
+        if self.prm['stimScale'] == "Linear":
+            self.PSIStack = setupPSIStack(1, model=self.prm['psyFunType'],
+                                             x0=self.prm['adaptiveParam'],
+                                             xLim=(self.prm['stimLo'], self.prm['stimHi']),
+                                             xStep=self.prm['stimStep'],
+                                             stimScale=self.prm['stimScale'],
+                                             alphaLim=(self.prm['loMidPoint'], self.prm['hiMidPoint']),
+                                             alphaStep=self.prm['midPointStep'],
+                                             alphaSpacing="Linear",
+                                             alphaDist=self.prm['midPointPrior'],
+                                             alphaMu=self.prm['midPointPriorMu'],
+                                             alphaSTD=self.prm['midPointPriorSTD'],
+                                             betaLim=(self.prm['loSlope'],self.prm['hiSlope']),
+                                             betaStep=self.prm['slopeStep'],
+                                             betaSpacing=self.prm['slopeSpacing'],
+                                             betaDist=self.prm['slopePrior'],
+                                             betaMu=self.prm['slopePriorMu'],
+                                             betaSTD=self.prm['slopePriorSTD'],
+                                             gamma=gammax,
+                                             lambdaLim=(self.prm['loLapse'],self.prm['hiLapse']),
+                                             lambdaStep=self.prm['lapseStep'],
+                                             lambdaSpacing=self.prm['lapseSpacing'],
+                                             lambdaDist=self.prm['lapsePrior'],
+                                             lambdaMu=self.prm['lapsePriorMu'],
+                                             lambdaSTD=self.prm['lapsePriorSTD'],
+                                             marginalize = ax,
+                                             nextStimEngine=self.prm['pref']['general']['PSINextStimEngine'],
+                                             dtype=PSIdtype,
+                                             likTable=PSILikTable,
+                                             storeNextNorm=PSIStoreNextNorm,
+                                             likCache=self.prm['pref']['general']['PSILikCache'],
+                                             likCacheMaxSize=self.prm['pref']['general']['PSILikCacheMaxSize'],
+                                             logPosterior=self.prm['pref']['general']['PSILogPosterior'],
+                                             adaptiveGrid=self.prm['pref']['general']['adaptiveParGrid'])
+        elif self.prm['stimScale'] == "Logarithmic":
+            self.PSIStack = setupPSIStack(1, model=self.prm['psyFunType'],
+                                             x0=abs(self.prm['adaptiveParam']),
+                                             xLim=(abs(self.prm['stimLo']), abs(self.prm['stimHi'])),
+                                             xStep=self.prm['stimStep'],
+                                             stimScale=self.prm['stimScale'],
+                                             alphaLim=(abs(self.prm['loMidPoint']), abs(self.prm['hiMidPoint'])),
+                                             alphaStep=self.prm['midPointStep'],
+                                             alphaSpacing="Linear",
+                                             alphaDist=self.prm['midPointPrior'],
+                                             alphaMu=abs(self.prm['midPointPriorMu']),
+                                             alphaSTD=self.prm['midPointPriorSTD'],
+                                             betaLim=(self.prm['loSlope'],self.prm['hiSlope']),
+                                             betaStep=self.prm['slopeStep'],
+                                             betaSpacing=self.prm['slopeSpacing'],
+                                             betaDist=self.prm['slopePrior'],
+                                             betaMu=self.prm['slopePriorMu'],
+                                             betaSTD=self.prm['slopePriorSTD'],
+                                             gamma=gammax,
+                                             lambdaLim=(self.prm['loLapse'],self.prm['hiLapse']),
+                                             lambdaStep=self.prm['lapseStep'],
+                                             lambdaSpacing=self.prm['lapseSpacing'],
+                                             lambdaDist=self.prm['lapsePrior'],
+                                             lambdaMu=self.prm['lapsePriorMu'],
+                                             lambdaSTD=self.prm['lapsePriorSTD'],
+                                             marginalize = ax,
+                                             nextStimEngine=self.prm['pref']['general']['PSINextStimEngine'],
+                                             dtype=PSIdtype,
+                                             likTable=PSILikTable,
+                                             storeNextNorm=PSIStoreNextNorm,
+                                             likCache=self.prm['pref']['general']['PSILikCache'],
+                                             likCacheMaxSize=self.prm['pref']['general']['PSILikCacheMaxSize'],
+                                             logPosterior=self.prm['pref']['general']['PSILogPosterior'],
+                                             adaptiveGrid=self.prm['pref']['general']['adaptiveParGrid'])
+        #the PSI paradigm runs a single track per block; self.PSITrack
+        #is the track of the stack presented in the current trial
+        self.PSITrack = 0
+        self.PSI = self.PSIStack["tracks"][self.PSITrack]
+        self.PSISpeculator = None
+            
+        self.trialCount = 0
+        self.fullFileLines = []
+        self.prm['buttonCounter'] = [0 for i in range(self.prm['nAlternatives'])]
+        self.bayesCheckpointLines = 0
+        if self.prm['pref']['general']['bayesCheckpoint'] == True:
+            self.resumeBayesCheckpoint("PSI")
+
+
     def sortResponsePSI(self, buttonClicked):
         currBlock = 'b' + str(self.prm['currentBlock'])
         if self.prm['startOfBlock'] == True:
-            self.fullFileLines = []
-            self.fullFileSummLines = []
-            if self.prm['margThresh'] == "Yes" or self.prm['margSlope'] == "Yes" or self.prm['margLapse'] == "Yes":
-                ax = np.array([])
-                if self.prm['margThresh'] == "Yes":
-                    ax = numpy.append(ax, 0)
-                if self.prm['margSlope'] == "Yes":
-                    ax = numpy.append(ax, 1)
-                if self.prm['margLapse'] == "Yes":
-                    ax = numpy.append(ax, 2)
-                ax = tuple(np.sort(ax))
-            else:
-                ax = None
-                    
-
-            gammax = 1/self.prm[currBlock]['nAlternatives']
-            if self.prm['stimScale'] == "Linear":
-                self.PSI = setupPSI(model=self.prm['psyFunType'],
-                                    x0=self.prm['adaptiveParam'],
-                                    xLim=(self.prm['stimLo'], self.prm['stimHi']),
-                                    xStep=self.prm['stimStep'],
-                                    stimScale=self.prm['stimScale'],
-                                    alphaLim=(self.prm['loMidPoint'], self.prm['hiMidPoint']),
-                                    alphaStep=self.prm['midPointStep'],
-                                    alphaSpacing="Linear",
-                                    alphaDist=self.prm['midPointPrior'],
-                                    alphaMu=self.prm['midPointPriorMu'],
-                                    alphaSTD=self.prm['midPointPriorSTD'],
-                                    betaLim=(self.prm['loSlope'],self.prm['hiSlope']),
-                                    betaStep=self.prm['slopeStep'],
-                                    betaSpacing=self.prm['slopeSpacing'],
-                                    betaDist=self.prm['slopePrior'],
-                                    betaMu=self.prm['slopePriorMu'],
-                                    betaSTD=self.prm['slopePriorSTD'],
-                                    gamma=gammax,
-                                    lambdaLim=(self.prm['loLapse'],self.prm['hiLapse']),
-                                    lambdaStep=self.prm['lapseStep'],
-                                    lambdaSpacing=self.prm['lapseSpacing'],
-                                    lambdaDist=self.prm['lapsePrior'],
-                                    lambdaMu=self.prm['lapsePriorMu'],
-                                    lambdaSTD=self.prm['lapsePriorSTD'],
-                                    marginalize = ax)
-            elif self.prm['stimScale'] == "Logarithmic":
-                self.PSI = setupPSI(model=self.prm['psyFunType'],
-                                    x0=abs(self.prm['adaptiveParam']),
-                                    xLim=(abs(self.prm['stimLo']), abs(self.prm['stimHi'])),
-                                    xStep=self.prm['stimStep'],
-                                    stimScale=self.prm['stimScale'],
-                                    alphaLim=(abs(self.prm['loMidPoint']), abs(self.prm['hiMidPoint'])),
-                                    alphaStep=self.prm['midPointStep'],
-                                    alphaSpacing="Linear",
-                                    alphaDist=self.prm['midPointPrior'],
-                                    alphaMu=abs(self.prm['midPointPriorMu']),
-                                    alphaSTD=self.prm['midPointPriorSTD'],
-                                    betaLim=(self.prm['loSlope'],self.prm['hiSlope']),
-                                    betaStep=self.prm['slopeStep'],
-                                    betaSpacing=self.prm['slopeSpacing'],
-                                    betaDist=self.prm['slopePrior'],
-                                    betaMu=self.prm['slopePriorMu'],
-                                    betaSTD=self.prm['slopePriorSTD'],
-                                    gamma=gammax,
-                                    lambdaLim=(self.prm['loLapse'],self.prm['hiLapse']),
-                                    lambdaStep=self.prm['lapseStep'],
-                                    lambdaSpacing=self.prm['lapseSpacing'],
-                                    lambdaDist=self.prm['lapsePrior'],
-                                    lambdaMu=self.prm['lapsePriorMu'],
-                                    lambdaSTD=self.prm['lapsePriorSTD'],
-                                    marginalize = ax)
-                
             self.prm['startOfBlock'] = False
-            self.trialCount = 0
-            self.fullFileLines = []
-            self.prm['buttonCounter'] = [0 for i in range(self.prm['nAlternatives'])]
 
         self.prm['buttonCounter'][buttonClicked-1] = self.prm['buttonCounter'][buttonClicked-1] + 1
             
@@ -4061,10 +4150,20 @@ class responseBox(QMainWindow):
             
             self.writeResultsSummaryFullLine('PSI', resLineToWriteSummFull)
 
-            del self.PSI #clear memory
+            if self.PSISpeculator != None:
+                self.PSISpeculator.cancel()
+            if self.prm['pref']['general']['bayesCheckpoint'] == True:
+                removeCheckpoint(self.getBayesCheckpointPath())
+            del self.PSI, self.PSIStack, self.PSISpeculator #clear memory
             self.atBlockEnd()
         else:
-            self.PSI = PSI_update(self.PSI, response)
+            if self.PSISpeculator != None:
+                #the next stimulus has been computed in the background
+                #during the trial for both responses
+                self.PSIStack = PSIStack_set_track(self.PSIStack, self.PSITrack, self.PSISpeculator.getUpdate(response))
+            else:
+                self.PSIStack = PSIStack_update(self.PSIStack, self.PSITrack, response)
+            self.PSI = self.PSIStack["tracks"][self.PSITrack]
             if self.prm['stimScale'] == "Logarithmic":
                 if self.prm['adaptiveParam'] >=0:
                     self.prm['adaptiveParam'] = self.PSI["xnextLinear"]
@@ -4075,6 +4174,10 @@ class responseBox(QMainWindow):
             # print("Est. thresh: " + str(self.PSI['est_midpoint']))  
             # print('Next Stim: ' + str(self.prm['adaptiveParam']))
             # print(self.PSI["phi"])
+            if self.prm['pref']['general']['bayesCheckpoint'] == True:
+                self.writeBayesCheckpoint(self.PSI, "PSI")
+            if self.prm['pref']['general']['PSISpeculativeUpdate'] == True:
+                self.PSISpeculator = speculativePSIUpdater(self.PSI)
             self.doTrial()
 
     #PSI Est. Guess Rate
@@ -4127,7 +4230,10 @@ class responseBox(QMainWindow):
                                                 lambdaDist=self.prm['lapsePrior'],
                                                 lambdaMu=self.prm['lapsePriorMu'],
                                                 lambdaSTD=self.prm['lapsePriorSTD'],
-                                                marginalize = ax)
+                                                marginalize = ax,
+                                                likCache=self.prm['pref']['general']['PSILikCache'],
+                                                likCacheMaxSize=self.prm['pref']['general']['PSILikCacheMaxSize'],
+                                                nProcesses=self.prm['pref']['general']['PSIProcesses'])
             elif self.prm['stimScale'] == "Logarithmic":
                 self.PSI = setupPSIEstGuessRate(model=self.prm['psyFunType'],
                                                 x0=abs(self.prm['adaptiveParam']),
@@ -4158,7 +4264,10 @@ class responseBox(QMainWindow):
                                                 lambdaDist=self.prm['lapsePrior'],
                                                 lambdaMu=self.prm['lapsePriorMu'],
                                                 lambdaSTD=self.prm['lapsePriorSTD'],
-                                                marginalize = ax)
+                                                marginalize = ax,
+                                                likCache=self.prm['pref']['general']['PSILikCache'],
+                                                likCacheMaxSize=self.prm['pref']['general']['PSILikCacheMaxSize'],
+                                                nProcesses=self.prm['pref']['general']['PSIProcesses'])
                 
             self.prm['startOfBlock'] = False
             self.trialCount = 0
@@ -4293,6 +4402,7 @@ class responseBox(QMainWindow):
             
             self.writeResultsSummaryFullLine('PSI - Est. Guess Rate', resLineToWriteSummFull)
 
+            PSIEstGuessRate_close(self.PSI) #stop the worker processes
             del self.PSI #clear memory
             self.atBlockEnd()
         else:
@@ -4310,83 +4420,98 @@ class responseBox(QMainWindow):
             self.doTrial()
 
 
+    def setupUMLBlock(self):
+        currBlock = 'b' + str(self.prm['currentBlock'])
+        self.fullFileLines = []
+        self.fullFileSummLines = []
+
+        gammax = 1/self.prm[currBlock]['nAlternatives']
+        if self.prm['stimScale'] == "Linear":
+            self.UMLStack = setupUMLStack(1, model=self.prm['psyFunType'],
+                                             swptRule=self.prm['swptRule'],
+                                             nDown=self.prm["numberCorrectNeeded"],
+                                             centTend = self.prm["psyFunPosteriorSummary"],
+                                             stimScale = self.prm['stimScale'],
+                                             x0=self.prm['adaptiveParam'],
+                                             xLim=(self.prm['stimLo'], self.prm['stimHi']),
+                                             alphaLim=(self.prm['loMidPoint'], self.prm['hiMidPoint']),
+                                             alphaStep=self.prm['midPointStep'],
+                                             alphaSpacing="Linear",
+                                             alphaDist=self.prm['midPointPrior'],
+                                             alphaMu=self.prm['midPointPriorMu'],
+                                             alphaSTD=self.prm['midPointPriorSTD'],
+                                             betaLim=(self.prm['loSlope'], self.prm['hiSlope']),
+                                             betaStep=self.prm['slopeStep'],
+                                             betaSpacing=self.prm['slopeSpacing'],
+                                             betaDist=self.prm['slopePrior'],
+                                             betaMu=self.prm['slopePriorMu'],
+                                             betaSTD=self.prm['slopePriorSTD'],
+                                             gamma=gammax,
+                                             lambdaLim=(self.prm['loLapse'], self.prm['hiLapse']),
+                                             lambdaStep=self.prm['lapseStep'],
+                                             lambdaSpacing=self.prm['lapseSpacing'],
+                                             lambdaDist=self.prm['lapsePrior'],
+                                             lambdaMu=self.prm['lapsePriorMu'],
+                                             lambdaSTD=self.prm['lapsePriorSTD'],
+                                             suggestedLambdaSwpt=self.prm['suggestedLambdaSwpt'],
+                                             lambdaSwptPC=self.prm['lambdaSwptPC'],
+                                             swptEngine=self.prm['pref']['general']['UMLSweetpointEngine'],
+                                             adaptiveGrid=self.prm['pref']['general']['adaptiveParGrid'])
+        elif self.prm['stimScale'] == "Logarithmic":
+            self.UMLStack = setupUMLStack(1, model=self.prm['psyFunType'],
+                                             swptRule=self.prm['swptRule'],
+                                             nDown=self.prm["numberCorrectNeeded"],
+                                             centTend = self.prm["psyFunPosteriorSummary"],
+                                             stimScale = self.prm['stimScale'],
+                                             x0=abs(self.prm['adaptiveParam']),
+                                             xLim=(abs(self.prm['stimLo']), abs(self.prm['stimHi'])),
+                                             alphaLim=(abs(self.prm['loMidPoint']), abs(self.prm['hiMidPoint'])),
+                                             alphaStep=abs(self.prm['midPointStep']),
+                                             alphaSpacing="Linear",
+                                             alphaDist=self.prm['midPointPrior'],
+                                             alphaMu=self.prm['midPointPriorMu'],
+                                             alphaSTD=self.prm['midPointPriorSTD'],
+                                             betaLim=(self.prm['loSlope'], self.prm['hiSlope']),
+                                             betaStep=self.prm['slopeStep'],
+                                             betaSpacing=self.prm['slopeSpacing'],
+                                             betaDist=self.prm['slopePrior'],
+                                             betaMu=self.prm['slopePriorMu'],
+                                             betaSTD=self.prm['slopePriorSTD'],
+                                             gamma=gammax,
+                                             lambdaLim=(self.prm['loLapse'], self.prm['hiLapse']),
+                                             lambdaStep=self.prm['lapseStep'],
+                                             lambdaSpacing=self.prm['lapseSpacing'],
+                                             lambdaDist=self.prm['lapsePrior'],
+                                             lambdaMu=self.prm['lapsePriorMu'],
+                                             lambdaSTD=self.prm['lapsePriorSTD'],
+                                             suggestedLambdaSwpt=abs(self.prm['suggestedLambdaSwpt']),
+                                             lambdaSwptPC=self.prm['lambdaSwptPC'],
+                                             swptEngine=self.prm['pref']['general']['UMLSweetpointEngine'],
+                                             adaptiveGrid=self.prm['pref']['general']['adaptiveParGrid'])
+        #the UML paradigm runs a single track per block; self.UMLTrack
+        #is the track of the stack presented in the current trial
+        self.UMLTrack = 0
+        self.UML = self.UMLStack["tracks"][self.UMLTrack]
+
+        if self.prm["saveUMLState"] == True:
+            try:
+                self.UML["p"][...] = np.load(os.path.dirname(self.prm['resultsFile'])+self.prm[currBlock]['conditionLabel']+".npy")
+                print("Previous block state loaded")
+            except:
+                print("Previous block state could not be loaded")
+                pass
+        self.trialCount = 0
+        self.fullFileLines = []
+        self.prm['buttonCounter'] = [0 for i in range(self.prm['nAlternatives'])]
+        self.bayesCheckpointLines = 0
+        if self.prm['pref']['general']['bayesCheckpoint'] == True:
+            self.resumeBayesCheckpoint("UML")
+
+
     def sortResponseUML(self, buttonClicked):
         currBlock = 'b' + str(self.prm['currentBlock'])
         if self.prm['startOfBlock'] == True:
-            self.fullFileLines = []
-            self.fullFileSummLines = []
-
-            gammax = 1/self.prm[currBlock]['nAlternatives']
-            if self.prm['stimScale'] == "Linear":
-                self.UML = setupUML(model=self.prm['psyFunType'],
-                                    swptRule=self.prm['swptRule'],
-                                    nDown=self.prm["numberCorrectNeeded"],
-                                    centTend = self.prm["psyFunPosteriorSummary"],
-                                    stimScale = self.prm['stimScale'],
-                                    x0=self.prm['adaptiveParam'],
-                                    xLim=(self.prm['stimLo'], self.prm['stimHi']),
-                                    alphaLim=(self.prm['loMidPoint'], self.prm['hiMidPoint']),
-                                    alphaStep=self.prm['midPointStep'],
-                                    alphaSpacing="Linear",
-                                    alphaDist=self.prm['midPointPrior'],
-                                    alphaMu=self.prm['midPointPriorMu'],
-                                    alphaSTD=self.prm['midPointPriorSTD'],
-                                    betaLim=(self.prm['loSlope'], self.prm['hiSlope']),
-                                    betaStep=self.prm['slopeStep'],
-                                    betaSpacing=self.prm['slopeSpacing'],
-                                    betaDist=self.prm['slopePrior'],
-                                    betaMu=self.prm['slopePriorMu'],
-                                    betaSTD=self.prm['slopePriorSTD'],
-                                    gamma=gammax,
-                                    lambdaLim=(self.prm['loLapse'], self.prm['hiLapse']),
-                                    lambdaStep=self.prm['lapseStep'],
-                                    lambdaSpacing=self.prm['lapseSpacing'],
-                                    lambdaDist=self.prm['lapsePrior'],
-                                    lambdaMu=self.prm['lapsePriorMu'],
-                                    lambdaSTD=self.prm['lapsePriorSTD'],
-                                    suggestedLambdaSwpt=self.prm['suggestedLambdaSwpt'],
-                                    lambdaSwptPC=self.prm['lambdaSwptPC'])
-            elif self.prm['stimScale'] == "Logarithmic":
-                self.UML = setupUML(model=self.prm['psyFunType'],
-                                    swptRule=self.prm['swptRule'],
-                                    nDown=self.prm["numberCorrectNeeded"],
-                                    centTend = self.prm["psyFunPosteriorSummary"],
-                                    stimScale = self.prm['stimScale'],
-                                    x0=abs(self.prm['adaptiveParam']),
-                                    xLim=(abs(self.prm['stimLo']), abs(self.prm['stimHi'])),
-                                    alphaLim=(abs(self.prm['loMidPoint']), abs(self.prm['hiMidPoint'])),
-                                    alphaStep=abs(self.prm['midPointStep']),
-                                    alphaSpacing="Linear",
-                                    alphaDist=self.prm['midPointPrior'],
-                                    alphaMu=self.prm['midPointPriorMu'],
-                                    alphaSTD=self.prm['midPointPriorSTD'],
-                                    betaLim=(self.prm['loSlope'], self.prm['hiSlope']),
-                                    betaStep=self.prm['slopeStep'],
-                                    betaSpacing=self.prm['slopeSpacing'],
-                                    betaDist=self.prm['slopePrior'],
-                                    betaMu=self.prm['slopePriorMu'],
-                                    betaSTD=self.prm['slopePriorSTD'],
-                                    gamma=gammax,
-                                    lambdaLim=(self.prm['loLapse'], self.prm['hiLapse']),
-                                    lambdaStep=self.prm['lapseStep'],
-                                    lambdaSpacing=self.prm['lapseSpacing'],
-                                    lambdaDist=self.prm['lapsePrior'],
-                                    lambdaMu=self.prm['lapsePriorMu'],
-                                    lambdaSTD=self.prm['lapsePriorSTD'],
-                                    suggestedLambdaSwpt=abs(self.prm['suggestedLambdaSwpt']),
-                                    lambdaSwptPC=self.prm['lambdaSwptPC'])
-            
-            if self.prm["saveUMLState"] == True:
-                try:
-                    self.UML["p"] = np.load(os.path.dirname(self.prm['resultsFile'])+self.prm[currBlock]['conditionLabel']+".npy")
-                    print("Previous block state loaded")
-                except:
-                    print("Previous block state could not be loaded")
-                    pass
             self.prm['startOfBlock'] = False
-            self.trialCount = 0
-            self.fullFileLines = []
-            self.prm['buttonCounter'] = [0 for i in range(self.prm['nAlternatives'])]
 
         self.prm['buttonCounter'][buttonClicked-1] = self.prm['buttonCounter'][buttonClicked-1] + 1
             
@@ -4512,10 +4637,13 @@ class responseBox(QMainWindow):
                 #                     np.save(os.path.dirname(self.prm['resultsFile'])+self.prm[currBlock]['conditionLabel']+".npy", self.UML["p"], allow_pickle=False, fix_imports=False)
                 # else:
                 np.save(os.path.dirname(self.prm['resultsFile'])+self.prm[currBlock]['conditionLabel']+".npy", self.UML["p"])#, allow_pickle=False, fix_imports=False)
-            del self.UML #clear memory
+            if self.prm['pref']['general']['bayesCheckpoint'] == True:
+                removeCheckpoint(self.getBayesCheckpointPath())
+            del self.UML, self.UMLStack #clear memory
             self.atBlockEnd()
         else:
-            self.UML = UML_update(self.UML, response)
+            self.UMLStack = UMLStack_update(self.UMLStack, self.UMLTrack, response)
+            self.UML = self.UMLStack["tracks"][self.UMLTrack]
             if self.prm['stimScale'] == "Logarithmic":
                 if self.prm['adaptiveParam'] >=0:
                     self.prm['adaptiveParam'] = self.UML["xnextLinear"]
@@ -4526,8 +4654,60 @@ class responseBox(QMainWindow):
             # print("Est. thresh: " + str(self.UML['est_midpoint']))  
             # print('Next Stim: ' + str(self.prm['adaptiveParam']))
             # print(self.UML["phi"])
+            if self.prm['pref']['general']['bayesCheckpoint'] == True:
+                self.writeBayesCheckpoint(self.UML, "UML")
             self.doTrial()
 
+    def getBayesCheckpointPath(self):
+        currBlock = 'b' + str(self.prm['currentBlock'])
+        return os.path.join(os.path.dirname(os.path.abspath(self.prm['resultsFile'])),
+                            '.checkpoint_' + self.prm['listener'] + '_' + self.prm[currBlock]['conditionLabel'])
+
+    def writeBayesCheckpoint(self, obj, method):
+        #store with each trial the lines to be written to the results files
+        #at the end of the block, so that they can be restored on resume,
+        #and the stimulus level of the next trial
+        extra = {"fullFileLines": self.fullFileLines[self.bayesCheckpointLines:],
+                 "fullFileSummLine": self.fullFileSummLines[-1],
+                 "buttonCounter": self.prm['buttonCounter'],
+                 "adaptiveParam": float(self.prm['adaptiveParam'])}
+        self.bayesCheckpointLines = len(self.fullFileLines)
+        try:
+            writeCheckpoint(self.getBayesCheckpointPath(), obj, method, extra=extra)
+        except OSError:
+            print("Could not write block checkpoint")
+
+    def resumeBayesCheckpoint(self, method):
+        #resume an interrupted block from its checkpoint, before its first
+        #trial, so that the next trial is presented at the next stimulus
+        #level of the checkpoint
+        fPath = self.getBayesCheckpointPath()
+        if method == "PSI":
+            obj = self.PSI
+        else:
+            obj = self.UML
+        obj, extra = resumeCheckpoint(fPath, obj, method)
+        if obj == None or len(extra) >= self.prm['nTrials']:
+            removeCheckpoint(fPath)
+            return
+        if method == "PSI":
+            self.PSIStack = PSIStack_set_track(self.PSIStack, self.PSITrack, obj)
+            self.PSI = self.PSIStack["tracks"][self.PSITrack]
+        else:
+            self.UMLStack = UMLStack_set_track(self.UMLStack, self.UMLTrack, obj)
+            self.UML = self.UMLStack["tracks"][self.UMLTrack]
+        for e in extra:
+            self.fullFileLines.extend(e["fullFileLines"])
+            self.fullFileSummLines.append(e["fullFileSummLine"])
+        self.bayesCheckpointLines = len(self.fullFileLines)
+        self.prm['buttonCounter'] = extra[-1]["buttonCounter"]
+        self.prm['adaptiveParam'] = extra[-1]["adaptiveParam"]
+        self.trialCount = len(extra)
+        for thisFile in [self.resFileLog, self.fullFileLog]:
+            thisFile.write('Block resumed from checkpoint after trial ' + str(self.trialCount) + '\n\n')
+            thisFile.flush()
+        print("Block resumed after trial " + str(self.trialCount))
+
     def sortResponseUMLEstGuessRate(self, buttonClicked):
         currBlock = 'b' + str(self.prm['currentBlock'])
         if self.prm['startOfBlock'] == True:
@@ -4567,7 +4747,8 @@ class responseBox(QMainWindow):
                                                 lambdaMu=self.prm['lapsePriorMu'],
                                                 lambdaSTD=self.prm['lapsePriorSTD'],
                                                 suggestedLambdaSwpt=self.prm['suggestedLambdaSwpt'],
-                                                lambdaSwptPC=self.prm['lambdaSwptPC'])
+                                                lambdaSwptPC=self.prm['lambdaSwptPC'],
+                                                swptEngine=self.prm['pref']['general']['UMLSweetpointEngine'])
             elif self.prm['stimScale'] == "Logarithmic":
                 self.UML = setupUMLEstGuessRate(model=self.prm['psyFunType'],
                                                 swptRule=self.prm['swptRule'],
@@ -4601,7 +4782,8 @@ class responseBox(QMainWindow):
                                                 lambdaMu=self.prm['lapsePriorMu'],
                                                 lambdaSTD=self.prm['lapsePriorSTD'],
                                                 suggestedLambdaSwpt=abs(self.prm['suggestedLambdaSwpt']),
-                                                lambdaSwptPC=self.prm['lambdaSwptPC'])
+                                                lambdaSwptPC=self.prm['lambdaSwptPC'],
+                                                swptEngine=self.prm['pref']['general']['UMLSweetpointEngine'])
 
             self.prm['startOfBlock'] = False
             self.trialCount = 0
@@ -5382,6 +5564,16 @@ class responseBox(QMainWindow):
 
             thisFile.flush()
 
+        if fileType == 'log':
+            #the experiment has set the starting level, and has not generated
+            #the first stimulus yet. The PSI and UML procedures are set up here,
+            #so that a block resumed from a checkpoint starts at the next
+            #stimulus level of the checkpoint
+            if self.prm['paradigm'] == self.tr("PSI"):
+                self.setupPSIBlock()
+            elif self.prm['paradigm'] == self.tr("UML"):
+                self.setupUMLBlock()
+
     def writeResultsFooter(self, fileType):
         if fileType == 'log':
             filesToWrite = [self.resFileLog, self.fullFileLog]
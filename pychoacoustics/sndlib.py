@@ -20,13 +20,17 @@
 A module for generating sounds in python.
 """
 
-import copy, numpy, multiprocessing, warnings
-from numpy import abs, angle, arange, array, asarray, ceil, concatenate, convolve, cos, cumsum, floor, int_, int64, log, log2, log10, linspace, logspace, mean, ones, pi, real, repeat, sin, sqrt, where, zeros
+import copy, functools, numpy, multiprocessing, warnings
+from numpy import abs, angle, arange, array, asarray, ceil, concatenate, convolve, cos, cumsum, exp, floor, int_, int64, log, log2, log10, linspace, logspace, mean, ones, pi, real, repeat, sin, sqrt, where, zeros
 from numpy.fft import fft, ifft, irfft, rfft
-from scipy.signal import firwin2
+from scipy.signal import choose_conv_method, firwin2, oaconvolve
+from .synthesis_pool import getSynthesisPool
 import scipy
 
 
+#floating point type of the sounds generated by the functions of this module
+_sndPrecision = [numpy.float64]
+
 def addSounds(snd1, snd2, delay, fs):
     """
     Add or concatenate two sounds.
@@ -98,7 +102,7 @@ def addSounds(snd1, snd2, delay, fs):
     return snd
 
 def AMTone(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
-           duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+           duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate an amplitude modulated tone.
 
@@ -128,6 +132,8 @@ def AMTone(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -158,9 +164,8 @@ def AMTone(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if channel == "Right":
         snd[:, 1] = (1 + AMDepth*sin(2*pi*AMFreq*timeAll[:]+AMPhase)) * sin(2*pi*frequency * timeAll[:] + phase)
@@ -173,13 +178,13 @@ def AMTone(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left' or 'Both'")
 
     snd = setLevel_(level, snd, maxLevel, channel=channel)
-    snd = gate(ramp, snd, fs)
+    snd = gate(ramp, snd, fs, rampShape)
 
     return snd
 
 
 def AMToneVarLev(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
-                 duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+                 duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate an amplitude modulated (AM) tone.
 
@@ -209,6 +214,8 @@ def AMToneVarLev(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -241,32 +248,27 @@ def AMToneVarLev(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[0:nRamp]+AMPhase)) * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 1] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp:nRamp+nSamples]+AMPhase)) * sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:nTot, 1] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp+nSamples:nTot]+AMPhase)) * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:nTot] + phase)
+        snd[:, 1] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll+AMPhase)) * sin(2*pi*frequency * timeAll + phase)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[0:nRamp]+AMPhase)) * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp:nRamp+nSamples]+AMPhase)) * sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:nTot, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp+nSamples:nTot]+AMPhase)) * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:nTot] + phase)
+        snd[:, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll+AMPhase)) * sin(2*pi*frequency * timeAll + phase)
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[0:nRamp]+AMPhase)) * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp:nRamp+nSamples]+AMPhase)) * sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:nTot, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll[nRamp+nSamples:nTot]+AMPhase)) * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:nTot] + phase)
+        snd[:, 0] = amp * (1 + AMDepth*sin(2*pi*AMFreq*timeAll+AMPhase)) * sin(2*pi*frequency * timeAll + phase)
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left' or 'Both'")
        
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
 def AMToneIPD(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0,
               phaseIPD=0, AMPhaseIPD=0, level=60, duration=980, ramp=10,
-              channel="Right", fs=48000, maxLevel=101):
+              channel="Right", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate an amplitude modulated tone with an interaural
     phase difference (IPD) in the carrier and/or modulation phase.
@@ -301,6 +303,8 @@ def AMToneIPD(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0,
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -330,7 +334,7 @@ def AMToneIPD(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0,
 
     timeAll = arange(0, nTot) / fs
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     shiftedPhase = phase+phaseIPD
     shiftedAMPhase = AMPhase+AMPhaseIPD
@@ -348,12 +352,67 @@ def AMToneIPD(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0,
         raise ValueError("Invalid channel argument. Channel must be either 'Right' or 'Left'")
   
     snd = setLevel_(level, snd, maxLevel, channel="Both")
-    snd = gate(ramp, snd, fs)
+    snd = gate(ramp, snd, fs, rampShape)
     
     return snd
 
 
-def binauralPureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="Both", itd=0, itdRef="Right", ild=10, ildRef="Right", fs=48000, maxLevel=101):
+def applySpectralWeights(sig, weights, channel="Both", nFFT=None):
+    """
+    Multiply the spectrum of a sound by a set of weights.
+
+    The channels to be processed are transformed together with a
+    single two-dimensional real FFT.
+
+    Parameters
+    ----------
+    sig : 2-dimensional array of floats
+        The input sound.
+    weights : array of floats or complex
+        The weight of each bin of the real FFT, there must be
+        nFFT//2+1 weights. Complex weights change the phase, as
+        well as the amplitude, of the bins.
+    channel : string ('Right', 'Left' or 'Both')
+        The channel(s) to which the weights are applied. The other
+        channel is copied from the input sound.
+    nFFT : int or None
+        Number of points of the FFT. If None, the number of samples
+        of the sound is used.
+
+    Returns
+    -------
+    snd : 2-dimensional array of floats
+        The array has dimensions (nSamples, 2).
+
+    Examples
+    --------
+    >>> noise = broadbandNoise(spectrumLevel=40, duration=180, ramp=10,
+    ...     channel='Both', fs=48000, maxLevel=100)
+    >>> weights = colouredNoiseWeights("Pink", noise.shape[0], 48000, 1000)
+    >>> pinkNoise = applySpectralWeights(noise, weights, channel="Both")
+
+    """
+    nSamples = sig.shape[0]
+    if nFFT == None:
+        nFFT = nSamples
+    if channel == "Both":
+        chans = slice(0, 2)
+    elif channel == "Left":
+        chans = slice(0, 1)
+    elif channel == "Right":
+        chans = slice(1, 2)
+    else:
+        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
+
+    snd = array(sig, dtype=getSndPrecision())
+    #the transform is always computed in double precision
+    x = rfft(asarray(sig[:, chans], dtype=float), nFFT, axis=0)
+    x *= asarray(weights)[:, None]
+    snd[:, chans] = irfft(x, nFFT, axis=0)[0:nSamples]
+
+    return snd
+
+def binauralPureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="Both", itd=0, itdRef="Right", ild=10, ildRef="Right", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a pure tone with an optional interaural time or level difference.
 
@@ -390,6 +449,8 @@ def binauralPureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, c
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -450,35 +511,28 @@ def binauralPureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, c
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0., nTot) / fs
-    timeRamp = arange(0., nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phase)
+        snd[:, 1] = amp* sin(2*pi*frequency * timeAll + phase)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phase)
+        snd[:, 0] = amp* sin(2*pi*frequency * timeAll + phase)
     elif channel == "Both":
-        snd[0:nRamp, 0] = ampLeft * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phaseLeft)
-        snd[nRamp:nRamp+nSamples, 0] = ampLeft* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phaseLeft)
-        snd[nRamp+nSamples:len(timeAll), 0] = ampLeft * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phaseLeft)
+        snd[:, 0] = ampLeft* sin(2*pi*frequency * timeAll + phaseLeft)
 
-        snd[0:nRamp, 1] = ampRight * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phaseRight)
-        snd[nRamp:nRamp+nSamples, 1] = ampRight* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phaseRight)
-        snd[nRamp+nSamples:len(timeAll), 1] = ampRight * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phaseRight)
+        snd[:, 1] = ampRight* sin(2*pi*frequency * timeAll + phaseRight)
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left' or 'Both'")
 
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a broadband noise.
 
@@ -499,6 +553,8 @@ def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=4
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -531,10 +587,8 @@ def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=4
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
-    snd_mono = zeros(nTot)
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
     #random is a numpy module
     noise = (numpy.random.random(nTot) + numpy.random.random(nTot)) - (numpy.random.random(nTot) + numpy.random.random(nTot))
     RMS = sqrt(mean(noise*noise))
@@ -542,21 +596,16 @@ def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=4
     #noise/(RMS*sqrt(2)) scales the noise so that its RMS equals the RMS of a sinusoid with peak amplitude 1 (that is 1/sqrt(2))
     scaled_noise = noise / (RMS * sqrt(2))
 
-    snd_mono[0:nRamp] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise[0:nRamp]
-    snd_mono[nRamp:nRamp+nSamples] = amp * scaled_noise[nRamp:nRamp+nSamples]
-    snd_mono[nRamp+nSamples:len(timeAll)] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise[nRamp+nSamples:len(timeAll)]
+    snd_mono = amp * scaled_noise
 
     if channel == "Dichotic":
-        snd_mono2 = zeros(nTot)
         noise2 = (numpy.random.random(nTot) + numpy.random.random(nTot)) - (numpy.random.random(nTot) + numpy.random.random(nTot))
         RMS = sqrt(mean(noise2*noise2))
         #scale the noise so that its RMS = 1
         #since A = RMS*sqrt(2)
         scaled_noise2 = noise2 / (RMS * sqrt(2))
 
-        snd_mono2[0:nRamp] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise2[0:nRamp]
-        snd_mono2[nRamp:nRamp+nSamples] = amp * scaled_noise2[nRamp:nRamp+nSamples]
-        snd_mono2[nRamp+nSamples:len(timeAll)] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise2[nRamp+nSamples:len(timeAll)]
+        snd_mono2 = amp * scaled_noise2
         
     if channel == "Right":
         snd[:,1] = snd_mono
@@ -571,9 +620,11 @@ def broadbandNoise(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=4
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', or 'Dichotic'")
         
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
-def camSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=5, deltaCams=1, fmPhase=pi, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def camSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=5, deltaCams=1, fmPhase=pi, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a complex tone frequency modulated with an exponential sinusoid.
 
@@ -607,6 +658,8 @@ def camSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=5, delt
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -620,28 +673,56 @@ def camSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=5, delt
     ...     duration=180, ramp=10, channel="Both", fs=48000, maxLevel=100)
     
     """
-    for i in range(int(lowHarm), int(highHarm)+1):
-        if harmPhase == "Sine":
-            startPhase = 0
-        elif harmPhase == "Cosine":
-            startPhase = pi/2
-        elif harmPhase == "Alternating":
-            if i%2 > 0: #odd harmonic
-                startPhase = 0
-            else:
-                startPhase = pi/2
-        else:
-            raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one of 'Sine', 'Cosine', or 'Alternating'")
-        
-        if i == lowHarm:
-            snd = camSinFMTone(F0*i, fm, deltaCams, fmPhase, startPhase, level, duration, ramp, channel, fs, maxLevel)
-        else:
-            snd = snd + camSinFMTone(F0*i, fm, deltaCams, fmPhase, startPhase, level, duration, ramp, channel, fs, maxLevel)
+    amp = 10**((level - maxLevel) / 20)
+    duration = duration / 1000 #convert from ms to sec
+    ramp = ramp / 1000
+
+    nSamples = int(round(duration * fs))
+    nRamp = int(round(ramp * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    timeAll = arange(0, nTot) / fs
+
+    harms = arange(int(lowHarm), int(highHarm)+1)
+    if harmPhase == "Sine":
+        startPhase = zeros(len(harms))
+    elif harmPhase == "Cosine":
+        startPhase = zeros(len(harms)) + pi/2
+    elif harmPhase == "Alternating":
+        startPhase = where(harms%2 > 0, 0., pi/2) #odd harmonics in sine phase
+    else:
+        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one of 'Sine', 'Cosine', or 'Alternating'")
+
+    #the frequency excursion in Hz differs between harmonics, so the instantaneous
+    #phases are computed for blocks of harmonics, rather than from that of the fundamental
+    fmAng = deltaCams*cos(2*pi*fm*timeAll+fmPhase)
+    tone = zeros(nTot)
+    nHarmChunk = max(1, 2**18 // max(1, nTot))
+    for i in range(0, len(harms), nHarmChunk):
+        thisChunk = slice(i, i+nHarmChunk)
+        ang = cumsum(2*pi*freqFromERBInterval(F0*harms[thisChunk, None], fmAng), axis=1) / fs
+        ang += startPhase[thisChunk, None]
+        sin(ang, out=ang)
+        tone += ang.sum(axis=0)
+
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
+
+    if channel == "Right":
+        snd[:, 1] = amp* tone
+    elif channel == "Left":
+        snd[:, 0] = amp* tone
+    elif channel == "Both":
+        snd[:, 0] = amp* tone
+        snd[:, 1] = snd[:, 0]
+    else:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
         
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def camSinFMTone(fc=450, fm=5, deltaCams=1, fmPhase=pi, startPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=100):
+def camSinFMTone(fc=450, fm=5, deltaCams=1, fmPhase=pi, startPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=100, rampShape="cos2"):
     """
     Generate a tone frequency modulated with an exponential sinusoid.
 
@@ -669,6 +750,8 @@ def camSinFMTone(fc=450, fm=5, deltaCams=1, fmPhase=pi, startPhase=0, level=60,
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -692,33 +775,28 @@ def camSinFMTone(fc=450, fm=5, deltaCams=1, fmPhase=pi, startPhase=0, level=60,
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
     #fArr = 2*pi*fc*2**((deltaCents/1200)*cos(2*pi*fm*timeAll+fmPhase))
     fArr = 2*pi*freqFromERBInterval(fc, deltaCams*cos(2*pi*fm*timeAll+fmPhase)) 
     ang = (cumsum(fArr)/fs) + startPhase
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 1] = amp* sin(ang)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(ang)
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(ang)
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
        
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
-def chirp(freqStart=440, ftype="linear", rate=500, level=60, duration=980, phase=0, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def chirp(freqStart=440, ftype="linear", rate=500, level=60, duration=980, phase=0, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetize a chirp, that is a tone with frequency changing linearly or
     exponentially over time with a give rate.
@@ -747,6 +825,8 @@ def chirp(freqStart=440, ftype="linear", rate=500, level=60, duration=980, phase
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -769,7 +849,6 @@ def chirp(freqStart=440, ftype="linear", rate=500, level=60, duration=980, phase
     nRamp = int(round(ramp * fs))
     nTot = nSamples + (nRamp * 2)
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
     if ftype == "exponential":
         k = 2**(rate/1200)
         frequency = freqStart*( ( ( (k**timeAll) - 1) /log(k) + phase) )
@@ -779,28 +858,72 @@ def chirp(freqStart=440, ftype="linear", rate=500, level=60, duration=980, phase
         raise ValueError("Invalid ftype argument. 'ftype' must be either 'linear', or 'exponential'")
 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[0:nRamp] )
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(2*pi*frequency[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[nRamp+nSamples:len(timeAll)])
+        snd[:, 1] = amp* sin(2*pi*frequency)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[0:nRamp] )
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*frequency[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(2*pi*frequency)
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[0:nRamp] )
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*frequency[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(2*pi*frequency)
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def complexTone(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=60, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+@functools.lru_cache(maxsize=32)
+def colouredNoiseWeights(colour, nSamples, fs, refHz=1000):
+    """
+    Compute the weights of the real FFT bins that turn a white noise
+    into a noise of a different colour.
+
+    The weights are computed once for each combination of arguments,
+    and are returned as a read-only array.
+
+    Parameters
+    ----------
+    colour : string ('Pink', 'Red', 'Blue' or 'Violet')
+        The colour of the noise.
+    nSamples : int
+        Number of samples of the noise.
+    fs : int
+        Sampling frequency of the noise.
+    refHz : float
+        Reference frequency in Hz. The spectrum level at this
+        frequency is left unchanged.
+
+    Returns
+    -------
+    weights : array of floats
+        The weights of the nSamples//2+1 bins of the real FFT.
+
+    Examples
+    --------
+    >>> weights = colouredNoiseWeights("Pink", 9600, 48000, 1000)
+
+    """
+    ref = 1 + (refHz * nSamples/fs)
+    idx = arange(1, nSamples//2+1)
+    weights = ones(nSamples//2+1)
+    if colour == "Pink":
+        weights[1:] = sqrt(ref/idx)
+    elif colour == "Red":
+        weights[1:] = sqrt(ref/(idx**2))
+    elif colour == "Blue":
+        weights[1:] = sqrt(ref*idx)
+    elif colour == "Violet":
+        weights[1:] = sqrt(ref*(idx**2))
+    else:
+        raise ValueError("Invalid 'colour' argument. 'colour' must be one of 'Pink', 'Red', 'Blue', or 'Violet'")
+    weights.setflags(write=False)
+
+    return weights
+
+def complexTone(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=60, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a complex tone.
 
@@ -834,6 +957,8 @@ def complexTone(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, lev
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -857,123 +982,54 @@ def complexTone(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, lev
     nTot = nSamples + (nRamp * 2)
     
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
+    harms = arange(lowHarm, highHarm+1)
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    ang = 2 * pi * F0 * timeAll
+    if stretchHz != 0:
+        shift = 2 * pi * stretchHz * timeAll
+    else:
+        shift = None
     if channel == "Right" or channel == "Left" or channel == "Both":
-        tone = zeros(nTot)
+        tone = harmonicSum(harms, phases, ang, shift)
     elif channel == "Odd Left" or channel == "Odd Right":
-        toneOdd = zeros(nTot)
-        toneEven = zeros(nTot)
-
-    if harmPhase == "Sine":
-        for i in range(lowHarm, highHarm+1):
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone =  tone + sin(2 * pi * ((F0 * i) + stretchHz) * timeAll)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd = toneOdd + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                else:
-                    toneEven = toneEven + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-    elif harmPhase == "Cosine":
-        for i in range(lowHarm, highHarm+1):
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone = tone + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd = toneOdd + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                else:
-                    toneEven = toneEven + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-    elif harmPhase == "Alternating":
-        for i in range(lowHarm, highHarm+1):
-            if i%2 > 0: #odd harmonic
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    toneOdd = toneOdd + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-            else: #even harmonic
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    toneEven = toneEven + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-    elif harmPhase == "Schroeder-":
-        for i in range(lowHarm, highHarm+1):
-            phase = -pi*i*(i - 1)/(highHarm-lowHarm+1)
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd = toneOdd + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-                else:
-                    toneEven = toneEven + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-    elif harmPhase == "Schroeder+":
-        for i in range(lowHarm, highHarm+1):
-            phase = pi*i*(i - 1)/(highHarm-lowHarm+1)
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd = toneOdd + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-                else:
-                    toneEven = toneEven + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-    elif harmPhase == "Random":
-        for i in range(lowHarm, highHarm+1):
-            phase = numpy.random.random() * 2 * pi
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd = toneOdd + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-                else:
-                    toneEven = toneEven + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-    else:
-        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
+        odd = harms%2 > 0
+        toneOdd = harmonicSum(harms[odd], phases[odd], ang, shift)
+        toneEven = harmonicSum(harms[~odd], phases[~odd], ang, shift)
 
 
     if channel == "Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * tone
     elif channel == "Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * tone
     elif channel == "Both":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * tone
         snd[:, 1] = snd[:, 0]
     elif channel == "Odd Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:len(timeAll)]
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * toneOdd
+        snd[:, 1] = amp * toneEven
     elif channel == "Odd Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:len(timeAll)]
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * toneOdd
+        snd[:, 0] = amp * toneEven
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', 'Odd Left', or 'Odd Right'")
         
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=0, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=0, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, nProcesses=None):
     """
     Synthetise a complex tone.
 
     This function produces the same results of complexTone. The only difference
-    is that it uses the multiprocessing Python module to exploit multicore
-    processors and compute the partials in a parallel fashion. Notice that
-    there is a substantial overhead in setting up the parallel computations.
-    This means that for relatively short sounds (in the order of seconds),
-    this function will actually be *slower* than complexTone.
+    is that the partials are computed in parallel by the worker processes
+    of the synthesis pool of the session (see `synthesis_pool`), to exploit
+    multicore processors. The pool is started by the first call, which
+    will therefore be slower than the following ones.
 
     Parameters
     ----------
@@ -1005,6 +1061,10 @@ def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretc
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    nProcesses : int or None
+        Number of worker processes of the synthesis pool. If None, the
+        pool is started with one process per CPU, or the running pool
+        is used.
 
     Returns
     -------
@@ -1018,7 +1078,6 @@ def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretc
     ...     fs=48000, maxLevel=100)
     
     """
-    amp = 10**((level - maxLevel) / 20)
     durationSec = duration / 1000 #convert from ms to sec
     rampSec = ramp / 1000
     stretchHz = (F0*stretch)/100
@@ -1026,9 +1085,8 @@ def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretc
     nSamples = int(round(durationSec * fs))
     nRamp = int(round(rampSec * fs))
     nTot = nSamples + (nRamp * 2)
-    snd = zeros((nTot, 2))
-    tn = []
-    pool = multiprocessing.Pool()
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    components = []
     
     for i in range(lowHarm, highHarm+1):
         #Select channel
@@ -1047,36 +1105,14 @@ def complexToneParallel(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretc
                     thisChan = "Left"
         else:
             raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', 'Odd Right', or 'Odd Left'")
-        #Select phase
-        if harmPhase == "Sine":
-            thisPhase = 0
-        elif harmPhase == "Cosine":
-            thisPhase = pi/2
-        elif harmPhase == "Alternating":
-            if i%2 > 0: #odd harmonic
-                thisPhase = 0
-            else:
-                thisPhase = pi/2
-        elif harmPhase == "Schroeder-":
-            thisPhase = -pi * i * (i - 1) / (highHarm-lowHarm+1)
-        elif harmPhase == "Schroeder+":
-            thisPhase = pi * i * (i - 1) / (highHarm-lowHarm+1)
-        elif harmPhase == "Random":
-            thisPhase =  numpy.random.random() * 2 * pi
-        else:
-            raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
                 
-        pool.apply_async(pureTone, (F0*i+stretchHz, thisPhase, level, duration, ramp, thisChan, fs, maxLevel), callback=tn.append)
+        components.append((F0*i+stretchHz, phases[i-lowHarm], level, duration, ramp, thisChan, fs, maxLevel))
 
-    pool.close()
-    pool.join()
-    
-    for i in range(len(tn)):
-        snd = snd + tn[i]
+    snd = getSynthesisPool(nProcesses).synthesize(pureTone, components, (nTot, 2))
         
     return snd
 
-def complexToneIPD(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=60, duration=980, ramp=10, IPD=3.14, targetEar="Right", fs=48000, maxLevel=101):
+def complexToneIPD(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=60, duration=980, ramp=10, IPD=3.14, targetEar="Right", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a complex tone with an interaural phase difference (IPD).
 
@@ -1109,6 +1145,8 @@ def complexToneIPD(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0,
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -1132,62 +1170,28 @@ def complexToneIPD(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0,
     nTot = nSamples + (nRamp * 2)
     
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
-    tone = zeros(nTot)
-    toneShift = zeros(nTot)
-
-    if harmPhase == "Sine":
-        for i in range(lowHarm, highHarm+1):
-            tone =  tone + sin(2 * pi * ((F0 * i) + stretchHz) * timeAll)
-            toneShift =  toneShift + sin(2 * pi * ((F0 * i) + stretchHz) * timeAll + IPD)
-    elif harmPhase == "Cosine":
-        for i in range(lowHarm, highHarm+1):
-            tone = tone + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-            toneShift = toneShift + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll + IPD)
-    elif harmPhase == "Alternating":
-        for i in range(lowHarm, highHarm+1):
-            if i%2 > 0: #odd harmonic
-                tone = tone + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                toneShift = toneShift + cos(2 * pi * ((F0 * i)+stretchHz) * timeAll + IPD)
-            else: #even harmonic
-                tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll)
-                toneShift = toneShift + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + IPD)
-    elif harmPhase == "Schroeder-":
-        for i in range(lowHarm, highHarm+1):
-            phase = -pi * i * (i - 1) / (highHarm-lowHarm+1)
-            tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            toneShift = toneShift + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase + IPD)
-    elif harmPhase == "Schroeder+":
-        for i in range(lowHarm, highHarm+1):
-            phase = pi * i * (i - 1) / (highHarm-lowHarm+1)
-            tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            toneShift = toneShift + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase + IPD)      
-    elif harmPhase == "Random":
-        for i in range(lowHarm, highHarm+1):
-            phase = numpy.random.random() * 2 * pi
-            tone = tone + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase)
-            toneShift = toneShift + sin(2 * pi * ((F0 * i)+stretchHz) * timeAll + phase + IPD)
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
+    harms = arange(lowHarm, highHarm+1)
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    ang = 2 * pi * F0 * timeAll
+    if stretchHz != 0:
+        shift = 2 * pi * stretchHz * timeAll
     else:
-        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
+        shift = None
+    tone = harmonicSum(harms, phases, ang, shift)
+    toneShift = harmonicSum(harms, phases + IPD, ang, shift)
 
     if targetEar == "Right":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * tone
 
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneShift[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneShift[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneShift[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * toneShift
     elif targetEar == "Left":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * tone
 
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneShift[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneShift[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneShift[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * toneShift
+
+    snd = gateSamples(nRamp, snd, rampShape)
 
     return snd
 
@@ -1231,36 +1235,32 @@ def delayAdd(sig, delay, gain, iterations, configuration, fs):
     #delay in seconds
     delayPnt = round(delay * fs)
     nSamples = len(sig[:,0])
-    en_input_right = sqrt(sum(sig[:,1]**2))
-    en_input_left = sqrt(sum(sig[:,0]**2))
-    snd = zeros((nSamples, 2))
-    delayed_sig = zeros((nSamples, 2))
+    en_input = sqrt(numpy.sum(sig**2, axis=0, dtype=float))
+    #each iteration advances the signal circularly by delayPnt samples,
+    #which multiplies its DFT by w, so the whole network is a single
+    #comb filter applied in the frequency domain
+    w = exp(2j * pi * arange(0, nSamples//2+1) * delayPnt / nSamples)
     if configuration == "Add Same":
-        for i in range(iterations):
-            delayed_sig = concatenate((sig[delayPnt:nSamples], sig[0:delayPnt]), axis=0)
-            delayed_sig = delayed_sig * gain
-            sig = sig + delayed_sig
+        #sig_i = sig_i-1 + gain*w*sig_i-1
+        H = (1 + gain * w)**iterations
     elif configuration == "Add Original":
-        original_sig = copy.copy(sig)
+        #sig_i = sig_0 + gain*w*sig_i-1
+        H = ones(len(w), dtype=complex)
         for i in range(iterations):
-            delayed_sig = concatenate((sig[delayPnt:nSamples], sig[0:delayPnt]), axis=0)
-            delayed_sig = delayed_sig * gain
-            sig = original_sig + delayed_sig
-    snd = sig
-    en_output_right = sqrt(sum(snd[:,1]**2))
-    en_output_left = sqrt(sum(snd[:,0]**2))
-    scale_right = en_input_right / en_output_right
-    scale_left  = en_input_left / en_output_left
-
-    snd[:,1] = snd[:,1] * scale_right
-    snd[:,0] = snd[:,0] * scale_left
+            H = 1 + gain * w * H
+    snd = applySpectralWeights(sig, H)
+    #restore the energy of the input in each channel
+    en_output = sqrt(numpy.sum(snd**2, axis=0, dtype=float))
+    for ch in range(2):
+        if en_output[ch] > 0:
+            snd[:,ch] = snd[:,ch] * (en_input[ch] / en_output[ch])
 
     return snd
 
 def dichoticNoiseFromSin(F0=300, lowHarm=1, highHarm=3, compLevel=30, narrowBandCompLevel=30,
                          lowFreq=40, highFreq=2000, compSpacing=10, sigBandwidth=100, distanceUnit="Cent",
                          phaseRelationship="NoSpi", dichoticDifference="IPD Stepped",
-                         dichoticDifferenceValue=pi, duration=380, ramp=10, fs=48000, maxLevel=101):
+                         dichoticDifferenceValue=pi, duration=380, ramp=10, fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate Huggins pitch or narrow-band noise from random-phase sinusoids.
 
@@ -1324,6 +1324,8 @@ def dichoticNoiseFromSin(F0=300, lowHarm=1, highHarm=3, compLevel=30, narrowBand
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -1351,8 +1353,7 @@ def dichoticNoiseFromSin(F0=300, lowHarm=1, highHarm=3, compLevel=30, narrowBand
     nRamp = int(round(sRamp * fs))
     nTot = nSamples + (nRamp * 2)
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if distanceUnit == 'Hz':
         noiseBandwidth = highFreq - lowFreq
@@ -1445,7 +1446,7 @@ def dichoticNoiseFromSin(F0=300, lowHarm=1, highHarm=3, compLevel=30, narrowBand
 
     snd[:,0] = sum(sinArrayRight,0)
     snd[:,1] = sum(sinArrayLeft,0)
-    snd = gate(ramp, snd, fs)
+    snd = gate(ramp, snd, fs, rampShape)
 
     return snd
     
@@ -1482,7 +1483,7 @@ def ERBDistance(f1, f2):
 
 def expAMNoise(fc=150, fm=2.5, deltaCents=1200, fmPhase=pi, AMDepth=1,
                spectrumLevel=24, duration=480, ramp=10, channel="Both",
-               fs=48000, maxLevel=101):
+               fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a sinusoidally amplitude-modulated noise with an exponentially
     modulated AM frequency.
@@ -1514,6 +1515,8 @@ def expAMNoise(fc=150, fm=2.5, deltaCents=1200, fmPhase=pi, AMDepth=1,
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -1536,9 +1539,8 @@ def expAMNoise(fc=150, fm=2.5, deltaCents=1200, fmPhase=pi, AMDepth=1,
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
     #random is a numpy module
     noise = (numpy.random.random(nTot) + numpy.random.random(nTot)) - (numpy.random.random(nTot) + numpy.random.random(nTot))
     RMS = sqrt(mean(noise*noise))
@@ -1555,28 +1557,22 @@ def expAMNoise(fc=150, fm=2.5, deltaCents=1200, fmPhase=pi, AMDepth=1,
     #* (1 + AMDepth*sin(ang[nRamp:nRamp+nSamples]))
     #* (1 + AMDepth*sin(ang[nRamp+nSamples:len(timeAll)]))
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * (1 + AMDepth*sin(ang[0:nRamp])) * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1] = amp * (1 + AMDepth*sin(ang[nRamp:nRamp+nSamples])) * scaled_noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * (1 + AMDepth*sin(ang[nRamp+nSamples:len(timeAll)])) * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * (1 + AMDepth*sin(ang)) * scaled_noise
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * (1 + AMDepth*sin(ang[0:nRamp])) * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0] = amp * (1 + AMDepth*sin(ang[nRamp:nRamp+nSamples])) * scaled_noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * (1 + AMDepth*sin(ang[nRamp+nSamples:len(timeAll)])) * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * (1 + AMDepth*sin(ang)) * scaled_noise
     elif channel == "Both":
-        snd[0:nRamp, 1] = amp * (1 + AMDepth*sin(ang[0:nRamp])) * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1] = amp * (1 + AMDepth*sin(ang[nRamp:nRamp+nSamples])) * scaled_noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * (1 + AMDepth*sin(ang[nRamp+nSamples:len(timeAll)])) * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * (1 + AMDepth*sin(ang)) * scaled_noise
 
-        snd[0:nRamp, 0] = amp * (1 + AMDepth*sin(ang[0:nRamp])) * ((1-cos(pi * timeRamp/nRamp))/2) * scaled_noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0] = amp * (1 + AMDepth*sin(ang[nRamp:nRamp+nSamples])) * scaled_noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * (1 + AMDepth*sin(ang[nRamp+nSamples:len(timeAll)])) * ((1+cos(pi * timeRamp/nRamp))/2) * scaled_noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * (1 + AMDepth*sin(ang)) * scaled_noise
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def expSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=40, deltaCents=1200, fmPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def expSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=40, deltaCents=1200, fmPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a frequency-modulated complex tone with an exponential sinusoid.
 
@@ -1605,6 +1601,8 @@ def expSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=40, del
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -1618,28 +1616,48 @@ def expSinFMComplex(F0=150, lowHarm=1, highHarm=10, harmPhase="Sine", fm=40, del
     ...     duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101)
     
     """
+    amp = 10**((level - maxLevel) / 20)
+    duration = duration / 1000 #convert from ms to sec
+    ramp = ramp / 1000
 
-    for i in range(int(lowHarm), int(highHarm)+1):
-        if harmPhase == "Sine":
-            startPhase = 0
-        elif harmPhase == "Cosine":
-            startPhase = pi/2
-        elif harmPhase == "Alternating":
-            if i%2 > 0: #odd harmonic
-                startPhase = 0
-            else:
-                startPhase = pi/2
-        else:
-            raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one of 'Sine', 'Cosine', or 'Alternating'")
-        if i == lowHarm:
-            snd = expSinFMTone(F0*i, fm, deltaCents, fmPhase, startPhase, level, duration, ramp, channel, fs, maxLevel)
-        else:
-            snd = snd + expSinFMTone(F0*i, fm, deltaCents, fmPhase, startPhase, level, duration, ramp, channel, fs, maxLevel)
+    nSamples = int(round(duration * fs))
+    nRamp = int(round(ramp * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    timeAll = arange(0, nTot) / fs
+
+    harms = arange(int(lowHarm), int(highHarm)+1)
+    if harmPhase == "Sine":
+        startPhase = zeros(len(harms))
+    elif harmPhase == "Cosine":
+        startPhase = zeros(len(harms)) + pi/2
+    elif harmPhase == "Alternating":
+        startPhase = where(harms%2 > 0, 0., pi/2) #odd harmonics in sine phase
+    else:
+        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one of 'Sine', 'Cosine', or 'Alternating'")
+
+    fArr = 2*pi*F0*2**((deltaCents/1200)*cos(2*pi*fm*timeAll+fmPhase))
+    ang = cumsum(fArr)/fs
+    tone = harmonicSum(harms, startPhase, ang)
+
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
+
+    if channel == "Right":
+        snd[:, 1] = amp* tone
+    elif channel == "Left":
+        snd[:, 0] = amp* tone
+    elif channel == "Both":
+        snd[:, 0] = amp* tone
+        snd[:, 1] = snd[:, 0]
+    else:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
         
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def expSinFMTone(fc=450, fm=5, deltaCents=300, fmPhase=pi, startPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def expSinFMTone(fc=450, fm=5, deltaCents=300, fmPhase=pi, startPhase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a frequency-modulated tone with an exponential sinusoid.
 
@@ -1668,6 +1686,8 @@ def expSinFMTone(fc=450, fm=5, deltaCents=300, fmPhase=pi, startPhase=0, level=6
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -1691,33 +1711,28 @@ def expSinFMTone(fc=450, fm=5, deltaCents=300, fmPhase=pi, startPhase=0, level=6
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
     fArr = 2*pi*fc*2**((deltaCents/1200)*cos(2*pi*fm*timeAll+fmPhase))
     ang = (cumsum(fArr)/fs) + startPhase
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 1] = amp* sin(ang)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(ang)
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(ang[0:nRamp])
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(ang[nRamp:nRamp+nSamples])
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(ang[nRamp+nSamples:len(timeAll)])
+        snd[:, 0] = amp* sin(ang)
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
        
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, duration=430, ramp=10, fmFreq=1.25, fmDepth=40, fmStartPhase=1.5*pi, fmStartTime=25, fmDuration=400, levelAdj=True, channel="Both", fs=48000, maxLevel=101):
+def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, duration=430, ramp=10, fmFreq=1.25, fmDepth=40, fmStartPhase=1.5*pi, fmStartTime=25, fmDuration=400, levelAdj=True, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a complex tone with an embedded FM starting and stopping
     at a chosen time after the tone onset.
@@ -1762,6 +1777,8 @@ def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Examples
     --------
@@ -1782,7 +1799,6 @@ def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     nTot = nSamples + (nRamp * 2)
     
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
 
     timeAllSamp = arange(0, nTot) #time array not scaled by fs
     time1 = timeAllSamp[0:fmStartPnt]
@@ -1800,12 +1816,7 @@ def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     startF0Rad = 2*pi*(midF0 + fmDepthHz*sin(fmStartPhase))/fs
     endF0Rad = 2*pi*(midF0 + fmDepthHz*sin(fmStartPhase + nFMSamples*fmRadFreq)) / fs
     
-    if channel == "Right" or channel == "Left" or channel == "Both":
-        tone = zeros(nTot)
-    elif channel == "Odd Left" or channel == "Odd Right":
-        toneOdd = zeros(nTot)
-        toneEven = zeros(nTot)
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     #from Hartmann, WM (1997) Signals, sound, and sensation. New York: AIP Press
     #angular frequency is the time derivative of the instantaneous phase
@@ -1822,126 +1833,22 @@ def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     #eq.4: PHI(t) = wc*t - (dw/wm)*cos(wm*t+phi)
     #this is what we're actually using below
     
-    if harmPhase == "Sine":
-        for i in range(lowHarm, highHarm+1):
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone[0:fmStartPnt] =  tone[0:fmStartPnt] + sin(startF0Rad*i*time1)
-                phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd[0:fmStartPnt] = toneOdd[0:fmStartPnt] + sin(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneOdd[fmStartPnt:fmStartPnt+nFMSamples] = toneOdd[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneOdd[fmStartPnt+nFMSamples:nTot] =  toneOdd[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2)
-                else:
-                    toneEven[0:fmStartPnt] = toneEven[0:fmStartPnt] + sin(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneEven[fmStartPnt:fmStartPnt+nFMSamples] = toneEven[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneEven[fmStartPnt+nFMSamples:nTot] =  toneEven[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2)
-    elif harmPhase == "Cosine":
-        for i in range(lowHarm, highHarm+1):
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone[0:fmStartPnt] =  tone[0:fmStartPnt] + cos(startF0Rad*i*time1)
-                phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + cos(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + cos(i*endF0Rad*time3 + phaseCorrect2)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd[0:fmStartPnt] = toneOdd[0:fmStartPnt] + cos(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneOdd[fmStartPnt:fmStartPnt+nFMSamples] = toneOdd[fmStartPnt:fmStartPnt+nFMSamples] + cos(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneOdd[fmStartPnt+nFMSamples:nTot] =  toneOdd[fmStartPnt+nFMSamples:nTot] + cos(i*endF0Rad*time3 + phaseCorrect2)
-                else:
-                    toneEven[0:fmStartPnt] = toneEven[0:fmStartPnt] + cos(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneEven[fmStartPnt:fmStartPnt+nFMSamples] = toneEven[fmStartPnt:fmStartPnt+nFMSamples] + cos(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneEven[fmStartPnt+nFMSamples:nTot] =  toneEven[fmStartPnt+nFMSamples:nTot] + cos(i*endF0Rad*time3 + phaseCorrect2)
-
-    elif harmPhase == "Alternating":
-        for i in range(lowHarm, highHarm+1):
-            if i%2 > 0: #odd harmonic
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone[0:fmStartPnt] =  tone[0:fmStartPnt] + cos(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + cos(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + cos(i*endF0Rad*time3 + phaseCorrect2)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    toneOdd[0:fmStartPnt] = toneOdd[0:fmStartPnt] + cos(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneOdd[fmStartPnt:fmStartPnt+nFMSamples] = toneOdd[fmStartPnt:fmStartPnt+nFMSamples] + cos(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneOdd[fmStartPnt+nFMSamples:nTot] =  toneOdd[fmStartPnt+nFMSamples:nTot] + cos(i*endF0Rad*time3 + phaseCorrect2)
-            else: #even harmonic
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone[0:fmStartPnt] =  tone[0:fmStartPnt] + sin(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    toneEven[0:fmStartPnt] = toneEven[0:fmStartPnt] + sin(startF0Rad*i*time1)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneEven[fmStartPnt:fmStartPnt+nFMSamples] = toneEven[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)))
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneEven[fmStartPnt+nFMSamples:nTot] =  toneEven[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2)
-    elif harmPhase in ["Schroeder-", "Schroeder+"]:
-        for i in range(lowHarm, highHarm+1):
-            if harmPhase == "Schroeder-":
-                phase = -pi * i * (i - 1) / (highHarm-lowHarm+1)
-            elif harmPhase == "Schroeder+":
-                phase = pi * i * (i - 1) / (highHarm-lowHarm+1)
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone[0:fmStartPnt] =  tone[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd[0:fmStartPnt] =  toneOdd[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneOdd[fmStartPnt:fmStartPnt+nFMSamples] = toneOdd[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneOdd[fmStartPnt+nFMSamples:nTot] =  toneOdd[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-                else:
-                    toneEven[0:fmStartPnt] =  toneEven[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneEven[fmStartPnt:fmStartPnt+nFMSamples] = toneEven[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneEven[fmStartPnt+nFMSamples:nTot] =  toneEven[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-    elif harmPhase == "Random":
-        for i in range(lowHarm, highHarm+1):
-            phase = numpy.random.random() * 2 * pi
-            if channel == "Right" or channel == "Left" or channel == "Both":
-                tone[0:fmStartPnt] =  tone[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                tone[fmStartPnt:fmStartPnt+nFMSamples] = tone[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                tone[fmStartPnt+nFMSamples:nTot] =  tone[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-            elif channel == "Odd Left" or channel == "Odd Right":
-                if i%2 > 0: #odd harmonic
-                    toneOdd[0:fmStartPnt] =  toneOdd[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneOdd[fmStartPnt:fmStartPnt+nFMSamples] = toneOdd[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneOdd[fmStartPnt+nFMSamples:nTot] =  toneOdd[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-                else:
-                    toneEven[0:fmStartPnt] =  toneEven[0:fmStartPnt] + sin(startF0Rad*i*time1 + phase)
-                    phaseCorrect1 =  (i*startF0Rad*fmStartPnt) - (i*midF0Rad*fmStartPnt) + (i*B*cos(fmStartPhase)) 
-                    toneEven[fmStartPnt:fmStartPnt+nFMSamples] = toneEven[fmStartPnt:fmStartPnt+nFMSamples] + sin(midF0Rad*i*time2+phaseCorrect1-(i*B*cos(fmRadFreq*fmTime+fmStartPhase)) + phase)
-                    phaseCorrect2 = (i*midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - i*B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (i*endF0Rad*(fmStartPnt+nFMSamples))
-                    toneEven[fmStartPnt+nFMSamples:nTot] =  toneEven[fmStartPnt+nFMSamples:nTot] + sin(i*endF0Rad*time3 + phaseCorrect2 + phase)
-    else:
-        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
+    #instantaneous phase of the fundamental, that of harmonic `i` is `i` times larger
+    phaseCorrect1 =  (startF0Rad*fmStartPnt) - (midF0Rad*fmStartPnt) + (B*cos(fmStartPhase))
+    phaseCorrect2 = (midF0Rad*(fmStartPnt+nFMSamples)) + (phaseCorrect1 - B*cos(fmRadFreq*nFMSamples + fmStartPhase)) - (endF0Rad*(fmStartPnt+nFMSamples))
+    ang = zeros(nTot)
+    ang[0:fmStartPnt] = startF0Rad*time1
+    ang[fmStartPnt:fmStartPnt+nFMSamples] = midF0Rad*time2+phaseCorrect1-(B*cos(fmRadFreq*fmTime+fmStartPhase))
+    ang[fmStartPnt+nFMSamples:nTot] = endF0Rad*time3 + phaseCorrect2
+
+    harms = arange(lowHarm, highHarm+1)
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    if channel == "Right" or channel == "Left" or channel == "Both":
+        tone = harmonicSum(harms, phases, ang)
+    elif channel == "Odd Left" or channel == "Odd Right":
+        odd = harms%2 > 0
+        toneOdd = harmonicSum(harms[odd], phases[odd], ang)
+        toneEven = harmonicSum(harms[~odd], phases[~odd], ang)
             
 
     #numpy.savetxt('ptone.txt', tone)
@@ -1963,39 +1870,27 @@ def fm_complex1(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     #end of level correction -----------    
     
     if channel == "Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 1] = amp * tone
     elif channel == "Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * tone
     elif channel == "Both":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * tone
         snd[:, 1] = snd[:, 0]
     elif channel == "Odd Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:nTot]
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * toneOdd
+        snd[:, 1] = amp * toneEven
     elif channel == "Odd Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:nTot]
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:nTot]
+        snd[:, 1] = amp * toneOdd
+        snd[:, 0] = amp * toneEven
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both', 'Odd Right', or Odd Left'")
         
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
-def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, duration=430, ramp=10, fmFreq=1.25, fmDepth=40, fmStartPhase=1.5*pi, fmStartTime=25, fmDuration=400, levelAdj=True, channel="Both", fs=48000, maxLevel=101):
+def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, duration=430, ramp=10, fmFreq=1.25, fmDepth=40, fmStartPhase=1.5*pi, fmStartTime=25, fmDuration=400, levelAdj=True, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
 
     """
     Synthetise a complex tone with an embedded FM starting and stopping
@@ -2041,6 +1936,8 @@ def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Examples
     --------
@@ -2061,7 +1958,6 @@ def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     nTot = nSamples + (nRamp * 2)
     
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
 
     timeAllSamp = arange(0, nTot) #time array not scaled by fs
     time1 = timeAllSamp[0:fmStartPnt]
@@ -2082,12 +1978,7 @@ def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     startF0 = midF0 + fmDepthHz*sin(fmStartPhase)
     endF0 = midF0 + fmDepthHz*sin(fmStartPhase + nFMSamples*fmRadFreq)
     
-    if channel == "Right" or channel == "Left" or channel == "Both":
-        tone = zeros(nTot)
-    elif channel == "Odd Left" or channel == "Odd Right":
-        toneOdd = zeros(nTot)
-        toneEven = zeros(nTot)
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     #from Hartmann, WM (1997) Signals, sound, and sensation. New York: AIP Press
     #angular frequency is the time derivative of the instantaneous phase
@@ -2104,74 +1995,22 @@ def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     #eq.4: PHI(t) = wc*t - (dw/wm)*cos(wm*t+phi)
     #this is what we're actually using below
     
-    for i in range(lowHarm, highHarm+1):
-            fArr = zeros(nTot)
-            fArr[0:fmStartPnt] = startF0*i
-            fArr[fmStartPnt:fmStartPnt+nFMSamples] = (midF0*i + fmDepthHz*i*sin(2*pi*fmFreq*fmTime/fs+fmStartPhase))
-            fArr[fmStartPnt+nFMSamples:nTot] = endF0*i
-            if harmPhase == "Sine":
-                ang = cumsum(2*pi*fArr/fs)
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + sin(ang)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    if i%2 > 0: #odd harmonic
-                        toneOdd = toneOdd + sin(ang)
-                    else:
-                        toneEven = toneEven + sin(ang)
-            elif harmPhase == "Cosine":
-                ang = cumsum(2*pi*fArr/fs)
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + cos(ang)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    if i%2 > 0: #odd harmonic
-                        toneOdd = toneOdd + cos(ang)
-                    else:
-                        toneEven = toneEven + cos(ang)
-
-            elif harmPhase == "Alternating":
-                ang = cumsum(2*pi*fArr/fs)
-                if i%2 > 0: #odd harmonic
-                    if channel == "Right" or channel == "Left" or channel == "Both":
-                        tone = tone + cos(ang)
-                    elif channel == "Odd Left" or channel == "Odd Right":
-                        toneOdd = toneOdd + cos(ang)
-                else: #even harmonic
-                    if channel == "Right" or channel == "Left" or channel == "Both":
-                        tone = tone + sin(ang)
-                    elif channel == "Odd Left" or channel == "Odd Right":
-                        toneEven = toneEven + sin(ang)
-            elif harmPhase == "Schroeder-":
-                phase = -pi * i * (i - 1) / (highHarm-lowHarm+1)
-                ang = cumsum(2*pi*fArr/fs + phase)
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + sin(ang)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    if i%2 > 0: #odd harmonic
-                        toneOdd = toneOdd + sin(ang)
-                    else:
-                        toneEven = toneEven + sin(ang)
-            elif harmPhase == "Schroeder+":
-                phase = pi * i * (i - 1) / (highHarm-lowHarm+1)
-                ang = cumsum(2*pi*fArr/fs + phase)
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + sin(ang)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    if i%2 > 0: #odd harmonic
-                        toneOdd = toneOdd + sin(ang)
-                    else:
-                        toneEven = toneEven + sin(ang)
-            elif harmPhase == "Random":
-                phase = numpy.random.random() * 2 * pi
-                ang = cumsum(2*pi*fArr/fs + phase)
-                if channel == "Right" or channel == "Left" or channel == "Both":
-                    tone = tone + sin(ang)
-                elif channel == "Odd Left" or channel == "Odd Right":
-                    if i%2 > 0: #odd harmonic
-                        toneOdd = toneOdd + sin(ang)
-                    else:
-                        toneEven = toneEven + sin(ang)
-            else:
-                raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
+    #instantaneous frequency and phase of the fundamental, those of
+    #harmonic `i` are `i` times larger
+    fArr = zeros(nTot)
+    fArr[0:fmStartPnt] = startF0
+    fArr[fmStartPnt:fmStartPnt+nFMSamples] = (midF0 + fmDepthHz*sin(2*pi*fmFreq*fmTime/fs+fmStartPhase))
+    fArr[fmStartPnt+nFMSamples:nTot] = endF0
+    ang = cumsum(2*pi*fArr/fs)
+
+    harms = arange(lowHarm, highHarm+1)
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    if channel == "Right" or channel == "Left" or channel == "Both":
+        tone = harmonicSum(harms, phases, ang)
+    elif channel == "Odd Left" or channel == "Odd Right":
+        odd = harms%2 > 0
+        toneOdd = harmonicSum(harms[odd], phases[odd], ang)
+        toneEven = harmonicSum(harms[~odd], phases[~odd], ang)
 
 
     #level correction --------------
@@ -2192,40 +2031,28 @@ def fm_complex2(midF0=140, harmPhase="Sine", lowHarm=1, highHarm=10, level=60, d
     #end of level correction -----------    
     
     if channel == "Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 1] = amp * tone
     elif channel == "Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * tone
     elif channel == "Both":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  tone[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * tone[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * tone[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * tone
         snd[:, 1] = snd[:, 0]
     elif channel == "Odd Left":
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:nTot]
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:nTot]
+        snd[:, 0] = amp * toneOdd
+        snd[:, 1] = amp * toneEven
     elif channel == "Odd Right":
-        snd[0:nRamp, 1]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) *  toneOdd[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1]        = amp * toneOdd[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneOdd[nRamp+nSamples:nTot]
-        snd[0:nRamp, 0]                     = amp * ((1-cos(pi * timeRamp/nRamp))/2) * toneEven[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0]        = amp * toneEven[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:nTot, 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * toneEven[nRamp+nSamples:nTot]
+        snd[:, 1] = amp * toneOdd
+        snd[:, 0] = amp * toneEven
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', 'Odd Right', or 'Odd Left'")
         
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def FMTone(fc=1000, fm=40, mi=1, phase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def FMTone(fc=1000, fm=40, mi=1, phase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Generate a frequency modulated tone.
 
@@ -2255,6 +2082,8 @@ def FMTone(fc=1000, fm=40, mi=1, phase=0, level=60, duration=180, ramp=10, chann
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of
         amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -2276,30 +2105,84 @@ def FMTone(fc=1000, fm=40, mi=1, phase=0, level=60, duration=180, ramp=10, chann
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc*timeAll[0:nRamp] + mi*sin(2*pi*fm * timeAll[0:nRamp] + phase))
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(2*pi*fc * timeAll[nRamp:nRamp+nSamples] +mi*sin(2*pi*fm * timeAll[nRamp:nRamp+nSamples] + phase))
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc * timeAll[nRamp+nSamples:len(timeAll)]+mi*sin(2*pi*fm * timeAll[nRamp+nSamples:len(timeAll)] + phase))
+        snd[:, 1] = amp* sin(2*pi*fc * timeAll +mi*sin(2*pi*fm * timeAll + phase))
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc*timeAll[0:nRamp] + mi*sin(2*pi*fm * timeAll[0:nRamp] + phase))
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*fc * timeAll[nRamp:nRamp+nSamples] +mi*sin(2*pi*fm * timeAll[nRamp:nRamp+nSamples] + phase))
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc * timeAll[nRamp+nSamples:len(timeAll)]+mi*sin(2*pi*fm * timeAll[nRamp+nSamples:len(timeAll)] + phase))
+        snd[:, 0] = amp* sin(2*pi*fc * timeAll +mi*sin(2*pi*fm * timeAll + phase))
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc*timeAll[0:nRamp] + mi*sin(2*pi*fm * timeAll[0:nRamp] + phase))
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*fc * timeAll[nRamp:nRamp+nSamples] +mi*sin(2*pi*fm * timeAll[nRamp:nRamp+nSamples] + phase))
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*fc * timeAll[nRamp+nSamples:len(timeAll)]+mi*sin(2*pi*fm * timeAll[nRamp+nSamples:len(timeAll)] + phase))
+        snd[:, 0] = amp* sin(2*pi*fc * timeAll +mi*sin(2*pi*fm * timeAll + phase))
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
        
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
-def fir2Filt(f1, f2, f3, f4, snd, fs):
+@functools.lru_cache(maxsize=64)
+def fir2Design(f1, f2, f3, f4, fs, n=256):
+    """
+    Design the fir2 filter used by `fir2Filt`.
+
+    The filter coefficients are computed once for each combination
+    of arguments, and are returned as a read-only array.
+
+    Parameters
+    ----------
+    f1 : float
+        Frequency in hertz of the point at which the transition
+        for the low-frequency cutoff ends. 
+    f2 : float
+        Frequency in hertz of the point at which the transition
+        for the low-frequency cutoff starts.
+    f3 : float
+        Frequency in hertz of the point at which the transition
+        for the high-frequency cutoff starts.
+    f4 : float
+        Frequency in hertz of the point at which the transition
+        for the high-frequency cutoff ends. 
+    fs : int
+        Sampling frequency of the sound to be filtered.
+    n : int
+        Number of taps of the filter.
+
+    Returns
+    -------
+    b : array of floats
+        The filter coefficients.
+
+    Examples
+    --------
+    >>> b = fir2Design(f1=400, f2=600, f3=4000, f4=4400, fs=48000, n=256)
+
+    """
+    f1 = (f1 * 2) / fs
+    f2 = (f2 * 2) / fs
+    f3 = (f3 * 2) / fs
+    f4 = (f4 * 2) / fs
+
+    if f2 == 0: #low pass
+        f = [0, f3, f4, 1]
+        m = [1, 1, 0.00003, 0]
+        
+    elif f3 < 1: #bandpass
+        f = [0, f1, f2, ((f2+f3)/2), f3, f4, 1]
+        m = [0, 0.00003, 1, 1, 1, 0.00003, 0]
+        
+    else:#high pass
+        f = [0, f1, f2, 0.999999, 1] #scipy wants that gain at the Nyquist is 0
+        m = [0, 0.00003, 1, 1, 0]
+        
+    b = firwin2(n, f, m)
+    b.setflags(write=False)
+
+    return b
+
+def fir2Filt(f1, f2, f3, f4, snd, fs, n=256):
     """
     Filter signal with a fir2 filter.
 
@@ -2327,6 +2210,8 @@ def fir2Filt(f1, f2, f3, f4, snd, fs):
         The sound to be filtered.
     fs : int
         Sampling frequency of 'snd'.
+    n : int
+        Number of taps of the filter.
 
     Returns
     -------
@@ -2339,8 +2224,10 @@ def fir2Filt(f1, f2, f3, f4, snd, fs):
     frequency (fs/2) the filter will be highpass.
     In the other cases the filter will be bandpass.
 
-    The order of the filter (number of taps) is fixed at 256.
-    This function uses internally 'scipy.signal.firwin2'.
+    The filter is designed with 'scipy.signal.firwin2' (see `fir2Design`).
+    Long filters are applied to both channels at once by overlap-add
+    FFT convolution, so that longer and steeper filters cost little
+    more time than the default 256 taps.
        
     Examples
     --------
@@ -2354,30 +2241,15 @@ def fir2Filt(f1, f2, f3, f4, snd, fs):
     ...     snd=noise, fs=48000) #bandpass filter
     """
 
-    f1 = (f1 * 2) / fs
-    f2 = (f2 * 2) / fs
-    f3 = (f3 * 2) / fs
-    f4 = (f4 * 2) / fs
-
-    n = 256
-
-    if f2 == 0: #low pass
-        f = [0, f3, f4, 1]
-        m = [1, 1, 0.00003, 0]
-        
-    elif f3 < 1: #bandpass
-        f = [0, f1, f2, ((f2+f3)/2), f3, f4, 1]
-        m = [0, 0.00003, 1, 1, 1, 0.00003, 0]
-        
-    else:#high pass
-        f = [0, f1, f2, 0.999999, 1] #scipy wants that gain at the Nyquist is 0
-        m = [0, 0.00003, 1, 1, 0]
-        
-    #print(f)
-    b = firwin2 (n,f,m);
-    x = copy.copy(snd)
-    x[:, 0] = convolve(snd[:,0], b, 1)
-    x[:, 1] = convolve(snd[:,1], b, 1)
+    b = fir2Design(f1, f2, f3, f4, fs, n)
+    #short filters are faster to apply directly, long filters by
+    #overlap-add FFT convolution of both channels at once
+    if snd.shape[0] >= n and choose_conv_method(snd[:,0], b, mode="same") == "direct":
+        x = copy.copy(snd)
+        x[:, 0] = convolve(snd[:,0], b, 1)
+        x[:, 1] = convolve(snd[:,1], b, 1)
+    else:
+        x = oaconvolve(snd, b[:, None], mode="same", axes=0)
     
     return x
 
@@ -2420,10 +2292,12 @@ def freqFromERBInterval(f1, deltaERB):
     return f2
 
 
-def gate(ramps, sig, fs):
+def gate(ramps, sig, fs, rampShape="cos2"):
     """
     Impose onset and offset ramps to a sound.
 
+    The ramps are imposed in place, to all the channels of the sound.
+
     Parameters
     ----------
     ramps : float
@@ -2432,6 +2306,8 @@ def gate(ramps, sig, fs):
         The signal on which the ramps should be imposed.
     fs : int
         The sampling frequency os 'sig'
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the ramps. See `rampWindows`.
 
     Returns
     -------
@@ -2448,14 +2324,44 @@ def gate(ramps, sig, fs):
     
     ramps = ramps / 1000.
     nRamp = int(round(ramps * fs))
-    timeRamp = arange(0., nRamp)
-    nTot = len(sig[:,1])
-    nStartSecondRamp = nTot - nRamp
-    
-    sig[0:nRamp, 0] = sig[0:nRamp, 0] *  ((1-cos(pi * timeRamp/nRamp))/2)
-    sig[0:nRamp, 1] = sig[0:nRamp, 1] *  ((1-cos(pi * timeRamp/nRamp))/2)
-    sig[nStartSecondRamp:nTot, 0] = sig[nStartSecondRamp:nTot, 0] * ((1+cos(pi * timeRamp/nRamp))/2)
-    sig[nStartSecondRamp:nTot, 1] = sig[nStartSecondRamp:nTot, 1] * ((1+cos(pi * timeRamp/nRamp))/2)
+    sig = gateSamples(nRamp, sig, rampShape)
+
+    return sig
+
+def gateSamples(nRamp, sig, rampShape="cos2"):
+    """
+    Impose onset and offset ramps of a given number of samples to a sound.
+
+    The ramps are imposed in place, and are broadcast over all the
+    channels of the sound.
+
+    Parameters
+    ----------
+    nRamp : int
+        The number of samples of each ramp.
+    sig : array of floats    
+        The signal on which the ramps should be imposed. The first
+        dimension of the array is time.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the ramps. See `rampWindows`.
+
+    Returns
+    -------
+    sig : array of floats
+       The ramped signal.
+
+    Examples
+    --------
+    >>> noise = broadbandNoise(spectrumLevel=40, duration=200, ramp=0,
+    ...     channel='Both', fs=48000, maxLevel=100)
+    >>> gateSamples(nRamp=480, sig=noise, rampShape='Hann')
+
+    """
+    onRamp, offRamp = rampWindows(nRamp, rampShape)
+    #broadcast the ramps over the channels
+    winShape = (nRamp,) + (1,)*(sig.ndim-1)
+    sig[0:nRamp] *= onRamp.reshape(winShape)
+    sig[len(sig)-nRamp:len(sig)] *= offRamp.reshape(winShape)
 
     return sig
 
@@ -2518,6 +2424,23 @@ def getRMS(sig, channel="each"):
     return rms
 
 
+def getSndPrecision():
+    """
+    Get the floating point type of the sounds generated by the
+    functions of this module. See `setSndPrecision`.
+
+    Returns
+    -------
+    precision : numpy type
+        Either numpy.float64 or numpy.float32.
+
+    Examples
+    --------
+    >>> dtype = getSndPrecision()
+
+    """
+    return _sndPrecision[0]
+
 def glide(freqStart=440, ftype="exponential", excursion=500, level=60, duration=180, phase=0, ramp=10, channel="Both", fs=48000, maxLevel=101):
     """
     Synthetize a rising or falling tone glide with frequency changing
@@ -2626,7 +2549,7 @@ def harmComplFromNarrowbandNoise(F0=440, lowHarm=1, highHarm=8, level=40, bandwi
     nSamples = int(round(sDuration * fs))
     nRamp = int(round(sRamp * fs))
     nTot = nSamples + (nRamp * 2)
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
     
     if channel == "Right" or channel == "Left" or channel == "Both":
         tone = zeros((nTot, 2))
@@ -2674,6 +2597,108 @@ def harmComplFromNarrowbandNoise(F0=440, lowHarm=1, highHarm=8, level=40, bandwi
     return snd
 
 
+def harmonicPhases(harmPhase, lowHarm, highHarm):
+    """
+    Compute the starting phases of the harmonics of a complex tone.
+
+    Parameters
+    ----------
+    harmPhase : one of 'Sine', 'Cosine', 'Alternating', 'Random', 'Schroeder-', 'Schroeder+'
+        Phase relationship between the partials of the complex tone.
+        If 'Alternating', odd harmonics are in cosine phase and
+        even harmonics in sine phase.
+    lowHarm : int
+        Lowest harmonic component number.
+    highHarm : int
+        Highest harmonic component number.
+
+    Returns
+    -------
+    phases : array of floats
+        The starting phase, in radians, of the sine of each harmonic
+        from `lowHarm` to `highHarm`.
+
+    Examples
+    --------
+    >>> phases = harmonicPhases(harmPhase="Schroeder-", lowHarm=1, highHarm=10)
+    
+    """
+    harms = arange(lowHarm, highHarm+1)
+    if harmPhase == "Sine":
+        phases = zeros(len(harms))
+    elif harmPhase == "Cosine":
+        phases = zeros(len(harms)) + pi/2
+    elif harmPhase == "Alternating":
+        phases = where(harms%2 > 0, pi/2, 0.)
+    elif harmPhase == "Schroeder-":
+        phases = -pi * harms * (harms - 1) / (highHarm-lowHarm+1)
+    elif harmPhase == "Schroeder+":
+        phases = pi * harms * (harms - 1) / (highHarm-lowHarm+1)
+    elif harmPhase == "Random":
+        phases = numpy.random.random(len(harms)) * 2 * pi
+    else:
+        raise ValueError("Invalid 'harmPhase' argument. 'harmPhase' must be one 'Sine', 'Cosine', 'Alternating', 'Schroeder-', 'Schroeder+', or 'Random'")
+
+    return phases
+
+def harmonicSum(harms, phases, ang, offset=None, maxBlockSize=2**18):
+    """
+    Sum the partials of a complex tone whose instantaneous phases are
+    multiples of the instantaneous phase of a common fundamental.
+
+    The partial of harmonic number `harms[k]` is
+    `sin(harms[k]*ang + offset + phases[k])`. All the partials
+    are computed at once as a block of size (number of partials x
+    number of samples), in chunks of samples, and the block is
+    summed in place over the partials.
+
+    Parameters
+    ----------
+    harms : array of floats
+        The harmonic numbers of the partials.
+    phases : array of floats
+        The starting phase of each partial in radians.
+    ang : array of floats
+        The instantaneous phase of the fundamental in radians.
+    offset : array of floats or None
+        An instantaneous phase, in radians, added to all the partials.
+        It can be used, for example, to shift all the partials by
+        the same frequency.
+    maxBlockSize : int
+        Maximum number of elements of the block of partials
+        computed at once.
+
+    Returns
+    -------
+    tone : 1-dimensional array of floats
+        The sum of the partials.
+
+    Examples
+    --------
+    >>> timeAll = arange(0, 48000) / 48000
+    >>> tone = harmonicSum(harms=arange(1, 11), phases=harmonicPhases("Sine", 1, 10),
+    ...     ang=2*pi*220*timeAll)
+    
+    """
+    harms = asarray(harms, dtype=float)
+    phases = asarray(phases, dtype=float)
+    nTot = len(ang)
+    tone = zeros(nTot)
+    if len(harms) == 0:
+        return tone
+    nChunk = max(1, maxBlockSize // len(harms))
+    for i in range(0, nTot, nChunk):
+        thisChunk = slice(i, min(i+nChunk, nTot))
+        block = numpy.multiply.outer(harms, ang[thisChunk])
+        block += phases[:, None]
+        if offset is not None:
+            block += offset[thisChunk]
+        sin(block, out=block)
+        block.sum(axis=0, out=tone[thisChunk])
+
+    return tone
+
+
 def intNCyclesFreq(freq, duration):
     """
     Compute the frequency closest to 'freq' that has an integer number
@@ -2768,7 +2793,7 @@ def imposeLevelGlide(sig, deltaL, startTime, endTime, channel, fs):
         ampArray[endPnt:len(ampArray)] = repeat(endAmp, len(ampArray[endPnt:len(ampArray)]))
 
     
-        snd = zeros((nSamples,2))
+        snd = zeros((nSamples,2), dtype=getSndPrecision())
         if channel == "Right":
             snd[:,1] = sig[:,1] * ampArray
         elif channel == "Left":
@@ -2817,51 +2842,17 @@ def ITDShift(sig, f1, f2, ITD, channel, fs):
     
     """
     
+    if channel not in ["Left", "Right"]:
+        raise ValueError("Invalid channel argument. Channel must either 'Right', or 'Left'")
     nSamples = len(sig[:,0])
     fftPoints = 2**nextpow2(nSamples)
-    snd = zeros((nSamples, 2))
-    nUniquePnts = ceil((fftPoints+1)/2)
-    #compute the frequencies of the first half of the FFT
-    freqArray1 = arange(0, nUniquePnts, 1) * (fs / fftPoints)
-    #remove DC offset and nyquist for the second half of the FFT
-    freqArray2 = -arange(1, (nUniquePnts-1), 1)[::-1] * (fs / fftPoints) 
-    #find the indexes of the frequencies for which to set the ITD for the first half of the FFT
-    sh1 = where((freqArray1>f1) & (freqArray1<f2))
-    #same as above for the second half of the FFT
-    sh2 = where((freqArray2<-f1) & (freqArray2>-f2))
-    #compute IPSs for the first half of the FFT
-    phaseShiftArray1 = itdtoipd(ITD/1000000, freqArray1[sh1])
-    #same as above for the second half of the FFT
-    phaseShiftArray2 = itdtoipd(ITD/1000000, freqArray2[sh2])
-    #get the indexes of the first half of the FFT
-    p1Start = 0; p1End = len(freqArray1)
-    #get the indexes of the second half of the FFT
-    p2Start = len(freqArray1); p2End = fftPoints 
-        
-    if channel == "Left":
-        x = fft(sig[:,0], fftPoints)
-    elif channel == "Right":
-        x = fft(sig[:,1], fftPoints)
-    else:
-        raise ValueError("Invalid channel argument. Channel must either 'Right', or 'Left'")
-    
-    x1 = x[p1Start:p1End] #first half of the FFT
-    x2 = x[p2Start:p2End] #second half of the FFT
-    x1mag = abs(x1); x2mag = abs(x2) 
-    x1Phase =  angle(x1); x2Phase =  angle(x2);
-    x1Phase[sh1] = x1Phase[sh1] + phaseShiftArray1 #change phases
-    x2Phase[sh2] = x2Phase[sh2] + phaseShiftArray2
-    x1 = x1mag * (cos(x1Phase) + (1j * sin(x1Phase))) #rebuild FFTs
-    x2 = x2mag * (cos(x2Phase) + (1j * sin(x2Phase)))
-    x = concatenate((x1, x2))
-    x = real(ifft(x)) #inverse transform to get the sound back
-    
-    if channel == "Left":
-        snd[:,0] = x[0:nSamples]
-        snd[:,1] = sig[:,1]
-    elif channel == "Right":
-        snd[:,1] = x[0:nSamples]
-        snd[:,0] = sig[:,0]
+    freqArray = rfftFrequencies(fftPoints, fs)
+    #find the indexes of the frequencies for which to set the ITD
+    sh = where((freqArray>f1) & (freqArray<f2))[0]
+    #the negative frequencies are implied by the real FFT
+    weights = ones(len(freqArray), dtype=complex)
+    weights[sh] = exp(1j * itdtoipd(ITD/1000000, freqArray[sh]))
+    snd = applySpectralWeights(sig, weights, channel, fftPoints)
 
     return snd
 
@@ -2986,20 +2977,19 @@ def makeAsynchChord(freqs, levels, phases, tonesDuration, tonesRamps, tonesChann
     seq = numpy.arange(len(freqs))
     numpy.random.shuffle(seq)
 
+    tones = pureTones(asarray(freqs)[seq], asarray(phases)[seq], asarray(levels)[seq], tonesDuration, tonesRamps, tonesChannel, fs, maxLevel)
+    nTone = tones.shape[1]
+    onsets = [int(round((SOA*i/1000) * fs)) for i in range(len(freqs))]
+    snd = zeros((max(onsets)+nTone, 2), dtype=getSndPrecision())
     for i in range(len(freqs)):
-        thisFreq = freqs[seq[i]]; thisLev = levels[seq[i]]; thisPhase = phases[seq[i]]
-        thisTone = pureTone(thisFreq, thisPhase, thisLev, tonesDuration, tonesRamps, tonesChannel, fs, maxLevel)
-        if i == 0:
-            snd = thisTone
-        else:
-            snd = addSounds(snd, thisTone, SOA*i, fs)
+        snd[onsets[i]:onsets[i]+nTone] += tones[i]
     return snd
 
 
 def makeHugginsPitch(F0=300, lowHarm=1, highHarm=3, spectrumLevel=45, bandwidth=100,
                      bandwidthUnit="Hz", dichoticDifference="IPD Stepped",
                      dichoticDifferenceValue=pi, phaseRelationship="NoSpi", stretch=0,
-                     noiseType="White", duration=480, ramp=10, fs=48000, maxLevel=101):
+                     noiseType="White", duration=480, ramp=10, fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a complex Huggings Pitch.
 
@@ -3052,6 +3042,8 @@ def makeHugginsPitch(F0=300, lowHarm=1, highHarm=3, spectrumLevel=45, bandwidth=
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -3083,7 +3075,7 @@ def makeHugginsPitch(F0=300, lowHarm=1, highHarm=3, spectrumLevel=45, bandwidth=
     nSamples = int(round(sDuration * fs))
     nRamp = int(round(sRamp * fs))
     nTot = nSamples + (nRamp * 2)
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
     tone = broadbandNoise(spectrumLevel, duration+(ramp*2), 0, "Both", fs, maxLevel)
     if noiseType == "Pink":
@@ -3132,13 +3124,13 @@ def makeHugginsPitch(F0=300, lowHarm=1, highHarm=3, spectrumLevel=45, bandwidth=
         else:
             raise ValueError("Invalid 'dichoticDifference' argument. 'dichoticDifference' must be one of 'IPD Linear, 'IPD Stepped', 'IPD Random', or 'ITD'")
     
-    tone = gate(ramp, tone, fs)    
+    tone = gate(ramp, tone, fs, rampShape)    
     snd = tone
 
     return snd
 
 
-def makeIRN(delay=1/440, gain=1, iterations=6, configuration="Add Same", spectrumLevel=25, duration=280, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def makeIRN(delay=1/440, gain=1, iterations=6, configuration="Add Same", spectrumLevel=25, duration=280, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a iterated rippled noise
 
@@ -3166,6 +3158,8 @@ def makeIRN(delay=1/440, gain=1, iterations=6, configuration="Add Same", spectru
         Sampling frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -3188,7 +3182,7 @@ def makeIRN(delay=1/440, gain=1, iterations=6, configuration="Add Same", spectru
     else:
         raise ValueError("Invalid 'configuration' argument. 'configuration' must be one of 'Add Same', or 'Add Original'")
 
-    snd = gate(ramp, snd, fs)
+    snd = gate(ramp, snd, fs, rampShape)
         
     return snd
 
@@ -3223,30 +3217,7 @@ def makePink(sig, fs):
     if nSamples < 2:
         pass
     else:
-        ref = 1 + (1000 * nSamples/fs)
-        x = rfft(sig[:,0], nSamples)
-        idx = arange(1, len(x))
-        mag = zeros(len(x))
-        mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/idx)
-        mag[0] = abs(x[0])
-        ph = angle(x)
-        x = mag * (cos(ph) + 1j * sin(ph))
-    
-        sig0 = irfft(x, nSamples)
-
-
-        x = rfft(sig[:,1], nSamples)
-        idx = arange(1, len(x))
-        mag = zeros(len(x))
-        mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/idx)
-        mag[0] = abs(x[0])
-        ph = angle(x)
-        x = mag * (cos(ph) + 1j * sin(ph))
-
-        sig1 = irfft(x, nSamples)
-
-        sig[:, 0] = sig0
-        sig[:, 1] = sig1
+        sig[:,:] = applySpectralWeights(sig, colouredNoiseWeights("Pink", nSamples, fs, 1000))
     
     return sig
 
@@ -3281,37 +3252,11 @@ def makeBlueRef(sig, fs, refHz):
      >>> noise = makeBlueRef(sig=noise, fs=48000, refHz=1000)
     
     """
-    
     nSamples = len(sig[:,0])
-    ref = 1 + (refHz * nSamples/fs)
-
-    x = rfft(sig[:,0], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref*idx)
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-    
-    sig0 = irfft(x, nSamples)
+    sig[:,:] = applySpectralWeights(sig, colouredNoiseWeights("Blue", nSamples, fs, refHz))
 
-
-    x = rfft(sig[:,1], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref*idx)
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-
-    sig1 = irfft(x, nSamples)
-
-    sig[:, 0] = sig0
-    sig[:, 1] = sig1
-    
     return sig
 
-
 def makePinkRef(sig, fs, refHz):
     """
     Convert a white noise into a pink noise.
@@ -3343,34 +3288,9 @@ def makePinkRef(sig, fs, refHz):
      >>> noise = makePinkRef(sig=noise, fs=48000, refHz=1000)
     
     """
-    
     nSamples = len(sig[:,0])
-    ref = 1 + (refHz * nSamples/fs)
-
-    x = rfft(sig[:,0], nSamples, axis=0)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/idx)
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-    
-    sig0 = irfft(x, nSamples, axis=0)
-
-
-    x = rfft(sig[:,1], nSamples, axis=0)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/idx)
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
+    sig[:,:] = applySpectralWeights(sig, colouredNoiseWeights("Pink", nSamples, fs, refHz))
 
-    sig1 = irfft(x, nSamples, axis=0)
-
-    sig[:, 0] = sig0
-    sig[:, 1] = sig1
-    
     return sig
 
 def makeRedRef(sig, fs, refHz):
@@ -3404,34 +3324,9 @@ def makeRedRef(sig, fs, refHz):
      >>> noise = makeRedRef(sig=noise, fs=48000, refHz=1000)
     
     """
-    
     nSamples = len(sig[:,0])
-    ref = 1 + (refHz * nSamples/fs)
-
-    x = rfft(sig[:,0], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/(idx**2))
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-    
-    sig0 = irfft(x, nSamples)
-
-
-    x = rfft(sig[:,1], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref/(idx**2))
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
+    sig[:,:] = applySpectralWeights(sig, colouredNoiseWeights("Red", nSamples, fs, refHz))
 
-    sig1 = irfft(x, nSamples)
-
-    sig[:, 0] = sig0
-    sig[:, 1] = sig1
-    
     return sig
 
 def makeVioletRef(sig, fs, refHz):
@@ -3465,37 +3360,11 @@ def makeVioletRef(sig, fs, refHz):
      >>> noise = makeVioletRef(sig=noise, fs=48000, refHz=1000)
     
     """
-    
     nSamples = len(sig[:,0])
-    ref = 1 + (refHz * nSamples/fs)
-
-    x = rfft(sig[:,0], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref*(idx**2))
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-    
-    sig0 = irfft(x, nSamples)
-
+    sig[:,:] = applySpectralWeights(sig, colouredNoiseWeights("Violet", nSamples, fs, refHz))
 
-    x = rfft(sig[:,1], nSamples)
-    idx = arange(1, len(x))
-    mag = zeros(len(x))
-    mag[1:len(x)] = abs(x[1:len(x)]) * sqrt(ref*(idx**2))
-    mag[0] = abs(x[0])
-    ph = angle(x)
-    x = mag * (cos(ph) + 1j * sin(ph))
-
-    sig1 = irfft(x, nSamples)
-
-    sig[:, 0] = sig0
-    sig[:, 1] = sig1
-    
     return sig
 
-
 def makeSilence(duration=1000, fs=48000):
     """
     Generate a silence.
@@ -3524,7 +3393,7 @@ def makeSilence(duration=1000, fs=48000):
     #duration in ms
     duration = duration / 1000 #convert from ms to sec
     nSamples = int(round(duration * fs))
-    snd = zeros((nSamples, 2))
+    snd = zeros((nSamples, 2), dtype=getSndPrecision())
     
     return snd
 
@@ -3599,86 +3468,25 @@ def phaseShift(sig, f1, f2, phaseShift, phaseShiftType, channel, fs):
             phaseShiftType='Linear', channel='Left', fs=48000) #this generates a Dichotic Pitch
     
     """
-
     nSamples = len(sig[:,0])
     fftPoints = 2**nextpow2(nSamples)
-    snd = zeros((nSamples, 2))
-    nUniquePnts = ceil((fftPoints+1)/2)
-    freqArray1 = arange(0, nUniquePnts, 1) * (fs / fftPoints)
-    freqArray2 = -arange(1, (nUniquePnts-1), 1)[::-1] * (fs / fftPoints) #remove DC offset and nyquist
-    sh1 = where((freqArray1>f1) & (freqArray1<f2))
-    sh2 = where((freqArray2<-f1) & (freqArray2>-f2))
-    p1Start = 0; p1End = len(freqArray1)
-    p2Start = len(freqArray1); p2End = fftPoints
+    freqArray = rfftFrequencies(fftPoints, fs)
+    sh = where((freqArray>f1) & (freqArray<f2))[0]
 
     if phaseShiftType == "Linear":
-        phaseShiftArray1 = linspace(0, phaseShift, len(sh1))
-        phaseShiftArray2 = - linspace(phaseShift, 0, len(sh2))
+        phaseShiftArray = linspace(0, phaseShift, len(sh))
     elif phaseShiftType == "Step":
-        phaseShiftArray1 = repeat(phaseShift, len(sh1))
-        phaseShiftArray2 = - repeat(phaseShift, len(sh1))
+        phaseShiftArray = repeat(phaseShift, len(sh))
     elif phaseShiftType == "Random":
-        phaseShiftArray1 = numpy.random.uniform(0, phaseShift, len(sh1))
-        phaseShiftArray2 = -phaseShiftArray1[::-1]
+        phaseShiftArray = numpy.random.uniform(0, phaseShift, len(sh))
     else:
         raise ValueError("Invalid 'phaseShiftType' argument. 'phaseShiftType' must be one of 'Linear', 'Step', or 'Random'")
 
-    if channel == "Left":
-        x = fft(sig[:,0], fftPoints)
-        x1 = x[p1Start:p1End]
-        x2 = x[p2Start:p2End]
-        x1mag = abs(x1); x2mag = abs(x2)
-        x1Phase =  angle(x1); x2Phase =  angle(x2);
-        x1Phase[sh1] = x1Phase[sh1] + phaseShiftArray1
-        x2Phase[sh2] =  x2Phase[sh2] + phaseShiftArray2
-        x1 = x1mag * (cos(x1Phase) + (1j * sin(x1Phase)))
-        x2 = x2mag * (cos(x2Phase) + (1j * sin(x2Phase)))
-        x = concatenate((x1, x2))
-        x = real(ifft(x))
-        snd[:,0] = x[0:nSamples]
-        snd[:,1] = sig[:,1]
-    elif channel == "Right":
-        x = fft(sig[:,1], fftPoints)
-        x1 = x[p1Start:p1End]
-        x2 = x[p2Start:p2End]
-        x1mag = abs(x1); x2mag = abs(x2)
-        x1Phase =  angle(x1); x2Phase =  angle(x2);
-        x1Phase[sh1] = x1Phase[sh1] + phaseShiftArray1
-        x2Phase[sh2] = x2Phase[sh2] + phaseShiftArray2
-        x1 = x1mag * (cos(x1Phase) + (1j * sin(x1Phase)))
-        x2 = x2mag * (cos(x2Phase) + (1j * sin(x2Phase)))
-        x = concatenate((x1, x2))
-        x = real(ifft(x))
-        snd[:,1] = x[0:nSamples]
-        snd[:,0] = sig[:,0]
-    elif channel == "Both":
-        x = fft(sig[:,0], fftPoints)
-        x1 = x[p1Start:p1End]
-        x2 = x[p2Start:p2End]
-        x1mag = abs(x1); x2mag = abs(x2)
-        x1Phase =  angle(x1); x2Phase =  angle(x2);
-        x1Phase[sh1] = x1Phase[sh1] + phaseShiftArray1
-        x2Phase[sh2] = x2Phase[sh2] + phaseShiftArray2
-        x1 = x1mag * (cos(x1Phase) + (1j * sin(x1Phase)))
-        x2 = x2mag * (cos(x2Phase) + (1j * sin(x2Phase)))
-        x = concatenate((x1, x2))
-        x = real(ifft(x))
-        snd[:,0] = x[0:nSamples]
-
-        x = fft(sig[:,1], fftPoints)
-        x1 = x[p1Start:p1End]
-        x2 = x[p2Start:p2End]
-        x1mag = abs(x1); x2mag = abs(x2)
-        x1Phase =  angle(x1); x2Phase =  angle(x2);
-        x1Phase[sh1] = x1Phase[sh1] + phaseShiftArray1
-        x2Phase[sh2] = x2Phase[sh2] + phaseShiftArray2
-        x1 = x1mag * (cos(x1Phase) + (1j * sin(x1Phase)))
-        x2 = x2mag * (cos(x2Phase) + (1j * sin(x2Phase)))
-        x = concatenate((x1, x2))
-        x = real(ifft(x))
-        snd[:,1] = x[0:nSamples]
-    else:
-        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
+    #the negative frequencies are implied by the real FFT, so the
+    #shift only needs to be applied to the positive ones
+    weights = ones(len(freqArray), dtype=complex)
+    weights[sh] = exp(1j * phaseShiftArray)
+    snd = applySpectralWeights(sig, weights, channel, fftPoints)
 
     return snd
 
@@ -3723,41 +3531,16 @@ def pinkNoiseFromSin(compLevel=23, lowCmp=100, highCmp=1000, spacing=20, duratio
         fs=48000, maxLevel=100)
     
     """
-    sDuration = duration / 1000 #convert from ms to sec
-    sRamp = ramp / 1000
-
-    totDur = sDuration + (2 * sRamp)
-    nSamples = int(round(sDuration * fs))
-    nRamp = int(round(sRamp * fs))
-    nTot = nSamples + (nRamp * 2)
-    timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
-    snd = zeros((nTot, 2))
     noisBandwidth = 1200*log2(highCmp/lowCmp) #in cents
     nComponents = int(floor(noisBandwidth/spacing))
-    amp = 10**((compLevel - maxLevel) / 20)
     freqs = zeros(nComponents)
     freqs[0] = lowCmp
     for i in range(1, nComponents): #indexing starts from 1
         freqs[i] = freqs[i-1]*(2**(spacing/1200.))
 
     phasesR = numpy.random.uniform(0, 2*pi, nComponents)
-    sinArray = zeros((nComponents, nTot))
-
-    for i in range(0, nComponents):
-        sinArray[i,] = amp* sin(2*pi*freqs[i] * timeAll + phasesR[i])
-    
-    if channel == "Right":
-        snd[:,1] = sum(sinArray,0)
-    elif channel == "Left":
-        snd[:,0] = sum(sinArray,0)
-    elif channel == "Both":
-        snd[:,1] = sum(sinArray,0)
-        snd[:,0] = snd[:,1]
-    else:
-        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
+    snd = pureTones(freqs, phasesR, compLevel, duration, ramp, channel, fs, maxLevel, sumTones=True)
 
-    snd = gate(ramp, snd, fs)    
     return snd
 
 
@@ -3766,9 +3549,9 @@ def pinkNoiseFromSin2(compLevel=23, lowCmp=100, highCmp=1000, spacing=20, durati
     Generate a pink noise by adding sinusoids spaced by a fixed
     interval in cents.
 
-    This function should produce the same output of pinkNoiseFromSin,
-    it simply uses a different algorithm that uses matrix operations
-    instead of a for loop. It doesn't seem to be much faster though.
+    This function produces the same output of pinkNoiseFromSin. Both
+    functions now compute the components with `pureTones`, this function
+    is kept for backward compatibility.
 
     Parameters
     ----------
@@ -3805,49 +3588,19 @@ def pinkNoiseFromSin2(compLevel=23, lowCmp=100, highCmp=1000, spacing=20, durati
         fs=48000, maxLevel=100)
     
     """
-    sDuration = duration / 1000 #convert from ms to sec
-    sRamp = ramp / 1000
-
-    totDur = sDuration + (2 * sRamp)
-    nSamples = int(round(sDuration * fs))
-    nRamp = int(round(sRamp * fs))
-    nTot = nSamples + (nRamp * 2)
-    timeAll = arange(0, nTot) / fs
-    snd = zeros((nTot, 2))
     noisBandwidth = 1200*log2(highCmp/lowCmp) #in cents
     nComponents = int(floor(noisBandwidth/spacing))
-    amp = 10**((compLevel - maxLevel) / 20)
     freqs = zeros((nComponents,1))
     freqs[0] = lowCmp
     for i in range(1, nComponents): #indexing starts from 1
         freqs[i] = freqs[i-1]*(2**(spacing/1200.))
-    #freqs = freqs.reshape(nComponents,1)
     phasesR = numpy.random.uniform(0, 2*pi, (nComponents,1))
-    #phasesR = phasesR.reshape(nComponents,1)
-    sinMatrix = zeros((nComponents, nTot))
-    timeMatrix = zeros((nComponents, nTot))
-    timeMatrix[:] = timeAll
+    snd = pureTones(freqs, phasesR, compLevel, duration, ramp, channel, fs, maxLevel, sumTones=True)
 
-    #for i in range(0, nComponents):
-    #    sinMatrix[i,] = amp* sin(2*pi*freqs[i] * timeAll + phasesR[i])
-
-    sinMatrix = amp*sin(2*pi*freqs*timeMatrix+phasesR)
-    
-    if channel == "Right":
-        snd[:,1] = sum(sinMatrix,0)
-    elif channel == "Left":
-        snd[:,0] = sum(sinMatrix,0)
-    elif channel == "Both":
-        snd[:,1] = sum(sinMatrix,0)
-        snd[:,0] = snd[:,1]
-    else:
-        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
-
-    snd = gate(ramp, snd, fs)    
     return snd
 
 
-def pureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def pureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise a pure tone.
 
@@ -3870,6 +3623,8 @@ def pureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -3895,30 +3650,199 @@ def pureTone(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="
     nTot = nSamples + (nRamp * 2)
 
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp) 
 
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 1] = amp* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phase)
+        snd[:, 1] = amp* sin(2*pi*frequency * timeAll + phase)
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phase)
+        snd[:, 0] = amp* sin(2*pi*frequency * timeAll + phase)
     elif channel == "Both":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[0:nRamp] + phase)
-        snd[nRamp:nRamp+nSamples, 0] = amp* sin(2*pi*frequency * timeAll[nRamp:nRamp+nSamples] + phase)
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * sin(2*pi*frequency * timeAll[nRamp+nSamples:len(timeAll)] + phase)
+        snd[:, 0] = amp* sin(2*pi*frequency * timeAll + phase)
         snd[:, 1] = snd[:, 0]
     else:
         raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
 
        
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
 
+def pureTones(frequencies, phases=0, levels=60, duration=980, ramp=10, channels="Both", fs=48000, maxLevel=101, sumTones=False, rampShape="cos2"):
+    """
+    Synthetise a set of pure tones with the same duration.
+
+    The tones are computed in a single pass over blocks of
+    tones, rather than one at a time with `pureTone`.
+
+    Parameters
+    ----------
+    frequencies : array of floats
+        Tone frequencies in hertz.
+    phases : float or array of floats
+        Starting phases in radians, one for all the tones, or one per tone.
+    levels : float or array of floats
+        Tone levels in dB SPL, one for all the tones, or one per tone.
+    duration : float
+        Tone duration (excluding ramps) in milliseconds.
+    ramp : float
+        Duration of the onset and offset ramps in milliseconds.
+        The total duration of the sound will be duration+ramp*2.
+    channels : string ('Right', 'Left' or 'Both') or list of strings
+        Channel in which the tones will be generated, one for all the
+        tones, or one per tone.
+    fs : int
+        Samplig frequency in Hz.
+    maxLevel : float
+        Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    sumTones : logical
+        If True, return the sum of the tones rather than each tone.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
+
+    Returns
+    -------
+    snd : 3-dimensional array of floats
+        The array has dimensions (nTones, nSamples, 2). If `sumTones`
+        is True, the array has dimensions (nSamples, 2).
+
+    Examples
+    --------
+    >>> sweep = pureTones(frequencies=[250, 500, 1000, 2000, 4000], phases=0,
+    ...     levels=[40, 35, 30, 35, 40], duration=180, ramp=10, channels='Right',
+    ...     fs=48000, maxLevel=100)
+    >>> sweep.shape
+    (5, 9600, 2)
+    
+    """
+    frequencies = asarray(frequencies, dtype=float).ravel()
+    nTones = len(frequencies)
+    phases = zeros(nTones) + asarray(phases, dtype=float).ravel()
+    amps = 10**((zeros(nTones) + asarray(levels, dtype=float).ravel() - maxLevel) / 20)
+    if isinstance(channels, str):
+        channels = [channels]*nTones
+    channels = array(channels)
+    left = (channels == "Left") | (channels == "Both")
+    right = (channels == "Right") | (channels == "Both")
+    if numpy.all(left | right) == False:
+        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
+
+    duration = duration / 1000 #convert from ms to sec
+    ramp = ramp / 1000
+
+    nSamples = int(round(duration * fs))
+    nRamp = int(round(ramp * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    timeAll = arange(0, nTot) / fs
+    env = gateSamples(nRamp, ones(nTot), rampShape)
+
+    if sumTones == True:
+        snd = zeros((nTot, 2), dtype=getSndPrecision())
+        #amplitude of each tone in each channel
+        chanAmps = numpy.stack((left*amps, right*amps), axis=1)
+    else:
+        snd = zeros((nTones, nTot, 2), dtype=getSndPrecision())
+    #blocks of about 8 MB
+    nBlock = max(1, 2**20 // max(1, nTot))
+    for i in range(0, nTones, nBlock):
+        thisBlock = slice(i, i+nBlock)
+        tones = numpy.multiply.outer(2*pi*frequencies[thisBlock], timeAll)
+        tones += phases[thisBlock, None]
+        sin(tones, out=tones)
+        if sumTones == True:
+            snd += tones.T @ chanAmps[thisBlock]
+        else:
+            tones *= amps[thisBlock, None]
+            tones *= env
+            snd[thisBlock][left[thisBlock], :, 0] = tones[left[thisBlock]]
+            snd[thisBlock][right[thisBlock], :, 1] = tones[right[thisBlock]]
+    if sumTones == True:
+        snd *= env[:, None]
+
+    return snd
+
+
+@functools.lru_cache(maxsize=32)
+def rampWindows(nRamp, rampShape="cos2"):
+    """
+    Compute the onset and offset ramps of a sound.
+
+    The ramps are computed once for each combination of arguments,
+    and are returned as read-only arrays.
+
+    Parameters
+    ----------
+    nRamp : int
+        The number of samples of each ramp.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the ramps. 'cos2' is a raised cosine starting from
+        zero and reaching one on the first sample after the onset ramp;
+        'linear' is a linear ramp with the same end points; 'Hann' are
+        the two halves of a symmetric Hann window of 2*nRamp samples.
+
+    Returns
+    -------
+    onRamp : array of floats
+        The onset ramp.
+    offRamp : array of floats
+        The offset ramp.
+
+    Examples
+    --------
+    >>> onRamp, offRamp = rampWindows(nRamp=480, rampShape='cos2')
+
+    """
+    timeRamp = arange(0., nRamp)
+    if rampShape == "cos2":
+        onRamp = (1-cos(pi * timeRamp/nRamp))/2
+        offRamp = (1+cos(pi * timeRamp/nRamp))/2
+    elif rampShape == "linear":
+        onRamp = timeRamp/nRamp
+        offRamp = 1 - timeRamp/nRamp
+    elif rampShape == "Hann":
+        win = numpy.hanning(2*nRamp)
+        onRamp = win[0:nRamp]
+        offRamp = win[nRamp:2*nRamp]
+    else:
+        raise ValueError("Invalid 'rampShape' argument. 'rampShape' must be one of 'cos2', 'linear', or 'Hann'")
+    onRamp.setflags(write=False)
+    offRamp.setflags(write=False)
+
+    return onRamp, offRamp
+
+
+@functools.lru_cache(maxsize=32)
+def rfftFrequencies(nFFT, fs):
+    """
+    Compute the frequencies of the bins of a real FFT.
+
+    The frequencies are computed once for each combination of
+    arguments, and are returned as a read-only array.
+
+    Parameters
+    ----------
+    nFFT : int
+        Number of points of the FFT.
+    fs : int
+        Sampling frequency of the signal.
+
+    Returns
+    -------
+    freqs : array of floats
+        The frequencies, in Hz, of the nFFT//2+1 bins.
+
+    Examples
+    --------
+    >>> freqs = rfftFrequencies(1024, 48000)
+
+    """
+    freqs = arange(0, nFFT//2+1) * (fs / nFFT)
+    freqs.setflags(write=False)
+
+    return freqs
+
 def scale(level, sig):
     """
     Increase or decrease the amplitude of a sound signal.
@@ -3991,6 +3915,37 @@ def setLevel_(level, snd, maxLevel, channel="Both"):
 
     return snd
 
+def setSndPrecision(precision):
+    """
+    Set the floating point type of the sounds generated by the
+    functions of this module.
+
+    With 'float32' the sounds take half the memory, and are converted
+    to integer samples for playback in half the time. Phases and
+    frequencies are still computed in double precision, so only the
+    final samples are rounded, with an error well below the resolution
+    of a 24-bit digital to analog converter.
+
+    Parameters
+    ----------
+    precision : string ('float64' or 'float32')
+        The floating point type.
+
+    Examples
+    --------
+    >>> setSndPrecision('float32')
+    >>> pt = pureTone(frequency=440, phase=0, level=65, duration=180,
+    ...     ramp=10, channel='Right', fs=48000, maxLevel=100)
+    >>> setSndPrecision('float64')
+
+    """
+    if precision == "float64":
+        _sndPrecision[0] = numpy.float64
+    elif precision == "float32":
+        _sndPrecision[0] = numpy.float32
+    else:
+        raise ValueError("Invalid 'precision' argument. 'precision' must be one of 'float64', or 'float32'")
+
 def spectralModNoise(spectrumLevel=25, duration=980, ramp=10, modAmp=10, modFreq=1, phase="Random", channel="Both", fs=48000, maxLevel=101):
     """
     Generate a broadband noise with a modulated spectral envelope.
@@ -4047,10 +4002,9 @@ def spectralModNoise(spectrumLevel=25, duration=980, ramp=10, modAmp=10, modFreq
     sig = broadbandNoise(spectrumLevel=spectrumLevel, duration=duration,
                          ramp=ramp,
                          channel=channel, fs=fs, maxLevel=100)
-    noiseRMS = getRMS(sig, 'each')
+    noiseRMS = sqrt(mean(sig**2, axis=0, dtype=float))
     nSamples = len(sig[:,0])
-    nUniquePts = int(ceil((nSamples+1)/2.0))
-    freqArray = arange(0, nUniquePts, 1.0) * (fs / nSamples);
+    freqArray = rfftFrequencies(nSamples, fs)
     nFreqs = freqArray.shape[0]
     mod_wave_dB = zeros(nFreqs)
 
@@ -4062,41 +4016,20 @@ def spectralModNoise(spectrumLevel=25, duration=980, ramp=10, modAmp=10, modFreq
         st_phase = pi/2
         
     mod_wave_dB[1:nFreqs] = modAmp*0.5*sin(2*pi*log2(freqArray[1:nFreqs])*modFreq+st_phase)
-    
-    ## left chan
-    if channel in ["Left", "Both"]:
-        x = rfft(sig[:,0], nSamples)
-        lenx = len(x)
-        mag = zeros(lenx)
-        mag[1:lenx] = abs(x[1:lenx]) * 10**(mod_wave_dB[1:lenx]/20)
-        mag[0] = abs(x[0])
-        ph = angle(x)
-        x = mag * (cos(ph) + 1j * sin(ph))
-        sig0 = irfft(x, nSamples)
-        sig[:, 0] = sig0
-        noiseShapedRMS = getRMS(sig, 'each')
-        sig[:,0] = scale(level=20*log10(noiseRMS[0]/noiseShapedRMS[0]), sig=sig[:,0])
-        
-    ## right chan
-    if channel in ["Right", "Both"]:
-        x = rfft(sig[:,1], nSamples)
-        lenx = len(x)
-        mag = zeros(lenx)
-        mag[1:lenx] = abs(x[1:lenx]) * 10**(mod_wave_dB[1:lenx]/20)
-        mag[0] = abs(x[0])
-        ph = angle(x)
-        x = mag * (cos(ph) + 1j * sin(ph))
-        sig1 = irfft(x, nSamples)
-        sig[:, 1] = sig1
-        noiseShapedRMS = getRMS(sig, 'each')
-        sig[:,1] = scale(level=20*log10(noiseRMS[1]/noiseShapedRMS[1]), sig=sig[:,1])
 
-    
+    if channel in ["Left", "Right", "Both"]:
+        sig = applySpectralWeights(sig, 10**(mod_wave_dB/20), channel)
+        #rescale each shaped channel to the RMS of the noise before shaping
+        noiseShapedRMS = sqrt(mean(sig**2, axis=0, dtype=float))
+        if channel in ["Left", "Both"]:
+            sig[:,0] *= noiseRMS[0]/noiseShapedRMS[0]
+        if channel in ["Right", "Both"]:
+            sig[:,1] *= noiseRMS[1]/noiseShapedRMS[1]
     
     return sig
 
 
-def steepNoise(frequency1=440, frequency2=660, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101):
+def steepNoise(frequency1=440, frequency2=660, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, rampShape="cos2"):
     """
     Synthetise band-limited noise from the addition of random-phase
     sinusoids.
@@ -4120,6 +4053,8 @@ def steepNoise(frequency1=440, frequency2=660, level=60, duration=180, ramp=10,
         Samplig frequency in Hz.
     maxLevel : float
         Level in dB SPL output by the soundcard for a sinusoid of amplitude 1.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the onset and offset ramps. See `rampWindows`.
 
     Returns
     -------
@@ -4149,33 +4084,24 @@ def steepNoise(frequency1=440, frequency2=660, level=60, duration=180, ramp=10,
     amp =  10**((level - maxLevel) / 20) * sqrt((frequency2 - frequency1) / components)
     
     timeAll = arange(0, nTot) / fs
-    timeRamp = arange(0, nRamp)
-    snd = zeros((nTot, 2))
+    snd = zeros((nTot, 2), dtype=getSndPrecision())
 
-    noise= zeros(nTot)
-    for f in arange(frequency1, frequency2+spacing, spacing):
-        radFreq = 2 * pi * f 
-        phase = numpy.random.random(1) * 2 * pi
-        noise = noise + sin(phase + (radFreq * timeAll))
+    freqs = arange(frequency1, frequency2+spacing, spacing)
+    phases = numpy.random.random(len(freqs)) * 2 * pi
+    noise = harmonicSum(freqs, phases, 2 * pi * timeAll)
 
     if channel == "Right":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1] = amp * noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * noise
     elif channel == "Left":
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0] = amp * noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 0] = amp * noise
     elif channel == "Both":
-        snd[0:nRamp, 1] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 1] = amp * noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 1] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * noise[nRamp+nSamples:len(timeAll)]
-        snd[0:nRamp, 0] = amp * ((1-cos(pi * timeRamp/nRamp))/2) * noise[0:nRamp]
-        snd[nRamp:nRamp+nSamples, 0] = amp * noise[nRamp:nRamp+nSamples]
-        snd[nRamp+nSamples:len(timeAll), 0] = amp * ((1+cos(pi * timeRamp/nRamp))/2) * noise[nRamp+nSamples:len(timeAll)]
+        snd[:, 1] = amp * noise
+        snd[:, 0] = amp * noise
     else:
         raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left' or 'Both'")
 
+    snd = gateSamples(nRamp, snd, rampShape)
+
     return snd
 
  
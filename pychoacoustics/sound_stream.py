@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Block-wise generators of long sounds.
+
+Each generator yields the sound in consecutive blocks of at most
+`blockSize` samples, with dimensions (nSamples, 2), so that the memory
+used does not depend on the duration of the sound. The time axis of
+each block is computed from the index of its first sample, so the
+phase is continuous across blocks, and the concatenation of the blocks
+equals the sound generated by the sndlib function of the same name.
+
+The blocks can be played as they are generated with
+`audioManager.playSoundStream`.
+"""
+
+import numpy
+from numpy import arange, ones, pi, sin, sqrt, zeros
+from .sndlib import getSndPrecision, harmonicPhases, harmonicSum, rampWindows
+
+#default number of samples of each block
+defaultBlockSize = 4096
+
+def streamBlocks(nTot, blockSize):
+    """
+    Split `nTot` samples into blocks.
+
+    Returns
+    -------
+    blocks : generator of (start, stop) tuples
+        The indexes of the first and one past the last sample of each block.
+
+    """
+    if blockSize < 1:
+        raise ValueError("Invalid 'blockSize' argument. 'blockSize' must be a positive integer")
+    for start in range(0, nTot, blockSize):
+        yield start, min(start+blockSize, nTot)
+
+def streamGate(start, stop, nSamples, nRamp, rampShape="cos2"):
+    """
+    Compute the onset and offset ramps of a sound
+    for the samples from `start` to `stop`.
+
+    Parameters
+    ----------
+    start : int
+        Index of the first sample of the block.
+    stop : int
+        Index of one past the last sample of the block.
+    nSamples : int
+        Number of samples of the sound, excluding the ramps.
+    nRamp : int
+        Number of samples of each ramp.
+    rampShape : string ('cos2', 'linear', or 'Hann')
+        Shape of the ramps. See `sndlib.rampWindows`.
+
+    Returns
+    -------
+    env : array of floats
+        The envelope of the block.
+
+    """
+    onRamp, offRamp = rampWindows(nRamp, rampShape)
+    env = ones(stop-start)
+    #part of the block overlapping the onset ramp
+    first, last = start, min(stop, nRamp)
+    if last > first:
+        env[first-start:last-start] = onRamp[first:last]
+    #part of the block overlapping the offset ramp
+    offStart = nRamp + nSamples
+    first, last = max(start, offStart), stop
+    if last > first:
+        env[first-start:last-start] = offRamp[first-offStart:last-offStart]
+
+    return env
+
+def AMToneStream(frequency=1000, AMFreq=20, AMDepth=1, phase=0, AMPhase=0, level=60,
+                 duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, blockSize=defaultBlockSize, rampShape="cos2"):
+    """
+    Generate an amplitude modulated tone block by block.
+    See `sndlib.AMTone` for the parameters.
+
+    `sndlib.AMTone` sets the level from the RMS of the whole sound.
+    Here the increase in power due to the modulation is compensated by
+    its expected value, a factor of 1+AMDepth^2/2, so the level may
+    differ slightly for sounds lasting a few modulation cycles.
+
+    Examples
+    --------
+    >>> blocks = AMToneStream(frequency=1000, AMFreq=20, AMDepth=1, phase=0,
+    ...     AMPhase=1.5*pi, level=65, duration=60000, ramp=10, channel='Both',
+    ...     fs=48000, maxLevel=100)
+    >>> for block in blocks:
+    ...     pass
+
+    """
+    if channel not in ["Right", "Left", "Both"]:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left' or 'Both'")
+    amp = 10**((level - maxLevel) / 20) / sqrt(1+AMDepth**2/2)
+    nSamples = int(round(duration/1000 * fs))
+    nRamp = int(round(ramp/1000 * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    for start, stop in streamBlocks(nTot, blockSize):
+        time = arange(start, stop) / fs
+        tone = amp * streamGate(start, stop, nSamples, nRamp, rampShape) * (1 + AMDepth*sin(2*pi*AMFreq*time+AMPhase)) * sin(2*pi*frequency * time + phase)
+        yield channelBlock(tone, channel)
+
+def broadbandNoiseStream(spectrumLevel=25, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, blockSize=defaultBlockSize, rampShape="cos2"):
+    """
+    Generate a broadband noise block by block.
+    See `sndlib.broadbandNoise` for the parameters.
+
+    `sndlib.broadbandNoise` scales the noise by the RMS of the whole
+    sound. Here the noise is scaled by its expected RMS, 1/sqrt(3), so
+    the level of each block fluctuates by a small random amount.
+
+    Examples
+    --------
+    >>> blocks = broadbandNoiseStream(spectrumLevel=40, duration=60000, ramp=10,
+    ...     channel='Both', fs=48000, maxLevel=100)
+    >>> for block in blocks:
+    ...     pass
+
+    """
+    if channel not in ["Right", "Left", "Both", "Dichotic"]:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', or 'Dichotic'")
+    amp = sqrt(fs/2)*(10**((spectrumLevel - maxLevel) / 20))
+    nSamples = int(round(duration/1000 * fs))
+    nRamp = int(round(ramp/1000 * fs))
+    nTot = nSamples + (nRamp * 2)
+    #the sum of four uniform variables has an RMS of 1/sqrt(3), this
+    #scales it to the RMS of a sinusoid of peak amplitude 1
+    noiseScale = sqrt(3) / sqrt(2)
+
+    for start, stop in streamBlocks(nTot, blockSize):
+        n = stop - start
+        env = amp * noiseScale * streamGate(start, stop, nSamples, nRamp, rampShape)
+        noise = (numpy.random.random(n) + numpy.random.random(n)) - (numpy.random.random(n) + numpy.random.random(n))
+        if channel == "Dichotic":
+            snd = zeros((n, 2), dtype=getSndPrecision())
+            snd[:,1] = env * noise
+            noise2 = (numpy.random.random(n) + numpy.random.random(n)) - (numpy.random.random(n) + numpy.random.random(n))
+            snd[:,0] = env * noise2
+            yield snd
+        else:
+            yield channelBlock(env * noise, channel)
+
+def channelBlock(sig, channel):
+    #place a mono block in the requested channel(s)
+    snd = zeros((len(sig), 2), dtype=getSndPrecision())
+    if channel in ["Left", "Both"]:
+        snd[:,0] = sig
+    if channel in ["Right", "Both"]:
+        snd[:,1] = sig
+
+    return snd
+
+def complexToneStream(F0=220, harmPhase="Sine", lowHarm=1, highHarm=10, stretch=0, level=60,
+                      duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, blockSize=defaultBlockSize, rampShape="cos2"):
+    """
+    Generate a complex tone block by block.
+    See `sndlib.complexTone` for the parameters.
+
+    Random harmonic phases are drawn once, when the first block is
+    generated.
+
+    Examples
+    --------
+    >>> blocks = complexToneStream(F0=440, harmPhase='Sine', lowHarm=3, highHarm=10,
+    ...     stretch=0, level=55, duration=60000, ramp=10, channel='Both',
+    ...     fs=48000, maxLevel=100)
+    >>> for block in blocks:
+    ...     pass
+
+    """
+    if channel not in ["Right", "Left", "Both", "Odd Left", "Odd Right"]:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', 'Both', 'Odd Left', or 'Odd Right'")
+    amp = 10**((level - maxLevel) / 20)
+    stretchHz = (F0*stretch)/100
+    nSamples = int(round(duration/1000 * fs))
+    nRamp = int(round(ramp/1000 * fs))
+    nTot = nSamples + (nRamp * 2)
+    harms = arange(lowHarm, highHarm+1)
+    phases = harmonicPhases(harmPhase, lowHarm, highHarm)
+    odd = harms%2 > 0
+
+    for start, stop in streamBlocks(nTot, blockSize):
+        time = arange(start, stop) / fs
+        env = amp * streamGate(start, stop, nSamples, nRamp, rampShape)
+        ang = 2 * pi * F0 * time
+        if stretchHz != 0:
+            shift = 2 * pi * stretchHz * time
+        else:
+            shift = None
+        if channel in ["Right", "Left", "Both"]:
+            yield channelBlock(env * harmonicSum(harms, phases, ang, shift), channel)
+        else:
+            snd = zeros((stop-start, 2), dtype=getSndPrecision())
+            if channel == "Odd Left":
+                oddChan, evenChan = 0, 1
+            else:
+                oddChan, evenChan = 1, 0
+            snd[:,oddChan] = env * harmonicSum(harms[odd], phases[odd], ang, shift)
+            snd[:,evenChan] = env * harmonicSum(harms[~odd], phases[~odd], ang, shift)
+            yield snd
+
+def FMToneStream(fc=1000, fm=40, mi=1, phase=0, level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101, blockSize=defaultBlockSize, rampShape="cos2"):
+    """
+    Generate a frequency modulated tone block by block.
+    See `sndlib.FMTone` for the parameters.
+
+    Examples
+    --------
+    >>> blocks = FMToneStream(fc=1000, fm=40, mi=1, phase=0, level=55,
+    ...     duration=60000, ramp=10, channel='Both', fs=48000, maxLevel=100)
+    >>> for block in blocks:
+    ...     pass
+
+    """
+    if channel not in ["Right", "Left", "Both"]:
+        raise ValueError("Invalid channel argument. Channel must be one of 'Right', 'Left', or 'Both'")
+    amp = 10**((level - maxLevel) / 20)
+    nSamples = int(round(duration/1000 * fs))
+    nRamp = int(round(ramp/1000 * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    for start, stop in streamBlocks(nTot, blockSize):
+        time = arange(start, stop) / fs
+        tone = amp * streamGate(start, stop, nSamples, nRamp, rampShape) * sin(2*pi*fc * time + mi*sin(2*pi*fm * time + phase))
+        yield channelBlock(tone, channel)
+
+def pureToneStream(frequency=1000, phase=0, level=60, duration=980, ramp=10, channel="Both", fs=48000, maxLevel=101, blockSize=defaultBlockSize, rampShape="cos2"):
+    """
+    Generate a pure tone block by block.
+    See `sndlib.pureTone` for the parameters.
+
+    Examples
+    --------
+    >>> blocks = pureToneStream(frequency=440, phase=0, level=65, duration=60000,
+    ...     ramp=10, channel='Right', fs=48000, maxLevel=100, blockSize=4096)
+    >>> for block in blocks:
+    ...     pass
+
+    """
+    if channel not in ["Right", "Left", "Both"]:
+        raise ValueError("Invalid channel argument. Channel must one of 'Right', 'Left', or 'Both'")
+    amp = 10**((level - maxLevel) / 20)
+    nSamples = int(round(duration/1000 * fs))
+    nRamp = int(round(ramp/1000 * fs))
+    nTot = nSamples + (nRamp * 2)
+
+    for start, stop in streamBlocks(nTot, blockSize):
+        time = arange(start, stop) / fs
+        tone = amp * streamGate(start, stop, nSamples, nRamp, rampShape) * sin(2*pi*frequency * time + phase)
+        yield channelBlock(tone, channel)
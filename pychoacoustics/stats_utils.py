@@ -123,3 +123,43 @@ def generalizedBetaMeanSTDFromAB(a,b,xmin,xmax):
      return mu, std
      
      
+
+def getPosteriorBox(pdf, tol):
+     #smallest box of the parameter grid (as a tuple of slices) outside
+     #of which the posterior mass is at most tol. Each axis is trimmed
+     #from both ends by at most tol/(2*ndim) of its marginal mass
+     pdf = pdf/pdf.sum()
+     tolAxis = tol/(2*pdf.ndim)
+     box = []
+     for ax in range(pdf.ndim):
+          marg = pdf.sum(axis=tuple([i for i in range(pdf.ndim) if i != ax]))
+          lo = numpy.searchsorted(numpy.cumsum(marg), tolAxis, side='right')
+          hi = len(marg) - numpy.searchsorted(numpy.cumsum(marg[::-1]), tolAxis, side='right')
+          box.append(slice(int(lo), int(max(hi, lo+1))))
+
+     return tuple(box)
+
+#the adaptive parameter grid of the PSI and UML procedures is cropped
+#only if this saves at least adaptiveGridMinSaving of its points, and the
+#cropped box is widened by adaptiveGridMargin points on each side
+adaptiveGridMinSaving = 0.1
+adaptiveGridMargin = 2
+
+def adaptGridBox(pdf, tol, gridBox, fullShape, margin=adaptiveGridMargin, minSaving=adaptiveGridMinSaving):
+     #decide how to adapt a (possibly already cropped) parameter grid.
+     #gridBox gives the start and stop indexes of the current grid in the
+     #full grid along each axis. Returns (expand, box): expand is True if
+     #the posterior has reached an edge of the current grid beyond which
+     #the full grid was cropped, and the full grid must be restored;
+     #otherwise box is the box of the current grid (as a tuple of slices)
+     #to crop it to, or None if the grid should be kept as it is
+     box = getPosteriorBox(pdf, tol)
+     for ax in range(pdf.ndim):
+          if (box[ax].start == 0 and gridBox[ax][0] > 0) or \
+             (box[ax].stop == pdf.shape[ax] and gridBox[ax][1] < fullShape[ax]):
+               return True, None
+     box = tuple([slice(max(box[ax].start-margin, 0), min(box[ax].stop+margin, pdf.shape[ax])) for ax in range(pdf.ndim)])
+     if numpy.prod([sl.stop-sl.start for sl in box]) > (1-minSaving)*pdf.size:
+          return False, None
+
+     return False, box
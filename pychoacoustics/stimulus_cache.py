@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A cache of the sounds generated by deterministic sndlib functions,
+so that a stimulus that is generated with the same arguments on every
+trial (e.g. the standard of a discrimination task) is synthesized only
+once.
+
+The sounds are cached with a least recently used eviction policy
+within a memory budget, and are returned as read-only arrays.
+Noise generators, and sounds with random phases, are never cached.
+"""
+
+import inspect, numpy
+from collections import OrderedDict
+from .sndlib import getSndPrecision
+
+#sndlib functions whose output is random regardless of their arguments
+nonDeterministic = ["broadbandNoise", "dichoticNoiseFromSin", "expAMNoise",
+                    "harmComplFromNarrowbandNoise", "makeAsynchChord",
+                    "makeHugginsPitch", "makeIRN", "pinkNoiseFromSin",
+                    "pinkNoiseFromSin2", "spectralModNoise", "steepNoise"]
+#arguments that make the output random when they are set to "Random"
+randomArgs = ["harmPhase", "phaseShiftType"]
+
+class StimulusCache(object):
+    """
+    Least recently used cache of generated sounds.
+
+    Parameters
+    ----------
+    maxMem : float
+        Maximum amount of memory (in MB) used by the cached sounds.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> cache = StimulusCache(maxMem=32)
+    >>> snd = cache.get(pureTone, frequency=1000, phase=0, level=60, duration=980, ramp=10,
+    ...     channel="Both", fs=48000, maxLevel=101)
+
+    """
+    def __init__(self, maxMem=64):
+        self.maxMem = maxMem
+        self.sounds = OrderedDict()
+        self.nBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.signatures = {}
+
+    def get(self, func, *args, **kwargs):
+        """
+        Return `func(*args, **kwargs)`, from the cache if the sound
+        was already generated with the same arguments.
+
+        The sound is read-only if it can be cached. It must be copied
+        before being modified in place.
+        """
+        key = self.getKey(func, args, kwargs)
+        if key == None:
+            return func(*args, **kwargs)
+        if key in self.sounds:
+            self.sounds.move_to_end(key)
+            self.hits = self.hits + 1
+            return self.sounds[key].view()
+        self.misses = self.misses + 1
+        snd = func(*args, **kwargs)
+        if isinstance(snd, numpy.ndarray) == False or snd.nbytes > self.maxMem*2**20:
+            return snd
+        snd.setflags(write=False)
+        self.sounds[key] = snd
+        self.nBytes = self.nBytes + snd.nbytes
+        while self.nBytes > self.maxMem*2**20:
+            oldKey, oldSnd = self.sounds.popitem(last=False)
+            self.nBytes = self.nBytes - oldSnd.nbytes
+
+        return snd.view()
+
+    def getKey(self, func, args, kwargs):
+        #the key is made of the values of all the arguments of the function,
+        #defaults included, so that it does not depend on how they were passed,
+        #and of the synthesis precision, so that a change of precision does
+        #not return sounds generated at the previous one
+        if func.__name__ in nonDeterministic:
+            return None
+        if func not in self.signatures:
+            self.signatures[func] = inspect.signature(func)
+        try:
+            bound = self.signatures[func].bind(*args, **kwargs)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        items = []
+        for name, val in bound.arguments.items():
+            if name in randomArgs and val == "Random":
+                return None
+            if isinstance(val, numpy.generic):
+                val = val.item()
+            elif isinstance(val, list):
+                val = tuple(val)
+            try:
+                hash(val)
+            except TypeError: #e.g. arrays
+                return None
+            items.append((name, val))
+
+        return (func.__module__, func.__qualname__, numpy.dtype(getSndPrecision()).name, tuple(items))
+
+    def clear(self):
+        self.sounds.clear()
+        self.nBytes = 0
+
+#the cache shared by the whole session
+stimulusCache = StimulusCache()
+
+def cachedSound(func, *args, **kwargs):
+    """
+    Generate a sound with `func(*args, **kwargs)` through the stimulus
+    cache of the session. See `StimulusCache.get`.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import complexTone
+    >>> ct = cachedSound(complexTone, 440, "Sine", 3, 10, 0, 55, 180, 10, "Both", 48000, 100)
+
+    """
+    return stimulusCache.get(func, *args, **kwargs)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A pool of worker processes for the parallel synthesis of sounds made
+of several components (e.g. the partials of a complex tone).
+
+The pool is started once, on first use, and is kept for the rest of the
+session. Each worker adds its components into its own slot of a shared
+memory buffer, and the slots are summed in the main process, so that
+only the arguments of the components are sent to the workers.
+"""
+
+import multiprocessing, os, weakref
+import numpy as np
+from multiprocessing import shared_memory
+
+class SynthesisPool(object):
+    """
+    Pool of worker processes synthesizing the components of a sound.
+
+    Parameters
+    ----------
+    nProcesses : int or None
+        Number of worker processes. If None, the number of CPUs is used.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> pool = SynthesisPool(nProcesses=2)
+    >>> snd = pool.synthesize(pureTone, [(440, 0), (880, 0)], (int(round(1*48000)), 2),
+    ...     kwargs={"level": 60, "duration": 980, "ramp": 10})
+    >>> pool.close()
+
+    """
+    def __init__(self, nProcesses=None):
+        if nProcesses == None:
+            nProcesses = os.cpu_count() or 1
+        self.nProcesses = nProcesses
+        #spawn the workers rather than forking the (possibly multi-threaded) GUI process
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = ctx.Pool(self.nProcesses)
+        self.shm = [None]
+        self._finalizer = weakref.finalize(self, SynthesisPool._release, self.pool, self.shm)
+
+    def synthesize(self, func, argsList, shape, kwargs=None):
+        """
+        Synthesize a sound as the sum of its components.
+
+        Parameters
+        ----------
+        func : function
+            The function generating each component. It must be defined
+            at the top level of a module, so that it can be sent to the
+            worker processes, and it must return an array of floats of
+            shape `shape`.
+        argsList : list of tuples
+            The positional arguments of `func` for each component.
+        shape : tuple of ints
+            The shape of the sound, e.g. (number of samples, 2).
+        kwargs : dict or None
+            Keyword arguments of `func` common to all the components.
+
+        Returns
+        -------
+        snd : array of floats
+            The sum of the components.
+
+        """
+        shape = tuple(shape)
+        if len(argsList) == 0:
+            return np.zeros(shape)
+        if kwargs == None:
+            kwargs = {}
+        #the components are dealt out to one slot per worker, so that
+        #each slot is written by a single process
+        nSlots = min(self.nProcesses, len(argsList))
+        nBytes = nSlots*int(np.prod(shape))*8
+        if self.shm[0] == None or self.shm[0].size < nBytes:
+            SynthesisPool._releaseBuffer(self.shm)
+            self.shm[0] = shared_memory.SharedMemory(create=True, size=nBytes)
+        tasks = [(self.shm[0].name, (nSlots,)+shape, i, func, argsList[i::nSlots], kwargs) for i in range(nSlots)]
+        self.pool.starmap(synthesisWorker_run, tasks)
+        out = np.ndarray((nSlots,)+shape, dtype=np.float64, buffer=self.shm[0].buf)
+        snd = out.sum(axis=0)
+
+        return snd
+
+    def close(self):
+        self._finalizer()
+
+    @staticmethod
+    def _releaseBuffer(shm):
+        if shm[0] is not None:
+            shm[0].close()
+            try:
+                shm[0].unlink()
+            except FileNotFoundError:
+                pass
+            shm[0] = None
+
+    @staticmethod
+    def _release(pool, shm):
+        pool.terminate()
+        pool.join()
+        SynthesisPool._releaseBuffer(shm)
+
+#the pool shared by the whole session
+_sessionPool = [None]
+
+def getSynthesisPool(nProcesses=None):
+    """
+    Get the synthesis pool of the session, starting it on first use.
+
+    Parameters
+    ----------
+    nProcesses : int or None
+        Number of worker processes. If None, the number of CPUs is used
+        when the pool is started, and the running pool is returned
+        otherwise. If the running pool has a different number of
+        processes it is replaced.
+
+    Returns
+    -------
+    pool : SynthesisPool
+
+    """
+    pool = _sessionPool[0]
+    if pool != None and nProcesses != None and pool.nProcesses != nProcesses:
+        pool.close()
+        pool = None
+    if pool == None:
+        pool = SynthesisPool(nProcesses)
+        _sessionPool[0] = pool
+
+    return pool
+
+def closeSynthesisPool():
+    """
+    Stop the synthesis pool of the session, if it is running.
+    """
+    if _sessionPool[0] != None:
+        _sessionPool[0].close()
+        _sessionPool[0] = None
+
+#shared memory buffer attached by each worker process
+_workerState = {"shm": None}
+
+def synthesisWorker_run(shmName, shape, slot, func, argsList, kwargs):
+    shm = _workerState["shm"]
+    if shm == None or shm.name != shmName:
+        if shm != None:
+            shm.close()
+        shm = shared_memory.SharedMemory(name=shmName)
+        _workerState["shm"] = shm
+    out = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[slot]
+    out[...] = 0
+    for args in argsList:
+        out += func(*args, **kwargs)
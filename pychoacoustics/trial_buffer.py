@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Rendering of a whole trial (warning interval, precursors, intervals,
+postcursors, and the silences between them) into a single sound, so
+that it can be played with one call to the audio backend and the
+silences between the intervals are accurate to the sample.
+
+The times at which the interval lights should be switched on and off
+are recorded as sample positions in the rendered sound, and are
+dispatched by `audioManager.playTrial` as the sound is played.
+"""
+
+import numpy
+from .sndlib import getSndPrecision
+
+class TrialBuffer(object):
+    """
+    A sequence of sounds and silences to be played as a single sound.
+
+    Parameters
+    ----------
+    fs : int
+        The sampling frequency of the sounds.
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> trial = TrialBuffer(fs=48000)
+    >>> trial.addSound(pureTone(440, 0, 60, 180, 10, "Both", 48000, 100), light=0)
+    >>> trial.addSilence(500)
+    >>> trial.addSound(pureTone(880, 0, 60, 180, 10, "Both", 48000, 100), light=1)
+    >>> snd = trial.render()
+
+    """
+    def __init__(self, fs):
+        self.fs = fs
+        self.segments = []
+        self.events = []
+        self.nSamples = 0
+
+    def addSound(self, snd, light=None):
+        """
+        Append a sound, with dimensions (nSamples, 2), to the trial.
+        If `light` is not None, the interval light with that index is
+        switched on at the start of the sound and off at its end.
+        """
+        self.addSegment(snd, snd.shape[0], light)
+
+    def addSilence(self, duration, light=None):
+        """
+        Append a silence of `duration` milliseconds to the trial.
+        If `light` is not None, the interval light with that index is
+        switched on for the duration of the silence (e.g. for the
+        warning interval).
+        """
+        self.addSegment(None, int(round(duration/1000 * self.fs)), light)
+
+    def addSegment(self, snd, nSamples, light):
+        if light != None:
+            self.events.append((self.nSamples, light, 'on'))
+            self.events.append((self.nSamples+nSamples, light, 'off'))
+        self.segments.append((self.nSamples, snd))
+        self.nSamples = self.nSamples + nSamples
+
+    def render(self):
+        """
+        Render the trial into a single sound.
+
+        Returns
+        -------
+        snd : 2-dimensional array of floats
+            The array has dimensions (nSamples, 2).
+
+        """
+        snd = numpy.zeros((self.nSamples, 2), dtype=getSndPrecision())
+        for start, seg in self.segments:
+            if seg is not None:
+                snd[start:start+seg.shape[0]] = seg
+
+        return snd
+
+    def getEvents(self):
+        """
+        Return the light events of the trial as a list of
+        (sample position, light index, 'on' or 'off') tuples, sorted by
+        position, with the 'off' events before the 'on' events at the
+        same position.
+        """
+        return sorted(self.events, key=lambda ev: (ev[0], ev[2] == 'on'))
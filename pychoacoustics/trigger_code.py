@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+EEG trigger codes sent on extra channels of the sound card, after the
+two channels of the sound.
+
+Each of the `nTriggerBits` trigger channels carries one bit of the
+trigger number, least significant bit first. A channel is silent if
+its bit is set, and carries a pulse of `triggerAmp` lasting the
+trigger duration at the start of the sound otherwise.
+
+The trigger channels are silent after the pulses, so only the pulses
+are built and cached (as read-only arrays, both as floating point
+channels and as PCM data) for each trigger code, sampling rate, and
+trigger duration, and the rest of the channels is filled with zeros
+when they are added to a sound.
+"""
+
+import functools, numpy
+from .utils_pcm import PCMEncoder, floatToPCM
+
+#number of trigger channels
+nTriggerBits = 6
+#amplitude of the trigger pulses
+triggerAmp = 0.5
+
+def triggerPulse(triggerNumber, fs, triggerDur, nBits=nTriggerBits):
+    """
+    Build the pulses of the trigger channels for a trigger number.
+
+    Parameters
+    ----------
+    triggerNumber : int
+        The trigger number. Only its `nBits` least significant bits
+        are sent.
+    fs : int
+        The sampling frequency.
+    triggerDur : float
+        The duration of the trigger pulses in milliseconds.
+    nBits : int
+        The number of trigger channels.
+
+    Returns
+    -------
+    pulse : 2-dimensional array of floats
+        Read-only array with dimensions (nSamplesTrigger, nBits), where
+        nSamplesTrigger is the trigger duration in samples.
+
+    Examples
+    --------
+    >>> pulse = triggerPulse(5, 48000, 1)
+
+    """
+    return triggerCodePulse(triggerNumber % 2**nBits, fs, triggerDur, nBits)
+
+@functools.lru_cache(maxsize=64)
+def triggerCodePulse(triggerCode, fs, triggerDur, nBits):
+    nSamplesTrigger = int(numpy.ceil(triggerDur/1000 * fs))
+    #bit planes of the trigger code, least significant bit first
+    bits = (triggerCode >> numpy.arange(nBits)) & 1
+    pulse = numpy.empty((nSamplesTrigger, nBits))
+    pulse[:] = triggerAmp * (bits == 0)
+    pulse.flags.writeable = False
+
+    return pulse
+
+def triggerPulsePCM(triggerNumber, fs, triggerDur, nbits, nBits=nTriggerBits):
+    """
+    Same as `triggerPulse`, but converted to PCM data with
+    `utils_pcm.floatToPCM`.
+    """
+    return triggerCodePulsePCM(triggerNumber % 2**nBits, fs, triggerDur, nbits, nBits)
+
+@functools.lru_cache(maxsize=64)
+def triggerCodePulsePCM(triggerCode, fs, triggerDur, nbits, nBits):
+    data = floatToPCM(triggerCodePulse(triggerCode, fs, triggerDur, nBits), nbits)
+    data.flags.writeable = False
+
+    return data
+
+def triggerChannels(triggerNumber, nSamples, fs, triggerDur, nBits=nTriggerBits):
+    """
+    Build the trigger channels for a trigger number, with dimensions
+    (nSamples, nBits). See `triggerPulse`.
+    """
+    chans = numpy.zeros((nSamples, nBits))
+    pulse = triggerPulse(triggerNumber, fs, triggerDur, nBits)[0:nSamples]
+    chans[0:pulse.shape[0]] = pulse
+
+    return chans
+
+def multiplexTrigger(snd, triggerNumber, fs, triggerDur, nBits=nTriggerBits):
+    """
+    Add the trigger channels to a sound.
+
+    Parameters
+    ----------
+    snd : 2-dimensional array of floats
+        The sound, with dimensions (nSamples, 2).
+    triggerNumber : int
+        The trigger number.
+    fs : int
+        The sampling frequency.
+    triggerDur : float
+        The duration of the trigger pulses in milliseconds.
+    nBits : int
+        The number of trigger channels.
+
+    Returns
+    -------
+    out : 2-dimensional array of floats
+        The sound with dimensions (nSamples, 2+nBits).
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> snd = pureTone(440, 0, 60, 980, 10, "Both", 48000, 100)
+    >>> sndTrig = multiplexTrigger(snd, 5, 48000, 1)
+
+    """
+    out = numpy.empty((snd.shape[0], 2+nBits), dtype=snd.dtype)
+    out[:, 0:2] = snd
+    pulse = triggerPulse(triggerNumber, fs, triggerDur, nBits)[0:snd.shape[0]]
+    out[0:pulse.shape[0], 2:] = pulse
+    out[pulse.shape[0]:, 2:] = 0
+
+    return out
+
+def multiplexSegmentsPCM(snd, trigData, nbits, segmentSize):
+    """
+    Convert a sound to PCM data and add the trigger channels to it,
+    one segment at a time.
+
+    Parameters
+    ----------
+    snd : 2-dimensional array of floats
+        The sound, with dimensions (nSamples, 2).
+    trigData : array of integers
+        The trigger pulses as returned by `triggerPulsePCM`. The
+        trigger channels are silent after their end.
+    nbits : int
+        The bit depth (16, 24 or 32).
+    segmentSize : int
+        The number of samples of each segment.
+
+    Yields
+    ------
+    seg : array of integers
+        PCM segments with dimensions (segmentSize, 2+nBits), the last
+        one may be shorter. The same buffer is reused for all the
+        segments, so each segment must be consumed (e.g. written to
+        the output stream) before the next one is requested.
+
+    """
+    nTrig = trigData.shape[0]
+    seg = numpy.zeros((segmentSize, 2+trigData.shape[1]) + trigData.shape[2:], dtype=trigData.dtype)
+    encoder = PCMEncoder(nbits, segmentSize, 2, snd.dtype)
+    for start in range(0, snd.shape[0], segmentSize):
+        stop = min(start+segmentSize, snd.shape[0])
+        n = stop - start
+        encoder.encode(snd[start:stop], out=seg[0:n, 0:2])
+        trigStop = min(stop, nTrig)
+        if trigStop > start:
+            seg[0:trigStop-start, 2:] = trigData[start:trigStop]
+            seg[trigStop-start:n, 2:] = 0
+        else:
+            seg[0:n, 2:] = 0
+        yield seg[0:n]
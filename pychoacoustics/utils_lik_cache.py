@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent cache of the likelihood tables used by the Bayesian adaptive
+procedures. The tables are stored as .npy files named after a hash of the
+parameters that determine their content, and are loaded as read-only
+memory maps. When the total size of the cache exceeds a given limit the
+least recently used tables are removed.
+"""
+
+import hashlib, os
+import numpy as np
+
+likCacheVersion = 1
+defaultLikCacheDir = os.path.expanduser("~") + '/.cache/pychoacoustics/lik_tables/'
+
+def getLikTableKey(tableName, model, stimScale, grids, dtype):
+    """
+    Compute the cache key of a likelihood table.
+
+    Parameters
+    ----------
+    tableName : string
+        Name of the table (e.g. "lik_corr").
+    model : string
+        Psychometric function model.
+    stimScale : string
+        Stimulus scale ("Linear" or "Logarithmic").
+    grids : list of arrays or floats
+        The stimulus levels, the parameter grids, and the guess rate(s),
+        in the order in which they define the table.
+    dtype : string
+        The data type of the table.
+
+    Returns
+    -------
+    key : string
+        Hexadecimal digest identifying the table.
+
+    """
+    h = hashlib.sha1()
+    h.update(("v" + str(likCacheVersion) + tableName + model + stimScale + str(np.dtype(dtype))).encode("utf-8"))
+    for grid in grids:
+        grid = np.asarray(grid, dtype=np.float64)
+        h.update(str(grid.shape).encode("utf-8"))
+        h.update(grid.tobytes())
+
+    return h.hexdigest()
+
+def loadLikTable(key, cacheDir=defaultLikCacheDir):
+    """
+    Load a table from the cache as a read-only memory map.
+
+    Returns None if the table is not in the cache.
+    """
+    fPath = os.path.join(cacheDir, key + ".npy")
+    try:
+        table = np.load(fPath, mmap_mode='r')
+        os.utime(fPath) #mark as recently used
+    except (OSError, ValueError):
+        table = None
+
+    return table
+
+def getCachedLikTable(key, shape, dtype, fillTable, cacheDir=defaultLikCacheDir, maxSize=2048):
+    """
+    Get a table from the cache, computing and storing it if it is not
+    already there.
+
+    Parameters
+    ----------
+    key : string
+        Cache key as returned by `getLikTableKey`.
+    shape : tuple of ints
+        Shape of the table.
+    dtype : string
+        Data type of the table.
+    fillTable : function
+        Function taking an empty array of the given shape and dtype
+        and filling it in place.
+    cacheDir : string
+        Cache directory.
+    maxSize : float
+        Maximum size of the cache in MB.
+
+    Returns
+    -------
+    table : array
+        A read-only memory map of the table, or an in-memory array if
+        the cache directory is not writable.
+
+    """
+    table = loadLikTable(key, cacheDir)
+    if table is not None and table.shape == tuple(shape) and table.dtype == np.dtype(dtype):
+        return table
+
+    fPath = os.path.join(cacheDir, key + ".npy")
+    tmpPath = os.path.join(cacheDir, key + "." + str(os.getpid()) + ".tmp.npy")
+    try:
+        if os.path.exists(cacheDir) == False:
+            os.makedirs(cacheDir)
+        #write the table directly in the memory mapped file so that it
+        #is not held twice in memory
+        table = np.lib.format.open_memmap(tmpPath, mode='w+', dtype=dtype, shape=tuple(shape))
+        fillTable(table)
+        table.flush()
+        del table
+        os.replace(tmpPath, fPath)
+    except OSError:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        table = np.zeros(shape, dtype=dtype)
+        fillTable(table)
+        return table
+
+    evictLikTables(cacheDir, maxSize, keep=fPath)
+
+    return np.load(fPath, mmap_mode='r')
+
+def evictLikTables(cacheDir=defaultLikCacheDir, maxSize=2048, keep=None):
+    """
+    Remove the least recently used tables until the size of the cache
+    is at most `maxSize` MB. The table at path `keep` is never removed.
+    """
+    files = []
+    for fName in os.listdir(cacheDir):
+        if fName.endswith(".npy") and fName.endswith(".tmp.npy") == False:
+            fPath = os.path.join(cacheDir, fName)
+            st = os.stat(fPath)
+            files.append((st.st_mtime, st.st_size, fPath))
+    files.sort()
+    totSize = sum([f[1] for f in files])
+    for (mtime, size, fPath) in files:
+        if totSize <= maxSize*2**20:
+            break
+        if fPath == keep:
+            continue
+        try:
+            os.remove(fPath)
+            totSize = totSize - size
+        except OSError:
+            pass
+
+def clearLikCache(cacheDir=defaultLikCacheDir):
+    """
+    Remove all tables from the cache.
+    """
+    if os.path.exists(cacheDir) == False:
+        return
+    for fName in os.listdir(cacheDir):
+        if fName.endswith(".npy"):
+            os.remove(os.path.join(cacheDir, fName))
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Conversion of floating point sounds to integer PCM data for playback
+and for writing WAV files.
+
+The sound is scaled and clipped in a single working array, in the
+precision of the sound (float32 or float64) when it is sufficient for
+the bit depth, and is then cast into the output array, which can be
+preallocated. 24-bit samples are packed by taking the three low bytes
+of each little-endian 32-bit integer through a strided uint8 view.
+
+`PCMEncoder` keeps the working and output arrays between calls, so
+that a sound can be encoded segment by segment (see `encodeSegments`)
+without padding or copying the whole sound up front.
+"""
+
+import numpy as np
+
+def pcmShape(shape, nbits):
+    """
+    Return the shape of the PCM data for a sound of the given shape.
+    24-bit data have an extra last dimension of size 3.
+    """
+    if nbits == 24:
+        return tuple(shape) + (3,)
+    return tuple(shape)
+
+def pcmDtype(nbits):
+    """
+    Return the data type of the PCM data for the given bit depth.
+    """
+    if nbits == 16:
+        return np.int16
+    elif nbits == 24:
+        return np.uint8
+    elif nbits == 32:
+        return np.int32
+    raise ValueError("Invalid 'nbits' argument. 'nbits' must be one of 16, 24, or 32")
+
+def workDtype(dtype, nbits):
+    #float32 represents exactly all 16 and 24 bit integers, but not
+    #the largest 32 bit ones
+    if dtype == np.float32 and nbits < 32:
+        return np.float32
+    return np.float64
+
+def packInt24(d32, out=None):
+    """
+    Pack 32-bit integers with values in the 24-bit range into
+    little-endian triplets of bytes.
+
+    Parameters
+    ----------
+    d32 : array of int32
+        The samples.
+    out : array of uint8
+        Optional output array, with an extra last dimension of size 3.
+
+    Returns
+    -------
+    out : array of uint8
+        The packed samples.
+
+    """
+    #the three low bytes of each sample, viewed in place
+    b = np.ascontiguousarray(d32, dtype="<i4").view(np.uint8).reshape(d32.shape + (4,))
+    if out is None:
+        return b[..., 0:3].copy()
+    out[...] = b[..., 0:3]
+
+    return out
+
+def encodePCM(snd, nbits, out, work, work32=None):
+    #scale, clip and cast `snd` into `out`, using the preallocated
+    #working arrays `work` (and `work32` for 24 bits)
+    fullScale = 2**(nbits-1)
+    np.multiply(snd, fullScale, out=work)
+    np.clip(work, -fullScale, fullScale-1, out=work)
+    if nbits == 24:
+        np.copyto(work32, work, casting="unsafe")
+        packInt24(work32, out)
+    else:
+        np.copyto(out, work, casting="unsafe")
+
+    return out
+
+def floatToPCM(snd, nbits, out=None):
+    """
+    Convert a sound with values between -1 and 1 to integer PCM data.
+
+    Values outside the range that can be represented are clipped.
+
+    Parameters
+    ----------
+    snd : array of floats
+        The sound, either float32 or float64.
+    nbits : int
+        The bit depth (16, 24 or 32).
+    out : array of integers
+        Optional output array, with the shape and type given by
+        `pcmShape` and `pcmDtype`. It can be a view, e.g. some
+        channels of a larger array.
+
+    Returns
+    -------
+    data : array of integers
+        int16 data for 16 bits, int32 data for 32 bits, and little-endian
+        triplets of bytes (an array of uint8 with an extra last dimension
+        of size 3) for 24 bits.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> snd = np.array([[0.5, -0.5], [1, -1]], dtype=np.float32)
+    >>> data = floatToPCM(snd, 24)
+
+    """
+    if nbits not in [16, 24, 32]:
+        raise ValueError("Invalid 'nbits' argument. 'nbits' must be one of 16, 24, or 32")
+    if out is None:
+        out = np.empty(pcmShape(snd.shape, nbits), dtype=pcmDtype(nbits))
+    work = np.empty(snd.shape, dtype=workDtype(snd.dtype, nbits))
+    if nbits == 24:
+        work32 = np.empty(snd.shape, dtype=np.int32)
+    else:
+        work32 = None
+
+    return encodePCM(snd, nbits, out, work, work32)
+
+class PCMEncoder(object):
+    """
+    Converter of consecutive segments of a sound to PCM data, reusing
+    its working and output arrays.
+
+    Parameters
+    ----------
+    nbits : int
+        The bit depth (16, 24 or 32).
+    segmentSize : int
+        The maximum number of samples of each segment.
+    nChannels : int
+        The number of channels.
+    dtype : numpy data type
+        The data type of the sound (float32 or float64).
+
+    Examples
+    --------
+    >>> from pychoacoustics.sndlib import pureTone
+    >>> snd = pureTone(440, 0, 60, 980, 10, "Both", 48000, 100)
+    >>> encoder = PCMEncoder(16, 1024, 2, snd.dtype)
+    >>> data = encoder.encode(snd[0:1024])
+
+    """
+    def __init__(self, nbits, segmentSize, nChannels, dtype=np.float64):
+        if nbits not in [16, 24, 32]:
+            raise ValueError("Invalid 'nbits' argument. 'nbits' must be one of 16, 24, or 32")
+        self.nbits = nbits
+        self.segmentSize = segmentSize
+        self.work = np.empty((segmentSize, nChannels), dtype=workDtype(dtype, nbits))
+        if nbits == 24:
+            self.work32 = np.empty((segmentSize, nChannels), dtype=np.int32)
+        else:
+            self.work32 = None
+        self.out = np.empty(pcmShape((segmentSize, nChannels), nbits), dtype=pcmDtype(nbits))
+
+    def encode(self, snd, out=None):
+        """
+        Convert a segment of at most `segmentSize` samples.
+
+        If `out` is None the PCM data are written to the output array
+        of the encoder, and the returned view is overwritten by the
+        next call.
+        """
+        n = snd.shape[0]
+        if out is None:
+            out = self.out[0:n]
+        work32 = None
+        if self.work32 is not None:
+            work32 = self.work32[0:n]
+
+        return encodePCM(snd, self.nbits, out, self.work[0:n], work32)
+
+def encodeSegments(snd, nbits, segmentSize):
+    """
+    Convert a sound to PCM data segment by segment.
+
+    Parameters
+    ----------
+    snd : 2-dimensional array of floats
+        The sound, with dimensions (nSamples, nChannels).
+    nbits : int
+        The bit depth (16, 24 or 32).
+    segmentSize : int
+        The number of samples of each segment.
+
+    Yields
+    ------
+    data : array of integers
+        The PCM data of each segment, the last one may be shorter.
+        The same buffer is reused for all the segments, so each
+        segment must be consumed (e.g. written to the output stream)
+        before the next one is requested.
+
+    """
+    encoder = PCMEncoder(nbits, segmentSize, snd.shape[1], snd.dtype)
+    for start in range(0, snd.shape[0], segmentSize):
+        yield encoder.encode(snd[start:start+segmentSize])
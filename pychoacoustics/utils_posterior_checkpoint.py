@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+#   Copyright (C) 2008-2024 Samuele Carcagno <sam.carcagno@gmail.com>
+#   This file is part of pychoacoustics
+
+#    pychoacoustics is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    pychoacoustics is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with pychoacoustics.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Checkpoints of PSI and UML blocks, used to resume a block that was
+interrupted.
+
+A checkpoint consists of two files:
+
+- a trial journal (`fPath` + ".jsonl"), to which a line with the stimulus
+  level, the response, the next stimulus level, the state of the random
+  number generators, and optional user data is appended after each trial.
+  The first line of the journal identifies the format version, the
+  procedure, and its parameters.
+- a snapshot (`fPath` + ".npz"), rewritten every `snapshotInterval` trials,
+  holding the compressed posterior, the parameter grids, and the rest of
+  the state of the procedure, with the exception of the tables that can
+  be recomputed from the parameters.
+
+To resume a block the procedure is set up again with the same parameters,
+the snapshot is loaded into it, and the trials of the journal following
+the snapshot are replayed.
+"""
+
+import base64, json, os, random
+import numpy as np
+from .PSI_method import PSI_memory_usage, PSI_update
+from .UML_method import UML_update
+
+checkpointFormat = "pychoacoustics posterior checkpoint"
+checkpointVersion = 1
+
+#axes of the parameter space of each procedure
+parGrids = {"PSI": ["alpha", "beta", "lambda"],
+            "UML": ["alpha", "beta", "lambda"]}
+#tables defined on the parameter space, and on the stimulus levels
+#by the parameter space; they are recomputed at setup and not saved
+parTables = ["a", "b", "l", "logLik"]
+likTables = ["lik_corr", "likEntrCorr", "likEntrIncorr", "pCorrNextNorm", "pIncorrNextNorm"]
+#other entries that are not saved; "x", "r", and "phi" are views of
+#the history buffers in the PSI procedure
+notSaved = parTables + likTables + ["par", "memory", "swptCache", "workers"]
+historyViews = {"x": "xHist", "r": "rHist", "phi": "phiHist"}
+
+def writeCheckpoint(fPath, obj, method, extra=None, snapshotInterval=10):
+    """
+    Add the last trial of a PSI or UML block to its checkpoint.
+
+    Parameters
+    ----------
+    fPath : string
+        Path of the checkpoint, without extension.
+    obj : dict
+        The PSI or UML dictionary, after the update for the last trial.
+    method : string
+        "PSI" or "UML".
+    extra : dict
+        Additional data to store with the trial. It must be serializable
+        to JSON.
+    snapshotInterval : int
+        Number of trials between snapshots of the posterior. The journal
+        lines following the last snapshot are replayed on resume.
+
+    """
+    jPath = fPath + ".jsonl"
+    if obj["n"] == 1 or os.path.exists(jPath) == False:
+        with open(jPath, "w", encoding="utf-8") as f:
+            f.write(json.dumps(getCheckpointHeader(obj, method)) + "\n")
+    trial = {"n": int(obj["n"]), "x": float(obj["x"][-1]), "r": float(obj["r"][-1]),
+             "xnext": float(obj["xnext"]), "rng": getRNGState(), "extra": extra}
+    with open(jPath, "a", encoding="utf-8") as f:
+        f.write(json.dumps(trial) + "\n")
+    if obj["n"] % snapshotInterval == 0:
+        writeSnapshot(fPath, obj, method)
+
+def writeSnapshot(fPath, obj, method):
+    arrays = {}
+    meta = {}
+    for key in obj:
+        if key in notSaved or (key in historyViews and historyViews[key] in obj):
+            continue
+        val = obj[key]
+        if isinstance(val, np.ndarray):
+            arrays["a_" + key] = val
+        elif isinstance(val, np.generic):
+            meta[key] = val.item()
+        elif val is None or isinstance(val, (bool, int, float, str, tuple, list)):
+            meta[key] = val
+    header = getCheckpointHeader(obj, method)
+    header["n"] = int(obj["n"])
+    header["meta"] = meta
+    #write to a temporary file first, so that the previous snapshot is
+    #kept if the program crashes while writing
+    tmpPath = fPath + "." + str(os.getpid()) + ".tmp.npz"
+    with open(tmpPath, "wb") as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header, default=jsonDefault)), **arrays)
+    os.replace(tmpPath, fPath + ".npz")
+
+def resumeCheckpoint(fPath, obj, method):
+    """
+    Restore the state of a PSI or UML block from its checkpoint.
+
+    Parameters
+    ----------
+    fPath : string
+        Path of the checkpoint, without extension.
+    obj : dict
+        A PSI or UML dictionary freshly set up with the same parameters
+        as the checkpointed block. It is modified in place.
+    method : string
+        "PSI" or "UML".
+
+    Returns
+    -------
+    obj : dict or None
+        The restored dictionary, or None if there is no checkpoint
+        or the checkpoint does not match `obj`.
+    extra : list
+        The additional data stored with each trial.
+
+    """
+    trials = readJournal(fPath, obj, method)
+    if trials == None or len(trials) == 0:
+        return None, []
+
+    nSnap = 0
+    try:
+        with np.load(fPath + ".npz") as snap:
+            header = json.loads(str(snap["header"]))
+            if header["format"] == checkpointFormat and header["version"] == checkpointVersion and \
+               header["par"] == getCheckpointHeader(obj, method)["par"] and header["n"] <= len(trials):
+                restoreSnapshot(obj, method, header, snap)
+                nSnap = header["n"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    #replay the trials after the snapshot
+    update = {"PSI": PSI_update, "UML": UML_update}[method]
+    for trial in trials[nSnap:]:
+        obj["xnext"] = trial["x"]
+        if "xnextIdx" in obj:
+            del obj["xnextIdx"]
+        obj = update(obj, trial["r"])
+    #the next stimulus level actually chosen, random choices
+    #included, and the state of the random number generators
+    obj["xnext"] = trials[-1]["xnext"]
+    if "xnextLinear" in obj:
+        if obj["par"]["stimScale"] == "Logarithmic":
+            obj["xnextLinear"] = np.exp(obj["xnext"])
+        else:
+            obj["xnextLinear"] = obj["xnext"]
+    setRNGState(trials[-1]["rng"])
+
+    return obj, [trial["extra"] for trial in trials]
+
+def readJournal(fPath, obj, method):
+    try:
+        with open(fPath + ".jsonl", "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return None
+    if header != json.loads(json.dumps(getCheckpointHeader(obj, method))):
+        return None
+    trials = []
+    for line in lines[1:]:
+        try:
+            trial = json.loads(line)
+        except ValueError:
+            break #the last line may be incomplete after a crash
+        if trial["n"] != len(trials)+1:
+            break
+        trials.append(trial)
+
+    return trials
+
+def restoreSnapshot(obj, method, header, snap):
+    #crop the tables to the parameter grid of the snapshot, which is smaller
+    #than the full grid if the adaptive grid option is used
+    box = []
+    for name in parGrids[method]:
+        grid = snap["a_" + name]
+        i0 = int(np.argmin(abs(obj[name] - grid[0])))
+        box.append(slice(i0, i0+len(grid)))
+    box = tuple(box)
+    if np.prod([sl.stop-sl.start for sl in box]) < np.prod([len(obj[name]) for name in parGrids[method]]):
+        for key in parTables:
+            if key in obj:
+                obj[key] = obj[key][box].copy()
+        for key in likTables:
+            if key in obj and obj[key] is not None:
+                obj[key] = np.ascontiguousarray(obj[key][(slice(None),)+box])
+    for key in snap.files:
+        if key.startswith("a_") == False:
+            continue
+        key = key[2:]
+        if key in obj and isinstance(obj[key], np.ndarray) and obj[key].shape == snap["a_" + key].shape and key in ["p", "logp"]:
+            #keep arrays that may be views (e.g. of a stack of posteriors)
+            obj[key][...] = snap["a_" + key]
+        else:
+            obj[key] = snap["a_" + key]
+    for key in header["meta"]:
+        if isinstance(obj.get(key), tuple):
+            obj[key] = tuple(header["meta"][key])
+        else:
+            obj[key] = header["meta"][key]
+    for key in historyViews:
+        if historyViews[key] in obj:
+            obj[key] = obj[historyViews[key]][0:obj["n"]]
+    if method == "PSI":
+        obj["memory"] = PSI_memory_usage(obj)
+
+def removeCheckpoint(fPath):
+    """
+    Remove the files of a checkpoint.
+    """
+    for ext in [".jsonl", ".npz"]:
+        if os.path.exists(fPath + ext):
+            os.remove(fPath + ext)
+
+def getCheckpointHeader(obj, method):
+    return {"format": checkpointFormat, "version": checkpointVersion, "method": method,
+            "par": json.loads(json.dumps(obj["par"], default=jsonDefault, sort_keys=True))}
+
+def jsonDefault(val):
+    if isinstance(val, np.ndarray):
+        return val.tolist()
+    elif isinstance(val, np.generic):
+        return val.item()
+    raise TypeError(repr(val) + " is not JSON serializable")
+
+def getRNGState():
+    """
+    Get the state of the `random` and `numpy.random` generators in a
+    form that can be serialized to JSON.
+    """
+    pyState = random.getstate()
+    npState = np.random.get_state()
+    return {"random": [pyState[0], encodeUInt32(pyState[1]), pyState[2]],
+            "numpy": [npState[0], encodeUInt32(npState[1]), int(npState[2]), int(npState[3]), float(npState[4])]}
+
+def setRNGState(state):
+    """
+    Set the state of the `random` and `numpy.random` generators from
+    the output of `getRNGState`.
+    """
+    pyState = state["random"]
+    random.setstate((pyState[0], tuple(int(v) for v in decodeUInt32(pyState[1])), pyState[2]))
+    npState = state["numpy"]
+    np.random.set_state((npState[0], decodeUInt32(npState[1]), npState[2], npState[3], npState[4]))
+
+def encodeUInt32(vals):
+    return base64.b64encode(np.asarray(vals, dtype="<u4").tobytes()).decode("ascii")
+
+def decodeUInt32(s):
+    return np.frombuffer(base64.b64decode(s), dtype="<u4").copy()
@@ -25,6 +25,7 @@ import numpy as np
 from scipy.io import wavfile
 from tempfile import mkstemp
 from numpy import float32, int16, int32
+from .utils_pcm import floatToPCM, packInt24
 
 __version__ = "0.3.1"
 
@@ -186,44 +187,26 @@ def wavwrite(data, fs, nbits, fName, wave_format="PCM", scale=True):
         if nbits not in [16, 24, 32]:
             raise Exception("Sorry can only write 16, 24 or 32 bits PCM at the moment.")
 
+        if scale == True:
+            data = floatToPCM(data, nbits)
+        elif nbits == 24:
+            data = packInt24(data.astype(int32))
+        elif nbits == 16:
+            data = data.astype(int16)
+        elif nbits == 32:
+            data = data.astype(int32)
         if nbits == 24: #not supported by scipy, use the wave module
-            if data.ndim == 1:
+            if data.ndim == 2:
                 nChan = 1
             else:
                 nChan = data.shape[1]
-            if scale == True:
-                d24_32 = data*(2**23)
-                d24_32[np.where(d24_32>=2**23)] = 2**23-1
-            else:
-                d24_32 = data
-            d24_32 = d24_32.astype(int32)
-            #Shift first 0 bits, then 8, then 16, to get 24 bit little-endian.
-            #`& 255 is a bit mask, it keeps the lower 8 bits and sets the rest to 0; 255 = 2^8-1`
-            #We have a sequence of 32 binary values, We're interested only in the 24 rightmost values.
-            #The idea is to chop it off into 3 8-units packets (once converted to uint8 only 8 units
-            #will be stored)
-            #Shifting by 0 and chopping off the 24 leftmost units gives the first packet
-            #Shifting by 8 and chopping off the 24 leftmost units gives the second packet
-            #Shifting by 16 and chopping off the 24 leftmost units gives the third packet
-            d8_triplets = (d24_32.reshape(d24_32.shape + (1,)) >> np.array([0, 8, 16])) & 255  #the & 255 is probably superfluous because casting later to uint8 already keeps only the lowest 8 bits
-            data = d8_triplets.astype(np.uint8).tobytes()
             wav_file = wave.open(fName, 'wb')
             wav_file.setnchannels(nChan)
             wav_file.setsampwidth(3)
             wav_file.setframerate(fs)
-            wav_file.writeframes(data)
+            wav_file.writeframes(data.tobytes())
             wav_file.close()
-        if nbits == 16:
-            if scale == True:
-                data = data*(2**15)
-                data[np.where(data>=2**15)] = 2**15-1
-            data = data.astype(int16)
-            wavfile.write(fName, fs, data)
-        elif nbits == 32:
-            if scale == True:
-                data = data*(2**31)
-                data[np.where(data>=2**31)] = 2**31-1
-            data = data.astype(int32)
+        else:
             wavfile.write(fName, fs, data)
     elif wave_format == "IEEE_FLOAT":
         if nbits not in [32, 64]:
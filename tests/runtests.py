@@ -8,6 +8,7 @@ import sndlib_default_tests
 import write_sndlib_examples_code
 import sndlib_examples_code
 from sndlib_unittest import*
+from test_sndlib_synthesis import*
 
 
 pysdt tests
@@ -28,7 +29,9 @@ from test_weighted_up_down import*
 from test_weighted_up_down_interleaved import*
 from test_PEST import*
 from test_PSI import*
+from test_PSI_engines import*
 from test_UML import*
+from test_UML_engines import*
 
 
 experiment tests
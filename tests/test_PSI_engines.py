@@ -0,0 +1,312 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy, numpy, os, shutil, sys, tempfile, unittest
+from unittest import mock
+sys.path.insert(0, os.path.abspath('../'))
+from pychoacoustics.PSI_method import*
+from pychoacoustics.utils_lik_cache import*
+from pychoacoustics.stats_utils import adaptGridBox
+from pychoacoustics import PSI_method_est_guess
+from pychoacoustics.utils_posterior_checkpoint import*
+
+#parameter space shared by the tests
+defaultPrm = dict(model="Logistic", xLim=(-20, 20), xStep=0.5, alphaLim=(-10, 10),
+                  alphaStep=0.5, betaLim=(0.1, 5), betaStep=0.2, gamma=0.5,
+                  lambdaLim=(0, 0.1), lambdaStep=0.01)
+
+def listenerResp(x, rng, midpoint=2):
+    #response of the simulated listener
+    return int(rng.rand() < logisticPsy(x, midpoint, 1, 0.5, 0.02))
+
+def runPSI(nTrials=40, seed=3, midpoint=2, onTrial=None, **kwargs):
+    #midpoint is the midpoint of the simulated listener, or a function
+    #returning it at each trial; onTrial(i, PSI) is called after each update
+    rng = numpy.random.RandomState(seed)
+    PSI = setupPSI(**dict(defaultPrm, **kwargs))
+    xnext = [PSI["xnext"]]
+    for i in range(nTrials):
+        m = midpoint(i) if callable(midpoint) else midpoint
+        PSI = PSI_update(PSI, listenerResp(PSI["xnext"], rng, m))
+        xnext.append(PSI["xnext"])
+        if onTrial != None:
+            onTrial(i, PSI)
+    return PSI, xnext
+
+def runPSIEstGuessRate(nTrials=15, **kwargs):
+    prm = dict(model="Logistic", x0=0, xLim=(-20, 20), xStep=1, alphaLim=(-10, 10),
+               alphaStep=1, betaLim=(0.1, 5), betaStep=0.3, gammaLim=(0, 0.3),
+               gammaStep=0.05, lambdaLim=(0, 0.1), lambdaStep=0.02)
+    prm.update(kwargs)
+    rng = numpy.random.RandomState(1)
+    PSI = PSI_method_est_guess.setupPSIEstGuessRate(**prm)
+    xnext = [PSI["xnext"]]
+    for i in range(nTrials):
+        resp = int(rng.rand() < logisticPsy(PSI["xnext"], 2, 1, 0.3, 0.02))
+        PSI = PSI_method_est_guess.PSIEstGuessRate_update(PSI, resp)
+        xnext.append(PSI["xnext"])
+    return PSI, xnext
+
+class TestPSINextStimEngine(unittest.TestCase):
+    def testLoop(self):
+        #stimulus levels and estimates of the "Loop" engine (the default)
+        #before the alternative engines were added
+        PSI, x = runPSI(nTrials=20)
+        self.assertEqual(PSI["par"]["nextStimEngine"], "Loop")
+        self.assertEqual(x, [1.5, -0.5, 4.0, 3.0, 2.0, 5.0, 4.5, 3.5, 3.0, 2.0, 1.5,
+                             1.0, 1.0, 2.5, 2.0, 1.5, 1.0, 0.5, 0.0, -1.0, -1.5])
+        numpy.testing.assert_allclose(PSI["phi"][-1], [-2.05432517885232, 2.167268789377924, 0.5, 0.06059428837312323], rtol=1e-9)
+
+    def testVectorized(self):
+        for model in ["Logistic", "Gaussian", "Gumbel"]:
+            PSILoop, xLoop = runPSI(model=model, nextStimEngine="Loop")
+            PSIVec, xVec = runPSI(model=model, nextStimEngine="Vectorized")
+            self.assertEqual(xLoop, xVec)
+            numpy.testing.assert_allclose(PSIVec["entrTot"], PSILoop["entrTot"], rtol=1e-9)
+
+    def testVectorizedMarginalize(self):
+        for marg in [(0,), (2,), (1, 2)]:
+            PSILoop, xLoop = runPSI(marginalize=marg, nextStimEngine="Loop")
+            PSIVec, xVec = runPSI(marginalize=marg, nextStimEngine="Vectorized", maxChunkMem=0.5)
+            self.assertEqual(xLoop, xVec)
+            numpy.testing.assert_array_equal(PSIVec["entrTot"], PSILoop["entrTot"])
+
+class TestPSIMemoryMode(unittest.TestCase):
+    def testLikOnDemand(self):
+        for engine in ["Loop", "Vectorized"]:
+            PSIStored, xStored = runPSI(nextStimEngine=engine)
+            PSILazy, xLazy = runPSI(nextStimEngine=engine, likTable="On Demand", storeNextNorm=False)
+            self.assertEqual(xStored, xLazy)
+            self.assertEqual(PSILazy["est_midpoint"], PSIStored["est_midpoint"])
+            self.assertTrue(PSILazy["memory"]["peak"] < PSIStored["memory"]["peak"])
+
+    def testFloat32(self):
+        PSI64, x64 = runPSI(nextStimEngine="Vectorized")
+        PSI32, x32 = runPSI(nextStimEngine="Vectorized", dtype="float32")
+        self.assertEqual(PSI32["lik_corr"].dtype, numpy.float32)
+        self.assertAlmostEqual(PSI32["est_midpoint"], PSI64["est_midpoint"], places=3)
+        self.assertTrue(PSI32["memory"]["stored"] < PSI64["memory"]["standard"]/2)
+
+class TestPSIPosteriorUpdate(unittest.TestCase):
+    def testLogPosterior(self):
+        PSILin, xLin = runPSI(nextStimEngine="Vectorized")
+        PSILog, xLog = runPSI(nextStimEngine="Vectorized", logPosterior=True)
+        self.assertEqual(xLin, xLog)
+        numpy.testing.assert_allclose(PSILog["p"], PSILin["p"], rtol=1e-9, atol=1e-15)
+        numpy.testing.assert_allclose(PSILog["phi"], PSILin["phi"], rtol=1e-9)
+        self.assertTrue(numpy.all(numpy.isfinite(PSILog["logp"][PSILog["p"] > 0])))
+
+    def testHistoryBuffers(self):
+        PSI, x = runPSI(nTrials=50, nTrialsHint=4)
+        self.assertEqual(PSI["n"], 50)
+        self.assertEqual(PSI["x"].shape, (50,))
+        self.assertEqual(PSI["r"].shape, (50,))
+        self.assertEqual(PSI["phi"].shape, (50, 4))
+        numpy.testing.assert_array_equal(PSI["x"], x[:-1])
+        self.assertTrue(len(PSI["xHist"]) >= 50)
+
+class TestPSIAdaptiveGrid(unittest.TestCase):
+    def testAdaptiveGrid(self):
+        for marg in [None, (0,), (1, 2)]:
+            PSIDense, xDense = runPSI(nTrials=300, marginalize=marg, nextStimEngine="Vectorized")
+            PSIAdapt, xAdapt = runPSI(nTrials=300, marginalize=marg, nextStimEngine="Vectorized", adaptiveGrid=True)
+            self.assertTrue(PSIAdapt["p"].size < PSIDense["p"].size)
+            self.assertEqual(PSIAdapt["lik_corr"].shape[1:], PSIAdapt["p"].shape)
+            self.assertEqual(len(PSIAdapt["alpha"]), PSIAdapt["p"].shape[0])
+            numpy.testing.assert_almost_equal(PSIAdapt["phi"], PSIDense["phi"], decimal=3)
+
+    def testCropRule(self):
+        #the grid is cropped only if this saves at least 10% of its points
+        #and must be restored if the posterior reaches a cropped edge
+        pdf = numpy.zeros((20, 10, 5))
+        pdf[5:15, 3:7, :] = 1
+        full = numpy.array([[0, 20], [0, 10], [0, 5]])
+        expand, box = adaptGridBox(pdf, 1e-5, full, pdf.shape)
+        self.assertEqual(expand, False)
+        self.assertEqual(box, (slice(3, 17), slice(1, 9), slice(0, 5)))
+        pdf[:, :, :] = 1
+        self.assertEqual(adaptGridBox(pdf, 1e-5, full, pdf.shape), (False, None))
+        cropped = numpy.array([[5, 15], [0, 10], [0, 5]])
+        self.assertEqual(adaptGridBox(pdf[5:15], 1e-5, cropped, pdf.shape), (True, None))
+
+    def testExpandGrid(self):
+        PSI, x = runPSI(nTrials=60, nextStimEngine="Vectorized", logPosterior=True, adaptiveGrid=True,
+                        adaptiveGridTol=1e-1, adaptiveGridStart=10)
+        PSIDense = setupPSI(logPosterior=True, **defaultPrm)
+        for i in range(PSI["n"]):
+            PSIDense["xnext"] = PSI["x"][i]
+            PSIDense = PSI_update_posterior(PSIDense, PSI["r"][i])
+        PSI = PSI_expand_grid(PSI)
+        self.assertEqual(PSI["lik_corr"].shape, PSIDense["lik_corr"].shape)
+        numpy.testing.assert_allclose(PSI["p"], PSIDense["p"], rtol=1e-6, atol=1e-15)
+
+    def testPosteriorShift(self):
+        #the midpoint of the listener moves out of the cropped grid
+        PSI, x = runPSI(nTrials=120, midpoint=lambda i: 6 if i < 60 else -6, nextStimEngine="Vectorized",
+                        adaptiveGrid=True, adaptiveGridTol=1e-1, adaptiveGridStart=10)
+        self.assertTrue(PSI["alpha"][0] < -6 < PSI["alpha"][-1])
+        self.assertTrue(PSI["est_midpoint"] < -4)
+
+class TestPSIStack(unittest.TestCase):
+    def testStack(self):
+        midpoints = [-5, 0, 5]
+        for engine in ["Loop", "Vectorized"]:
+            stack = setupPSIStack(3, nextStimEngine=engine, **defaultPrm)
+            tracks = [setupPSI(nextStimEngine=engine, **defaultPrm) for i in range(3)]
+            rng = numpy.random.RandomState(5)
+            for i in range(60):
+                t = rng.randint(3)
+                resp = listenerResp(stack["tracks"][t]["xnext"], rng, midpoints[t])
+                stack = PSIStack_update(stack, t, resp)
+                tracks[t] = PSI_update(tracks[t], resp)
+                self.assertEqual(stack["tracks"][t]["xnext"], tracks[t]["xnext"])
+            stack = PSIStack_select_next_stim(stack)
+            for t in range(3):
+                self.assertTrue(numpy.shares_memory(stack["tracks"][t]["p"], stack["p"]))
+                self.assertEqual(stack["tracks"][t]["xnext"], tracks[t]["xnext"])
+                numpy.testing.assert_allclose(stack["tracks"][t]["entrTot"], tracks[t]["entrTot"], rtol=1e-9)
+                numpy.testing.assert_array_equal(stack["tracks"][t]["phi"], tracks[t]["phi"])
+
+    def testStackAdaptiveGrid(self):
+        #the grid of the track is cropped, then restored and cropped again
+        #to a box of the same size, the stack must follow the new posterior
+        box = (slice(2, 30), slice(1, 20), slice(0, 11))
+        stack = setupPSIStack(1, adaptiveGrid=True, adaptiveGridStart=1, **defaultPrm)
+        rng = numpy.random.RandomState(5)
+        with mock.patch("pychoacoustics.PSI_method.adaptGridBox", side_effect=[(False, box), (True, None), (False, box)]):
+            for i in range(2):
+                shape = stack["p"].shape
+                stack = PSIStack_update(stack, 0, listenerResp(stack["tracks"][0]["xnext"], rng))
+        self.assertEqual(stack["p"].shape, shape)
+        self.assertTrue(numpy.shares_memory(stack["tracks"][0]["p"], stack["p"]))
+        PSI = setupPSI(**defaultPrm)
+        PSI["xnext"] = stack["tracks"][0]["x"][0]
+        PSI = PSI_update_posterior(PSI, stack["tracks"][0]["r"][0])
+        PSI["xnext"] = stack["tracks"][0]["x"][1]
+        PSI = PSI_update_posterior(PSI, stack["tracks"][0]["r"][1])
+        numpy.testing.assert_allclose(stack["p"][0], PSI["p"][box]/PSI["p"][box].sum(), rtol=1e-9)
+
+    def testSetTrack(self):
+        #a track replaced in the stack (e.g. restored from a checkpoint)
+        #is updated in the same way as the plain PSI dictionary
+        PSI, x = runPSI(nTrials=20)
+        stack = PSIStack_set_track(setupPSIStack(1, **defaultPrm), 0, copy.deepcopy(PSI))
+        rng = numpy.random.RandomState(7)
+        for i in range(20):
+            resp = listenerResp(PSI["xnext"], rng)
+            PSI = PSI_update(PSI, resp)
+            stack = PSIStack_update(stack, 0, resp)
+        self.assertTrue(numpy.shares_memory(stack["tracks"][0]["p"], stack["p"]))
+        self.assertEqual(stack["tracks"][0]["xnext"], PSI["xnext"])
+        numpy.testing.assert_allclose(stack["p"][0], PSI["p"], rtol=1e-12)
+
+class TestPSISpeculativeUpdate(unittest.TestCase):
+    def testSpeculativeUpdate(self):
+        for kwargs in [dict(nextStimEngine="Loop"), dict(nextStimEngine="Vectorized"),
+                       dict(nextStimEngine="Vectorized", likTable="On Demand", adaptiveGrid=True)]:
+            PSIRef, xRef = runPSI(nTrials=40, **kwargs)
+            rng = numpy.random.RandomState(3)
+            PSI = setupPSI(**dict(defaultPrm, **kwargs))
+            x = [PSI["xnext"]]
+            for i in range(40):
+                spec = speculativePSIUpdater(PSI)
+                PSI = spec.getUpdate(listenerResp(PSI["xnext"], rng))
+                x.append(PSI["xnext"])
+            self.assertEqual(x, xRef)
+            numpy.testing.assert_array_equal(PSI["phi"], PSIRef["phi"])
+
+    def testCancel(self):
+        PSI, x = runPSI(nTrials=5)
+        xnext = PSI["xnext"]
+        spec = speculativePSIUpdater(PSI)
+        spec.cancel()
+        self.assertFalse(spec.thread.is_alive())
+        #the original state is not modified
+        self.assertEqual(PSI["n"], 5)
+        self.assertEqual(PSI["xnext"], xnext)
+
+class TestPSILikCache(unittest.TestCase):
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def testCachedTables(self):
+        for engine in ["Loop", "Vectorized"]:
+            PSIRef, xRef = runPSI(nextStimEngine=engine)
+            PSIFirst, xFirst = runPSI(nextStimEngine=engine, likCache=True, likCacheDir=self.cacheDir)
+            PSICached, xCached = runPSI(nextStimEngine=engine, likCache=True, likCacheDir=self.cacheDir)
+            self.assertTrue(isinstance(PSICached["lik_corr"], numpy.memmap))
+            numpy.testing.assert_array_equal(PSICached["lik_corr"], PSIRef["lik_corr"])
+            self.assertEqual(xRef, xFirst)
+            self.assertEqual(xRef, xCached)
+        self.assertEqual(len(os.listdir(self.cacheDir)), 3)
+
+    def testEviction(self):
+        runPSI(nTrials=0, likCache=True, likCacheDir=self.cacheDir)
+        runPSI(nTrials=0, model="Gaussian", likCache=True, likCacheDir=self.cacheDir, likCacheMaxSize=1)
+        #only the table just computed is kept when the cap is exceeded
+        self.assertEqual(len(os.listdir(self.cacheDir)), 1)
+        clearLikCache(self.cacheDir)
+        self.assertEqual(len(os.listdir(self.cacheDir)), 0)
+
+class TestPSICheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.ckptDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.ckptDir)
+
+    def testResume(self):
+        for kwargs in [dict(), dict(logPosterior=True, adaptiveGrid=True, adaptiveGridStart=10)]:
+            fPath = os.path.join(self.ckptDir, "block")
+            npState = []
+            def onTrial(i, PSI):
+                if i < 157:
+                    writeCheckpoint(fPath, PSI, "PSI", extra={"trial": i}, snapshotInterval=10)
+                if i == 156:
+                    npState.append(numpy.random.get_state())
+            PSI, x = runPSI(nTrials=200, onTrial=onTrial, nextStimEngine="Vectorized", **kwargs)
+            npState = npState[0]
+            #resume after trial 157, 7 trials are replayed
+            numpy.random.seed(1)
+            PSIRes, extra = resumeCheckpoint(fPath, setupPSI(**dict(defaultPrm, nextStimEngine="Vectorized", **kwargs)), "PSI")
+            numpy.testing.assert_array_equal(numpy.random.get_state()[1], npState[1])
+            self.assertEqual([e["trial"] for e in extra], list(range(157)))
+            self.assertEqual(PSIRes["n"], 157)
+            self.assertEqual(PSIRes["lik_corr"].shape[1:], PSIRes["p"].shape)
+            rng = numpy.random.RandomState(3)
+            for i in range(200):
+                resp = listenerResp(PSIRes["xnext"], rng)
+                if i >= 157:
+                    PSIRes = PSI_update(PSIRes, resp)
+            numpy.testing.assert_array_equal(PSIRes["x"], PSI["x"])
+            numpy.testing.assert_array_equal(PSIRes["p"], PSI["p"])
+            numpy.testing.assert_array_equal(PSIRes["phi"], PSI["phi"])
+            self.assertEqual(PSIRes["xnext"], PSI["xnext"])
+            removeCheckpoint(fPath)
+            self.assertEqual(os.listdir(self.ckptDir), [])
+
+    def testMismatch(self):
+        fPath = os.path.join(self.ckptDir, "block")
+        PSI, x = runPSI(nTrials=3)
+        for i in range(3):
+            PSI["n"] = i+1
+            writeCheckpoint(fPath, PSI, "PSI")
+        PSIRes, extra = resumeCheckpoint(fPath, runPSI(nTrials=0, alphaStep=1)[0], "PSI")
+        self.assertEqual(PSIRes, None)
+
+class TestPSIEstGuessRateParallel(unittest.TestCase):
+    def testParallel(self):
+        for marg in [None, (1, 2, 3)]:
+            PSIRef, xRef = runPSIEstGuessRate(marginalize=marg)
+            PSIPar, xPar = runPSIEstGuessRate(marginalize=marg, nProcesses=2)
+            self.assertEqual(xRef, xPar)
+            numpy.testing.assert_allclose(PSIPar["entrTot"], PSIRef["entrTot"], rtol=1e-12)
+            numpy.testing.assert_array_equal(PSIPar["phi"], PSIRef["phi"])
+            PSI_method_est_guess.PSIEstGuessRate_close(PSIPar)
+            self.assertFalse("workers" in PSIPar)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy, numpy, os, random, shutil, sys, tempfile, unittest
+from unittest import mock
+sys.path.insert(0, os.path.abspath('../'))
+from pychoacoustics.UML_method import*
+from pychoacoustics.utils_posterior_checkpoint import*
+
+#parameter space shared by the tests
+defaultPrm = dict(model="Logistic", x0=10, xLim=(-20, 20), alphaLim=(-10, 10),
+                  alphaStep=0.5, betaLim=(0.1, 5), betaStep=0.2, gamma=0.5,
+                  lambdaLim=(0, 0.1), lambdaStep=0.01)
+
+def listenerResp(x, rng, midpoint=2):
+    #response of the simulated listener
+    return int(rng.rand() < logisticPsy(x, midpoint, 1, 0.5, 0.02))
+
+def runUML(nTrials=40, seed=3, midpoint=2, onTrial=None, **kwargs):
+    #midpoint is the midpoint of the simulated listener, or a function
+    #returning it at each trial; onTrial(i, UML) is called after each update
+    rng = numpy.random.RandomState(seed)
+    UML = setupUML(**dict(defaultPrm, **kwargs))
+    for i in range(nTrials):
+        m = midpoint(i) if callable(midpoint) else midpoint
+        UML = UML_update(UML, listenerResp(UML["xnext"], rng, m))
+        if onTrial != None:
+            onTrial(i, UML)
+    return UML
+
+class TestUMLSweetpoints(unittest.TestCase):
+    def testFastSweetpoints(self):
+        for phi in [[2, 1, 0.5, 0.02], [5, 2.5, 0.33, 0.1], [1.5, 0.8, 0.25, 0]]:
+            phi = numpy.array(phi)
+            numpy.testing.assert_allclose(fast_sweetpoints(phi, "Logistic"), logit_sweetpoints(phi), atol=1e-3)
+            numpy.testing.assert_allclose(fast_sweetpoints(phi, "Weibull"), weibull_sweetpoints(phi), atol=1e-3)
+            #the Nelder-Mead searches for the slope sweet points of the
+            #gaussian function are not constrained on either side of the
+            #midpoint and can end up on the wrong side or on a plateau
+            self.assertAlmostEqual(fast_sweetpoints(phi, "Gaussian")[1],
+                                   numpy.ravel(gaussian_sweetpoints(phi))[1], places=3)
+
+    def testCache(self):
+        cache = {}
+        swpts1 = fast_sweetpoints(numpy.array([2, 1, 0.5, 0.02]), "Logistic", cache)
+        swpts2 = fast_sweetpoints(numpy.array([4, 2, 0.5, 0.02]), "Logistic", cache)
+        self.assertEqual(len(cache), 1)
+        numpy.testing.assert_allclose(swpts2, 4+(swpts1-2)/2)
+        #lapse estimates that differ slightly share the same entry
+        fast_sweetpoints(numpy.array([2, 1, 0.5, 0.02+1e-5]), "Logistic", cache)
+        self.assertEqual(len(cache), 1)
+        for i in range(swptCacheMaxSize+10):
+            fast_sweetpoints(numpy.array([2, 1, 0.5, 0.001*(i % 200)]), "Logistic", cache)
+            fast_sweetpoints(numpy.array([2, 1, 0.4, 0.001*(i % 200)]), "Logistic", cache)
+        self.assertEqual(len(cache), swptCacheMaxSize)
+
+    def testFminEngine(self):
+        #stimulus levels and estimates of the "fmin" engine (the default)
+        UML = runUML(nTrials=20)
+        self.assertEqual(UML["par"]["swptEngine"], "fmin")
+        numpy.testing.assert_allclose(UML["x"][0:8], [10.0, -0.007397, 4.599977, 3.676838,
+                                                       2.197678, 5.015204, 4.385905, 3.267235], atol=1e-4)
+        numpy.testing.assert_allclose(UML["phi"][-1], [0.9336995497661007, 2.3577810507085077, 0.5, 0.05125392687221794], rtol=1e-6)
+
+    def testFastEngine(self):
+        UMLFmin = runUML(swptEngine="fmin")
+        UMLFast = runUML(swptEngine="Fast")
+        self.assertTrue(len(UMLFast["swptCache"]) > 0)
+        self.assertAlmostEqual(UMLFast["est_midpoint"], UMLFmin["est_midpoint"], places=1)
+        timing = sweetpoints_timing(numpy.array([2, 1, 0.5, 0.02]), "Logistic", nRep=3)
+        self.assertTrue(timing["fastCached"] < timing["fmin"])
+
+class TestUMLAdaptiveGrid(unittest.TestCase):
+    def testAdaptiveGrid(self):
+        UMLDense = runUML(nTrials=300, swptEngine="Fast")
+        UMLAdapt = runUML(nTrials=300, swptEngine="Fast", adaptiveGrid=True)
+        self.assertTrue(UMLAdapt["p"].size < UMLDense["p"].size)
+        self.assertEqual(UMLAdapt["a"].shape, UMLAdapt["p"].shape)
+        numpy.testing.assert_almost_equal(UMLAdapt["phi"], UMLDense["phi"], decimal=3)
+
+    def testExpandGrid(self):
+        UML = runUML(nTrials=60, swptEngine="Fast", adaptiveGrid=True, adaptiveGridTol=1e-2, adaptiveGridStart=10)
+        UMLDense = setupUML(swptEngine="Fast", **defaultPrm)
+        for i in range(UML["n"]):
+            UMLDense["xnext"] = UML["x"][i]
+            UMLDense = UML_update(UMLDense, UML["r"][i])
+        UML = UML_crop_grid(UML, (slice(2, 30), slice(1, 20), slice(0, 11)))
+        UML = UML_expand_grid(UML)
+        self.assertEqual(UML["a"].shape, UMLDense["a"].shape)
+        numpy.testing.assert_allclose(UML["p"], UMLDense["p"], rtol=1e-9, atol=1e-9)
+
+    def testPosteriorShift(self):
+        #the midpoint of the listener moves out of the cropped grid
+        UMLDense = runUML(nTrials=120, midpoint=lambda i: 6 if i < 60 else -6, swptEngine="Fast")
+        UML = runUML(nTrials=120, midpoint=lambda i: 6 if i < 60 else -6, swptEngine="Fast",
+                     adaptiveGrid=True, adaptiveGridTol=1e-2, adaptiveGridStart=10)
+        self.assertTrue(UML["alpha"][0] < -6 < UML["alpha"][-1])
+        self.assertAlmostEqual(UML["est_midpoint"], UMLDense["est_midpoint"], places=0)
+
+class TestUMLStack(unittest.TestCase):
+    def testStack(self):
+        midpoints = [-5, 0, 5]
+        stack = setupUMLStack(3, **dict(defaultPrm, x0=[10, 0, -10], swptEngine="Fast"))
+        tracks = [setupUML(**dict(defaultPrm, x0=x0, swptEngine="Fast")) for x0 in [10, 0, -10]]
+        rng = numpy.random.RandomState(5)
+        for i in range(60):
+            t = rng.randint(3)
+            resp = listenerResp(stack["tracks"][t]["xnext"], rng, midpoints[t])
+            stack = UMLStack_update(stack, t, resp)
+            tracks[t] = UML_update(tracks[t], resp)
+            self.assertEqual(stack["tracks"][t]["xnext"], tracks[t]["xnext"])
+        phi = UMLStack_estimates(stack)
+        for t in range(3):
+            self.assertTrue(numpy.shares_memory(stack["tracks"][t]["p"], stack["p"]))
+            numpy.testing.assert_allclose(phi[t], tracks[t]["phi"][-1], rtol=1e-9)
+
+    def testStackAdaptiveGrid(self):
+        #the grid of the track is cropped, then restored and cropped again
+        #to a box of the same size, the stack must follow the new posterior
+        box = (slice(2, 30), slice(1, 20), slice(0, 11))
+        stack = setupUMLStack(1, **dict(defaultPrm, swptEngine="Fast", adaptiveGrid=True, adaptiveGridStart=1))
+        rng = numpy.random.RandomState(5)
+        with mock.patch("pychoacoustics.UML_method.adaptGridBox", side_effect=[(False, box), (True, None), (False, box)]):
+            for i in range(2):
+                shape = stack["p"].shape
+                stack = UMLStack_update(stack, 0, listenerResp(stack["tracks"][0]["xnext"], rng))
+        self.assertEqual(stack["p"].shape, shape)
+        self.assertTrue(numpy.shares_memory(stack["tracks"][0]["p"], stack["p"]))
+        numpy.testing.assert_allclose(UMLStack_estimates(stack)[0], stack["tracks"][0]["phi"][-1], rtol=1e-9)
+
+    def testSetTrack(self):
+        #a track replaced in the stack (e.g. restored from a checkpoint)
+        #is updated in the same way as the plain UML dictionary
+        UML = runUML(nTrials=20)
+        stack = UMLStack_set_track(setupUMLStack(1, **defaultPrm), 0, copy.deepcopy(UML))
+        rng = numpy.random.RandomState(7)
+        for i in range(20):
+            resp = listenerResp(UML["xnext"], rng)
+            UML = UML_update(UML, resp)
+            stack = UMLStack_update(stack, 0, resp)
+        self.assertTrue(numpy.shares_memory(stack["tracks"][0]["p"], stack["p"]))
+        self.assertEqual(stack["tracks"][0]["xnext"], UML["xnext"])
+        numpy.testing.assert_allclose(stack["p"][0], UML["p"], rtol=1e-12)
+
+class TestUMLCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.ckptDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.ckptDir)
+
+    def testResume(self):
+        for kwargs in [dict(), dict(swptRule="Random", adaptiveGrid=True)]:
+            fPath = os.path.join(self.ckptDir, "block")
+            def onTrial(i, UML):
+                if i < 45:
+                    writeCheckpoint(fPath, UML, "UML", snapshotInterval=20)
+            random.seed(1)
+            UML = runUML(nTrials=80, onTrial=onTrial, **kwargs)
+            random.seed(1)
+            UMLRes, extra = resumeCheckpoint(fPath, setupUML(**dict(defaultPrm, **kwargs)), "UML")
+            self.assertEqual(UMLRes["n"], 45)
+            rng = numpy.random.RandomState(3)
+            for i in range(80):
+                resp = listenerResp(UMLRes["xnext"], rng)
+                if i >= 45:
+                    UMLRes = UML_update(UMLRes, resp)
+            numpy.testing.assert_array_equal(UMLRes["x"], UML["x"])
+            numpy.testing.assert_allclose(UMLRes["p"], UML["p"], rtol=1e-12)
+            self.assertEqual(UMLRes["xnext"], UML["xnext"])
+            removeCheckpoint(fPath)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,454 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy, os, subprocess, sys, time, unittest
+sys.path.insert(0, os.path.abspath('../'))
+from pychoacoustics.sndlib import*
+from pychoacoustics.synthesis_pool import*
+from pychoacoustics.stimulus_cache import*
+from pychoacoustics.sound_stream import*
+from pychoacoustics.utils_pcm import*
+from pychoacoustics.trial_buffer import*
+from pychoacoustics.output_stream import OutputStream
+from pychoacoustics.pipe_player import PipePlayer, pipeCommandArgs
+from pychoacoustics.trigger_code import*
+from numpy.testing import assert_allclose, assert_array_equal
+
+class TestHarmonicSum(unittest.TestCase):
+    def testPartials(self):
+        timeAll = arange(0, 4800) / 48000
+        harms = arange(3, 13)
+        phases = harmonicPhases("Schroeder-", 3, 12)
+        shift = 2*pi*7*timeAll
+        tone = zeros(len(timeAll))
+        for i in range(len(harms)):
+            tone = tone + sin(2*pi*(220*harms[i]+7)*timeAll + phases[i])
+        #small blocks, to check the chunking
+        assert_allclose(harmonicSum(harms, phases, 2*pi*220*timeAll, shift, maxBlockSize=1000), tone, atol=1e-9)
+
+    def testComplexTone(self):
+        for harmPhase in ["Sine", "Alternating", "Random"]:
+            for channel in ["Both", "Odd Left"]:
+                numpy.random.seed(1)
+                phases = harmonicPhases(harmPhase, 2, 9)
+                snd = zeros((int(round(0.2*48000)), 2))
+                for i in range(2, 10):
+                    if channel == "Odd Left" and i%2 == 0:
+                        thisChan = "Right"
+                    elif channel == "Odd Left":
+                        thisChan = "Left"
+                    else:
+                        thisChan = channel
+                    snd = snd + pureTone(220*i, phases[i-2], 50, 180, 10, thisChan, 48000, 100)
+                numpy.random.seed(1)
+                ct = complexTone(F0=220, harmPhase=harmPhase, lowHarm=2, highHarm=9, stretch=0, level=50,
+                                 duration=180, ramp=10, channel=channel, fs=48000, maxLevel=100)
+                assert_allclose(ct, snd, atol=1e-9)
+
+    def testFMComplexes(self):
+        for harmPhase in ["Sine", "Cosine", "Alternating"]:
+            for i in range(1, 7):
+                startPhase = {"Sine": 0, "Cosine": pi/2, "Alternating": [pi/2, 0][i%2]}[harmPhase]
+                expTone = expSinFMTone(150*i, 5, 300, pi, startPhase, 60, 180, 10, "Both", 48000, 101)
+                camTone = camSinFMTone(150*i, 5, 1, pi, startPhase, 60, 180, 10, "Both", 48000, 101)
+                if i == 1:
+                    expSnd, camSnd = expTone, camTone
+                else:
+                    expSnd, camSnd = expSnd + expTone, camSnd + camTone
+            assert_allclose(expSinFMComplex(F0=150, lowHarm=1, highHarm=6, harmPhase=harmPhase, fm=5, deltaCents=300, fmPhase=pi,
+                                            level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101), expSnd, atol=1e-9)
+            assert_allclose(camSinFMComplex(F0=150, lowHarm=1, highHarm=6, harmPhase=harmPhase, fm=5, deltaCams=1, fmPhase=pi,
+                                            level=60, duration=180, ramp=10, channel="Both", fs=48000, maxLevel=101), camSnd, atol=1e-9)
+
+    def testFMComplex2Phase(self):
+        #the starting phase of each harmonic must not change its frequency
+        snd = fm_complex2(midF0=200, harmPhase="Schroeder+", lowHarm=1, highHarm=10, level=60, duration=500, ramp=0,
+                          fmFreq=1, fmDepth=0, fmStartPhase=0, fmStartTime=0, fmDuration=0, levelAdj=False,
+                          channel="Both", fs=48000, maxLevel=101)
+        spec = abs(rfft(snd[:, 0]))
+        peaks = numpy.sort(numpy.argsort(spec)[-10:]) * 2 #frequency resolution is 2 Hz
+        assert_allclose(peaks, arange(1, 11)*200)
+
+class TestPureTones(unittest.TestCase):
+    def testPureTones(self):
+        freqs = [250, 500, 1000, 2000]
+        levels = [40, 35, 30, 50]
+        channels = ["Right", "Left", "Both", "Right"]
+        snd = pureTones(freqs, 1, levels, 180, 10, channels, 48000, 100)
+        for i in range(len(freqs)):
+            assert_array_equal(snd[i], pureTone(freqs[i], 1, levels[i], 180, 10, channels[i], 48000, 100))
+        assert_allclose(pureTones(freqs, 1, levels, 180, 10, channels, 48000, 100, sumTones=True),
+                        snd.sum(axis=0), atol=1e-12)
+        self.assertRaises(ValueError, pureTones, freqs, 0, 60, 180, 10, "Odd Right")
+
+    def testAsynchChord(self):
+        freqs = [300, 500, 700]; levels = [50, 55, 60]; phases = [0, 1, 2]
+        for SOA in [60, 250]:
+            numpy.random.seed(4)
+            seq = numpy.arange(len(freqs))
+            numpy.random.shuffle(seq)
+            for i in range(len(freqs)):
+                thisTone = pureTone(freqs[seq[i]], phases[seq[i]], levels[seq[i]], 180, 10, "Both", 48000, 100)
+                if i == 0:
+                    snd = thisTone
+                else:
+                    snd = addSounds(snd, thisTone, SOA*i, 48000)
+            numpy.random.seed(4)
+            assert_allclose(makeAsynchChord(freqs, levels, phases, 180, 10, "Both", SOA, 48000, 100), snd, atol=1e-12)
+
+class TestSpectralShaping(unittest.TestCase):
+    def testColouredNoise(self):
+        numpy.random.seed(5)
+        noise = broadbandNoise(40, 180, 10, "Both", 48000, 100)
+        pink = makePinkRef(noise.copy(), 48000, 1000)
+        x = rfft(noise, axis=0); y = rfft(pink, axis=0)
+        idx = arange(1, x.shape[0])
+        assert_allclose(abs(y[1:]), abs(x[1:])*sqrt((1+1000*noise.shape[0]/48000)/idx)[:, None], rtol=1e-9)
+        assert_allclose(angle(y[1:-1]), angle(x[1:-1]), atol=1e-9)
+        #the weight tables are shared between calls
+        self.assertTrue(colouredNoiseWeights("Pink", 9600, 48000, 1000) is colouredNoiseWeights("Pink", 9600, 48000, 1000))
+        self.assertRaises(ValueError, colouredNoiseWeights, "Brown", 9600, 48000, 1000)
+
+    def testPhaseShift(self):
+        numpy.random.seed(6)
+        #a power of two number of samples, so that the FFT is not zero-padded
+        noise = broadbandNoise(40, 980, 10, "Both", 8192, 100)
+        freqs = rfftFrequencies(8192, 8192)
+        sh = where((freqs>500) & (freqs<600))[0]
+        x = rfft(noise, 8192, axis=0)
+        snd = phaseShift(noise, 500, 600, pi/2, "Linear", "Left", 8192)
+        y = rfft(snd, 8192, axis=0)
+        #the shift increases linearly across the bins of the region
+        dPhase = numpy.angle(y[sh, 0]/x[sh, 0])
+        assert_allclose(dPhase, linspace(0, pi/2, len(sh)), atol=1e-6)
+        assert_array_equal(snd[:, 1], noise[:, 1])
+        snd = ITDShift(noise, 500, 600, 500, "Right", 8192)
+        y = rfft(snd, 8192, axis=0)
+        assert_allclose(numpy.angle(y[sh, 1]/x[sh, 1]), numpy.angle(exp(1j*itdtoipd(500/1e6, freqs[sh]))), atol=1e-6)
+
+    def testFir2Filt(self):
+        numpy.random.seed(7)
+        noise = broadbandNoise(40, 180, 10, "Dichotic", 48000, 100)
+        for n in [256, 2048]:
+            b = fir2Design(400, 600, 4000, 4400, 48000, n)
+            self.assertTrue(b is fir2Design(400, 600, 4000, 4400, 48000, n))
+            filtNoise = fir2Filt(400, 600, 4000, 4400, noise, 48000, n)
+            for ch in range(2):
+                assert_allclose(filtNoise[:, ch], numpy.convolve(noise[:, ch], b, "same"), atol=1e-12)
+        #sounds shorter than the filter keep their length
+        self.assertEqual(fir2Filt(0, 0, 1000, 1200, noise[0:100], 48000).shape, (100, 2))
+
+    def testDelayAdd(self):
+        numpy.random.seed(8)
+        noise = broadbandNoise(40, 180, 10, "Right", 48000, 100)
+        delayPnt = round(48000/440)
+        for configuration in ["Add Same", "Add Original"]:
+            for gain in [1, -0.5]:
+                #the delay-add loop
+                sig = noise.copy()
+                for i in range(8):
+                    delayed = gain*numpy.roll(sig, -delayPnt, axis=0)
+                    sig = sig + delayed if configuration == "Add Same" else noise + delayed
+                sig[:, 1] = sig[:, 1] * sqrt(numpy.sum(noise[:, 1]**2)/numpy.sum(sig[:, 1]**2))
+                assert_allclose(delayAdd(noise, 1/440, gain, 8, configuration, 48000), sig, atol=1e-9)
+
+class TestGate(unittest.TestCase):
+    def testRampWindows(self):
+        onRamp, offRamp = rampWindows(480, "cos2")
+        self.assertIs(rampWindows(480, "cos2")[0], onRamp)
+        self.assertFalse(onRamp.flags.writeable)
+        assert_allclose(onRamp, (1-numpy.cos(numpy.pi*numpy.arange(480)/480))/2)
+        assert_allclose(onRamp + offRamp, 1)
+        onRamp, offRamp = rampWindows(480, "Hann")
+        assert_allclose(onRamp, offRamp[::-1])
+        onRamp, offRamp = rampWindows(480, "linear")
+        assert_allclose(numpy.diff(onRamp), 1/480)
+        self.assertRaises(ValueError, rampWindows, 480, "Gaussian")
+
+    def testGate(self):
+        for rampShape in ["cos2", "linear", "Hann"]:
+            snd = pureTone(440, 0, 60, 180, 10, "Both", 48000, 100, rampShape)
+            steady = pureTone(440, 0, 60, 200, 0, "Both", 48000, 100)
+            onRamp, offRamp = rampWindows(480, rampShape)
+            assert_allclose(snd[0:480], steady[0:480]*onRamp[:,None], atol=1e-12)
+            assert_allclose(snd[-480:], steady[-480:]*offRamp[:,None], atol=1e-12)
+            assert_allclose(gate(10, steady, 48000, rampShape), snd, atol=1e-12)
+        #the ramps are imposed in place
+        sig = numpy.ones((1000, 2))
+        out = gate(5, sig, 48000)
+        self.assertIs(out, sig)
+        self.assertEqual(sig[0, 0], 0)
+        self.assertEqual(sig[500, 1], 1)
+
+class TestSoundStream(unittest.TestCase):
+    def testTones(self):
+        for blockSize in [1000, 4096, 100000]:
+            snd = concatenate(list(pureToneStream(440, 1, 60, 180, 10, "Left", 48000, 100, blockSize)))
+            assert_allclose(snd, pureTone(440, 1, 60, 180, 10, "Left", 48000, 100), atol=1e-12)
+            snd = concatenate(list(FMToneStream(1000, 40, 1, 0, 60, 180, 10, "Both", 48000, 100, blockSize)))
+            assert_allclose(snd, FMTone(1000, 40, 1, 0, 60, 180, 10, "Both", 48000, 100), atol=1e-12)
+            for channel in ["Both", "Odd Right"]:
+                snd = concatenate(list(complexToneStream(200, "Schroeder+", 1, 12, 1, 50, 180, 10, channel, 48000, 100, blockSize)))
+                assert_allclose(snd, complexTone(200, "Schroeder+", 1, 12, 1, 50, 180, 10, channel, 48000, 100), atol=1e-12)
+        snd = concatenate(list(pureToneStream(440, 1, 60, 180, 10, "Both", 48000, 100, 333, "Hann")))
+        assert_allclose(snd, pureTone(440, 1, 60, 180, 10, "Both", 48000, 100, "Hann"), atol=1e-12)
+        #the level is set from the expected RMS of the modulated tone
+        snd = concatenate(list(AMToneStream(1000, 20, 1, 0, 0, 60, 1000, 0, "Right", 48000, 100)))
+        assert_allclose(snd, AMTone(1000, 20, 1, 0, 0, 60, 1000, 0, "Right", 48000, 100), atol=1e-9)
+
+    def testNoise(self):
+        blocks = list(broadbandNoiseStream(40, 2000, 10, "Dichotic", 48000, 100, 5000))
+        self.assertEqual(len(blocks), 20)
+        snd = concatenate(blocks)
+        self.assertEqual(snd.shape, (int(round(2.02*48000)), 2))
+        assert_allclose(getRMS(snd), getRMS(broadbandNoise(40, 2000, 10, "Dichotic", 48000, 100)), rtol=0.01)
+
+class TestTrialBuffer(unittest.TestCase):
+    def testRender(self):
+        pt1 = pureTone(440, 0, 60, 180, 10, "Both", 48000, 100)
+        pt2 = pureTone(880, 0, 60, 180, 10, "Right", 48000, 100)
+        trial = TrialBuffer(48000)
+        trial.addSilence(300, light=0)
+        trial.addSilence(200)
+        trial.addSound(pt1, light=1)
+        trial.addSilence(500.01)
+        trial.addSound(pt2, light=2)
+        snd = trial.render()
+        self.assertEqual(snd.shape, (24000+2*9600+24000, 2))
+        assert_array_equal(snd[0:24000], 0)
+        assert_array_equal(snd[24000:33600], pt1)
+        assert_array_equal(snd[33600:57600], 0)
+        assert_array_equal(snd[57600:], pt2)
+        self.assertEqual(trial.getEvents(), [(0, 0, 'on'), (14400, 0, 'off'), (24000, 1, 'on'),
+                                             (33600, 1, 'off'), (57600, 2, 'on'), (67200, 2, 'off')])
+
+class RecordingOutputStream(OutputStream):
+    #output stream writing to a list instead of a sound card
+    def openDevice(self, fs, nChannels, nbits, periodSize):
+        self.nOpened = getattr(self, "nOpened", 0) + 1
+        self.written = []
+    def writeDevice(self, data):
+        self.written.append(data)
+        return False
+
+class TestOutputStream(unittest.TestCase):
+    def testRingBuffer(self):
+        stream = RecordingOutputStream("test", nPeriods=3)
+        stream.configure(48000, 2, 16, 480)
+        stream.configure(48000, 2, 16, 480)
+        self.assertEqual(stream.nOpened, 1)
+        data = floatToPCM(pureTone(440, 0, 60, 180, 10, "Both", 48000, 100), 16)
+        for i in range(20):
+            stream.write(data[i*480:(i+1)*480])
+        stream.drain()
+        self.assertEqual(b"".join(stream.written), data.tobytes())
+        self.assertEqual(stream.getStats()["xruns"], 0)
+        self.assertTrue(stream.getStats()["latency"] >= 0)
+        #a period arriving after the previous one has been played is an underrun
+        stream.write(data[0:480])
+        time.sleep(0.1)
+        stream.write(data[480:960])
+        stream.drain()
+        self.assertEqual(stream.getStats()["xruns"], 1)
+        stream.configure(44100, 2, 24, 441)
+        self.assertEqual(stream.nOpened, 2)
+        stream.close()
+
+class SlowOutputStream(RecordingOutputStream):
+    #output stream taking some time to write each period
+    def writeDevice(self, data):
+        time.sleep(0.05)
+        return RecordingOutputStream.writeDevice(self, data)
+
+class TestOutputStreamFlush(unittest.TestCase):
+    def testFlushDuringWrite(self):
+        stream = SlowOutputStream("test", nPeriods=2)
+        stream.configure(48000, 2, 16, 4)
+        first = numpy.ones((4, 2), dtype=numpy.int16)
+        second = 2*numpy.ones((4, 2), dtype=numpy.int16)
+        stream.write(first)
+        stream.write(first)
+        while stream.writing == False:
+            time.sleep(0.001)
+        stream.flush()
+        #the period queued after the flush must not be lost, nor
+        #overwrite the period being written
+        stream.write(second)
+        stream.drain()
+        self.assertEqual(stream.written, [first.tobytes(), second.tobytes()])
+        stream.close()
+
+class TestPipePlayer(unittest.TestCase):
+    def testPipeCommandArgs(self):
+        args = pipeCommandArgs("aplay -D hw:0", 44100, 16, 8)
+        self.assertEqual(args[0:3], ["aplay", "-D", "hw:0"])
+        self.assertEqual(args[-7:], ["-f", "S16_LE", "-c", "8", "-r", "44100", "-"])
+        args = pipeCommandArgs("/usr/bin/play", 48000, 24, 2)
+        self.assertEqual(args[-9:], ["-r", "48000", "-e", "signed-integer", "-b", "24", "-c", "2", "-"])
+        self.assertEqual(pipeCommandArgs("ffplay", 48000, 32, 2)[-7:], ["-f", "s32le", "-ar", "48000", "-ac", "2", "-"])
+        self.assertEqual(pipeCommandArgs("mplayer", 48000, 16, 2), None)
+        self.assertEqual(pipeCommandArgs("aplay", 48000, 8, 2), None)
+
+    def testCloseTimeout(self):
+        #a player that does not exit at the end of its input is terminated
+        player = PipePlayer()
+        player.proc = subprocess.Popen(["sleep", "30"], stdin=subprocess.PIPE)
+        t0 = time.perf_counter()
+        player.close(timeout=0.2)
+        self.assertLess(time.perf_counter() - t0, 5)
+        self.assertEqual(player.proc, None)
+
+class TestTriggerCode(unittest.TestCase):
+    def testTriggerChannels(self):
+        snd = pureTone(440, 0, 60, 20, 2, "Both", 48000, 100)
+        for triggerNumber in [0, 5, 42, 63, 200]:
+            #the bits of the trigger number, least significant first
+            triggerCode = bin(triggerNumber)[2:].zfill(8)[::-1]
+            sndTrig = multiplexTrigger(snd, triggerNumber, 48000, 1)
+            self.assertEqual(sndTrig.shape, (snd.shape[0], 8))
+            assert_array_equal(sndTrig[:, 0:2], snd)
+            for i in range(6):
+                if triggerCode[i] == '1':
+                    self.assertTrue(numpy.all(sndTrig[:, 2+i] == 0))
+                else:
+                    assert_array_equal(sndTrig[0:48, 2+i], 0.5)
+                    self.assertTrue(numpy.all(sndTrig[48:, 2+i] == 0))
+        #only the pulses are cached, by trigger code
+        self.assertEqual(triggerPulse(5, 48000, 1).shape, (48, 6))
+        self.assertIs(triggerPulse(5, 48000, 1), triggerPulse(5+64, 48000, 1))
+        assert_array_equal(triggerChannels(5, 960, 48000, 1), multiplexTrigger(zeros((960, 2)), 5, 48000, 1)[:, 2:])
+        #pulses longer than the sound are cut
+        self.assertEqual(multiplexTrigger(zeros((10, 2)), 5, 48000, 1).shape, (10, 8))
+
+    def testMultiplexSegmentsPCM(self):
+        snd = pureTone(440, 0, 60, 20, 2, "Both", 48000, 100)
+        sndLong = concatenate((snd, zeros((500, 2))), axis=0)
+        for nbits in [16, 24, 32]:
+            trigData = triggerPulsePCM(9, 48000, 2, nbits)
+            segs = [seg.copy() for seg in multiplexSegmentsPCM(sndLong, trigData, nbits, 256)]
+            self.assertEqual(segs[-1].shape[0], sndLong.shape[0] % 256)
+            expected = floatToPCM(concatenate((multiplexTrigger(snd, 9, 48000, 2), zeros((500, 8))), axis=0), nbits)
+            assert_array_equal(concatenate(segs, axis=0), expected)
+
+class TestPrecision(unittest.TestCase):
+    def tearDown(self):
+        setSndPrecision("float64")
+
+    def testFloat32(self):
+        for func, args in [(complexTone, (200, "Random", 1, 20, 0, 80, 480, 10, "Odd Left", 48000, 100)),
+                           (makeIRN, (1/200, 1, 8, "Add Same", 50, 480, 10, "Both", 48000, 100)),
+                           (spectralModNoise, (50, 480, 10, 10, 2, "Random", "Both", 48000, 100))]:
+            setSndPrecision("float64")
+            numpy.random.seed(9)
+            snd64 = func(*args)
+            setSndPrecision("float32")
+            numpy.random.seed(9)
+            snd32 = func(*args)
+            self.assertEqual(snd32.dtype, numpy.float32)
+            #24-bit accuracy: the samples differ by at most one step, and the
+            #rounding error is far below the quantization noise
+            pcm64 = floatToPCM(snd64, 24).astype(int) @ [1, 2**8, 2**16]
+            pcm32 = floatToPCM(snd32, 24).astype(int) @ [1, 2**8, 2**16]
+            pcm64[pcm64 >= 2**23] -= 2**24; pcm32[pcm32 >= 2**23] -= 2**24
+            self.assertLessEqual(abs(pcm32 - pcm64).max(), 1)
+            err = snd32 - snd64
+            self.assertLess(20*log10(sqrt(mean(err**2))/sqrt(mean(snd64**2))), -130)
+
+    def testFloatToPCM(self):
+        snd = numpy.array([[0.5, -0.5], [1, -1], [1.5, -1.5]])
+        for dtype in [numpy.float64, numpy.float32]:
+            assert_array_equal(floatToPCM(snd.astype(dtype), 16), [[2**14, -2**14], [2**15-1, -2**15], [2**15-1, -2**15]])
+            assert_array_equal(floatToPCM(snd.astype(dtype), 32), [[2**30, -2**30], [2**31-1, -2**31], [2**31-1, -2**31]])
+            data = floatToPCM(snd.astype(dtype), 24)
+            self.assertEqual((data.dtype, data.shape), (numpy.uint8, (3, 2, 3)))
+            assert_array_equal(data[1, 0], [255, 255, 127])
+            assert_array_equal(data[1, 1], [0, 0, 128])
+        self.assertRaises(ValueError, floatToPCM, snd, 8)
+
+    def testEncodeSegments(self):
+        snd = pureTone(440, 0, 60, 20, 2, "Both", 48000, 100)
+        for nbits in [16, 24, 32]:
+            expected = floatToPCM(snd, nbits)
+            segs = [data.copy() for data in encodeSegments(snd, nbits, 256)]
+            self.assertEqual(len(segs), int(ceil(snd.shape[0]/256)))
+            assert_array_equal(concatenate(segs, axis=0), expected)
+            #conversion into some channels of a larger array
+            out = zeros(pcmShape((snd.shape[0], 4), nbits), dtype=pcmDtype(nbits))
+            floatToPCM(snd, nbits, out=out[:, 1:3])
+            assert_array_equal(out[:, 1:3], expected)
+            self.assertTrue(numpy.all(out[:, 0] == 0) and numpy.all(out[:, 3] == 0))
+
+class TestSynthesisPool(unittest.TestCase):
+    def tearDown(self):
+        closeSynthesisPool()
+
+    def testComplexToneParallel(self):
+        for harmPhase in ["Alternating", "Random"]:
+            for channel in ["Both", "Odd Right"]:
+                numpy.random.seed(2)
+                ct = complexTone(F0=180, harmPhase=harmPhase, lowHarm=1, highHarm=12, stretch=2, level=50,
+                                 duration=180, ramp=10, channel=channel, fs=48000, maxLevel=100)
+                numpy.random.seed(2)
+                ctp = complexToneParallel(F0=180, harmPhase=harmPhase, lowHarm=1, highHarm=12, stretch=2, level=50,
+                                          duration=180, ramp=10, channel=channel, fs=48000, maxLevel=100, nProcesses=2)
+                assert_allclose(ctp, ct, atol=1e-9)
+        #the pool is kept between calls
+        self.assertTrue(getSynthesisPool() is getSynthesisPool(2))
+
+    def testSynthesize(self):
+        pool = getSynthesisPool(3)
+        freqs = [(f, 0) for f in [200, 300, 500, 700]]
+        for duration in [100, 50, 200]: #the shared buffer is grown and reused
+            snd = pool.synthesize(pureTone, freqs, (int(round((duration+20)/1000*44100)), 2),
+                                  kwargs={"level": 60, "duration": duration, "ramp": 10, "fs": 44100})
+            ref = sum([pureTone(f, 0, 60, duration, 10, fs=44100) for f, ph in freqs])
+            assert_allclose(snd, ref, atol=1e-12)
+
+class TestStimulusCache(unittest.TestCase):
+    def testCache(self):
+        cache = StimulusCache(maxMem=1)
+        snd = cache.get(pureTone, 1000, 0, 60, 180, 10, "Both", 48000, 100)
+        #the same arguments, partly passed by keyword or left to their defaults
+        snd2 = cache.get(pureTone, 1000, 0, 60, duration=180, channel="Both", fs=48000, maxLevel=100)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        assert_array_equal(snd2, pureTone(1000, 0, 60, 180, 10, "Both", 48000, 100))
+        self.assertRaises(ValueError, snd2.__setitem__, 0, 1)
+        #different fs and maxLevel
+        cache.get(pureTone, 1000, 0, 60, 180, 10, "Both", 44100, 100)
+        cache.get(pureTone, 1000, 0, 60, 180, 10, "Both", 48000, 101)
+        self.assertEqual(cache.misses, 3)
+
+    def testRandom(self):
+        cache = StimulusCache()
+        for i in range(2):
+            cache.get(complexTone, 200, "Random", 1, 10)
+            cache.get(broadbandNoise, 25, 100)
+        self.assertEqual((cache.hits, cache.misses, len(cache.sounds)), (0, 0, 0))
+        cache.get(complexTone, 200, "Sine", 1, 10)
+        cache.get(complexTone, numpy.float64(200), "Sine", 1, 10)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def testEviction(self):
+        cache = StimulusCache(maxMem=1)
+        nBytes = pureTone(500, 0, 60, 980, 10).nbytes #0.75 MB
+        cache.get(pureTone, 500, 0, 60, 980, 10)
+        cache.get(pureTone, 600, 0, 60, 980, 10)
+        self.assertEqual((len(cache.sounds), cache.nBytes), (1, nBytes))
+        cache.get(pureTone, 600, 0, 60, 980, 10)
+        self.assertEqual(cache.hits, 1)
+
+    def testPrecision(self):
+        cache = StimulusCache()
+        try:
+            snd = cache.get(pureTone, 1000, 0, 60, 180, 10)
+            setSndPrecision("float32")
+            snd32 = cache.get(pureTone, 1000, 0, 60, 180, 10)
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+            self.assertEqual((snd.dtype, snd32.dtype), (numpy.float64, numpy.float32))
+        finally:
+            setSndPrecision("float64")
+        cache.get(pureTone, 1000, 0, 60, 180, 10)
+        self.assertEqual(cache.hits, 1)
+
+if __name__ == "__main__":
+    unittest.main()